@@ -3,7 +3,11 @@ from logging.config import fileConfig
 from alembic import context
 from app.core.config import settings
 from app.db.base import Base  # Import the declarative base
+from app.models.job import Job  # noqa: F401 - Used implicitly by Alembic
 from app.models.note import Note  # noqa: F401 - Used implicitly by Alembic
+from app.models.note_change import (  # noqa: F401 - Used implicitly by Alembic
+    NoteChange,
+)
 from app.models.note_version import (  # noqa: F401 - Used implicitly by Alembic
     NoteVersion,
 )
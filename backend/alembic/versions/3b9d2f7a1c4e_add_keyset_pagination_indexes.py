@@ -0,0 +1,53 @@
+"""add_keyset_pagination_indexes
+
+Revision ID: 3b9d2f7a1c4e
+Revises: 6f565df96a78
+Create Date: 2025-05-02 09:12:41.118204
+
+"""
+
+from typing import Optional, Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3b9d2f7a1c4e"
+down_revision: Optional[str] = "6f565df96a78"
+branch_labels: Optional[Sequence[str]] = None
+depends_on: Optional[Sequence[str]] = None
+
+
+def upgrade() -> None:
+    """Backfills notes.updated_at and adds the keyset pagination indexes."""
+    # Keyset pagination orders by (updated_at, id): NULLs would break the order
+    op.execute("UPDATE notes SET updated_at = created_at WHERE updated_at IS NULL")
+    with op.batch_alter_table("notes", schema=None) as batch_op:
+        batch_op.alter_column(
+            "updated_at",
+            existing_type=sa.DateTime(timezone=True),
+            server_default=sa.text("(CURRENT_TIMESTAMP)"),
+            existing_nullable=True,
+        )
+    op.create_index("ix_notes_updated_at_id", "notes", ["updated_at", "id"])
+
+    # (note_id, id) supersedes the single column note_id index
+    op.create_index("ix_note_versions_note_id_id", "note_versions", ["note_id", "id"])
+    op.drop_index(op.f("ix_note_versions_note_id"), table_name="note_versions")
+
+
+def downgrade() -> None:
+    """Restores the single column index and drops the keyset indexes."""
+    op.create_index(
+        op.f("ix_note_versions_note_id"), "note_versions", ["note_id"], unique=False
+    )
+    op.drop_index("ix_note_versions_note_id_id", table_name="note_versions")
+
+    op.drop_index("ix_notes_updated_at_id", table_name="notes")
+    with op.batch_alter_table("notes", schema=None) as batch_op:
+        batch_op.alter_column(
+            "updated_at",
+            existing_type=sa.DateTime(timezone=True),
+            server_default=None,
+            existing_nullable=True,
+        )
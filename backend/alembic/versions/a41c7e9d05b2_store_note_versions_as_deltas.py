@@ -0,0 +1,120 @@
+"""store_note_versions_as_deltas
+
+Revision ID: a41c7e9d05b2
+Revises: 3b9d2f7a1c4e
+Create Date: 2025-05-06 16:40:03.527118
+
+"""
+
+from typing import Optional, Sequence
+
+import sqlalchemy as sa
+from alembic import op
+from app.core import delta
+from app.core.config import settings
+
+# revision identifiers, used by Alembic.
+revision: str = "a41c7e9d05b2"
+down_revision: Optional[str] = "3b9d2f7a1c4e"
+branch_labels: Optional[Sequence[str]] = None
+depends_on: Optional[Sequence[str]] = None
+
+FK_BASE_VERSION = op.f("fk_note_versions_base_version_id_note_versions")
+
+# Lightweight table definition used by the data migration, independent of
+# the current ORM model
+note_versions = sa.table(
+    "note_versions",
+    sa.column("id", sa.Integer),
+    sa.column("note_id", sa.Integer),
+    sa.column("content", sa.Text),
+    sa.column("content_data", sa.LargeBinary),
+    sa.column("base_version_id", sa.Integer),
+)
+
+
+def _note_ids(connection):
+    return connection.execute(sa.select(note_versions.c.note_id).distinct()).scalars()
+
+
+def upgrade() -> None:
+    """Converts full-text versions into snapshots and deltas."""
+    with op.batch_alter_table("note_versions", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("content_data", sa.LargeBinary(), nullable=True))
+        batch_op.add_column(sa.Column("base_version_id", sa.Integer(), nullable=True))
+
+    connection = op.get_bind()
+    interval = settings.VERSION_SNAPSHOT_INTERVAL
+    # One note at a time, so that memory is bounded by the largest history
+    for note_id in list(_note_ids(connection)):
+        rows = connection.execute(
+            sa.select(note_versions.c.id, note_versions.c.content)
+            .where(note_versions.c.note_id == note_id)
+            .order_by(note_versions.c.id)
+        ).all()
+        # Same layout as app.crud.version_store: a snapshot, then at most
+        # interval - 1 deltas against it
+        snapshot_id, snapshot_content, versions_after = None, None, 0
+        for version_id, content in rows:
+            full = delta.compress_text(content)
+            values = {"content_data": full, "base_version_id": None}
+            if snapshot_id is not None and versions_after + 1 < interval:
+                patch = delta.compress_delta(snapshot_content, content)
+                if len(patch) < len(full):
+                    values = {"content_data": patch, "base_version_id": snapshot_id}
+            if values["base_version_id"] is None:
+                snapshot_id, snapshot_content, versions_after = version_id, content, 0
+            else:
+                versions_after += 1
+            connection.execute(
+                note_versions.update()
+                .where(note_versions.c.id == version_id)
+                .values(**values)
+            )
+
+    with op.batch_alter_table("note_versions", schema=None) as batch_op:
+        batch_op.alter_column(
+            "content_data", existing_type=sa.LargeBinary(), nullable=False
+        )
+        batch_op.create_foreign_key(
+            FK_BASE_VERSION, "note_versions", ["base_version_id"], ["id"]
+        )
+        batch_op.drop_column("content")
+
+
+def downgrade() -> None:
+    """Rebuilds the full-text content column from snapshots and deltas."""
+    with op.batch_alter_table("note_versions", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("content", sa.Text(), nullable=True))
+
+    connection = op.get_bind()
+    for note_id in list(_note_ids(connection)):
+        rows = connection.execute(
+            sa.select(
+                note_versions.c.id,
+                note_versions.c.content_data,
+                note_versions.c.base_version_id,
+            )
+            .where(note_versions.c.note_id == note_id)
+            .order_by(note_versions.c.id)
+        ).all()
+        snapshots = {}
+        for version_id, content_data, base_version_id in rows:
+            if base_version_id is None:
+                content = delta.decompress_text(content_data)
+                snapshots[version_id] = content
+            else:
+                content = delta.decompress_delta(
+                    snapshots[base_version_id], content_data
+                )
+            connection.execute(
+                note_versions.update()
+                .where(note_versions.c.id == version_id)
+                .values(content=content)
+            )
+
+    with op.batch_alter_table("note_versions", schema=None) as batch_op:
+        batch_op.alter_column("content", existing_type=sa.Text(), nullable=False)
+        batch_op.drop_constraint(FK_BASE_VERSION, type_="foreignkey")
+        batch_op.drop_column("base_version_id")
+        batch_op.drop_column("content_data")
@@ -0,0 +1,52 @@
+"""add_tenant_id_columns
+
+Revision ID: a7c3e5f9d218
+Revises: f3a6d9c1b274
+Create Date: 2025-05-24 10:03:51.642390
+
+"""
+
+from typing import Optional, Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a7c3e5f9d218"
+down_revision: Optional[str] = "f3a6d9c1b274"
+branch_labels: Optional[Sequence[str]] = None
+depends_on: Optional[Sequence[str]] = None
+
+TENANT_TABLES = ("notes", "note_versions", "note_changes")
+
+
+def upgrade() -> None:
+    """Adds tenant_id to the tenant tables and leads their indexes with it."""
+    # Existing rows belong to the default tenant. A plain ADD COLUMN, not a
+    # batch table copy, which would drop the full-text search triggers
+    for table in TENANT_TABLES:
+        op.add_column(
+            table,
+            sa.Column(
+                "tenant_id",
+                sa.String(length=64),
+                server_default="default",
+                nullable=False,
+            ),
+        )
+
+    op.drop_index("ix_notes_updated_at_id", table_name="notes")
+    op.create_index(
+        "ix_notes_tenant_id_updated_at_id", "notes", ["tenant_id", "updated_at", "id"]
+    )
+    op.create_index("ix_note_changes_tenant_id_id", "note_changes", ["tenant_id", "id"])
+
+
+def downgrade() -> None:
+    """Restores the indexes without tenant and drops the tenant_id columns."""
+    op.drop_index("ix_note_changes_tenant_id_id", table_name="note_changes")
+    op.drop_index("ix_notes_tenant_id_updated_at_id", table_name="notes")
+    op.create_index("ix_notes_updated_at_id", "notes", ["updated_at", "id"])
+
+    for table in TENANT_TABLES:
+        op.drop_column(table, "tenant_id")
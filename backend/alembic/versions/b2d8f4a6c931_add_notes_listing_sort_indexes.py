@@ -0,0 +1,36 @@
+"""add_notes_listing_sort_indexes
+
+Revision ID: b2d8f4a6c931
+Revises: a7c3e5f9d218
+Create Date: 2025-05-27 14:21:08.517349
+
+"""
+
+from typing import Optional, Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b2d8f4a6c931"
+down_revision: Optional[str] = "a7c3e5f9d218"
+branch_labels: Optional[Sequence[str]] = None
+depends_on: Optional[Sequence[str]] = None
+
+
+def upgrade() -> None:
+    """Adds the indexes of the created_at and title sorts of the listing."""
+    op.create_index(
+        "ix_notes_tenant_id_created_at_id", "notes", ["tenant_id", "created_at", "id"]
+    )
+    # (tenant_id, title, id) supersedes the single column title index
+    op.create_index(
+        "ix_notes_tenant_id_title_id", "notes", ["tenant_id", "title", "id"]
+    )
+    op.drop_index(op.f("ix_notes_title"), table_name="notes")
+
+
+def downgrade() -> None:
+    """Restores the single column title index and drops the sort indexes."""
+    op.create_index(op.f("ix_notes_title"), "notes", ["title"], unique=False)
+    op.drop_index("ix_notes_tenant_id_title_id", table_name="notes")
+    op.drop_index("ix_notes_tenant_id_created_at_id", table_name="notes")
@@ -0,0 +1,108 @@
+"""add_notes_full_text_search
+
+Revision ID: c7e2a9b4d813
+Revises: a41c7e9d05b2
+Create Date: 2025-05-09 11:03:27.840562
+
+"""
+
+from typing import Optional, Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c7e2a9b4d813"
+down_revision: Optional[str] = "a41c7e9d05b2"
+branch_labels: Optional[Sequence[str]] = None
+depends_on: Optional[Sequence[str]] = None
+
+SQLITE_UPGRADE = [
+    """
+    CREATE VIRTUAL TABLE notes_fts USING fts5(
+        title, content,
+        content='notes', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER notes_fts_insert AFTER INSERT ON notes BEGIN
+        INSERT INTO notes_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER notes_fts_delete AFTER DELETE ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER notes_fts_update AFTER UPDATE OF title, content ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO notes_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    # Indexes the existing notes
+    "INSERT INTO notes_fts(notes_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS notes_fts_update",
+    "DROP TRIGGER IF EXISTS notes_fts_delete",
+    "DROP TRIGGER IF EXISTS notes_fts_insert",
+    "DROP TABLE IF EXISTS notes_fts",
+]
+
+POSTGRES_UPGRADE = [
+    "ALTER TABLE notes ADD COLUMN search_vector tsvector",
+    """
+    CREATE OR REPLACE FUNCTION notes_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(NEW.content, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER notes_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, content ON notes
+    FOR EACH ROW EXECUTE FUNCTION notes_search_vector_update()
+    """,
+    # Fires the trigger on the existing notes
+    "UPDATE notes SET title = title",
+    "CREATE INDEX ix_notes_search_vector ON notes USING GIN (search_vector)",
+]
+
+POSTGRES_DOWNGRADE = [
+    "DROP INDEX IF EXISTS ix_notes_search_vector",
+    "DROP TRIGGER IF EXISTS notes_search_vector_trigger ON notes",
+    "DROP FUNCTION IF EXISTS notes_search_vector_update()",
+    "ALTER TABLE notes DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(statements: Sequence[str]) -> None:
+    for statement in statements:
+        op.execute(statement)
+
+
+def upgrade() -> None:
+    """Creates the full-text index of the notes and its sync triggers."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        _run(SQLITE_UPGRADE)
+    elif dialect == "postgresql":
+        _run(POSTGRES_UPGRADE)
+
+
+def downgrade() -> None:
+    """Drops the full-text index of the notes and its sync triggers."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        _run(SQLITE_DOWNGRADE)
+    elif dialect == "postgresql":
+        _run(POSTGRES_DOWNGRADE)
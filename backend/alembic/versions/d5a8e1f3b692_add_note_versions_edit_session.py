@@ -0,0 +1,30 @@
+"""add_note_versions_edit_session
+
+Revision ID: d5a8e1f3b692
+Revises: c7e2a9b4d813
+Create Date: 2025-05-14 10:21:37.402915
+
+"""
+
+from typing import Optional, Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d5a8e1f3b692"
+down_revision: Optional[str] = "c7e2a9b4d813"
+branch_labels: Optional[Sequence[str]] = None
+depends_on: Optional[Sequence[str]] = None
+
+
+def upgrade() -> None:
+    """Records the edit session that wrote each version, for coalescing."""
+    with op.batch_alter_table("note_versions", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("edit_session", sa.String(64), nullable=True))
+
+
+def downgrade() -> None:
+    """Drops the edit session of the versions."""
+    with op.batch_alter_table("note_versions", schema=None) as batch_op:
+        batch_op.drop_column("edit_session")
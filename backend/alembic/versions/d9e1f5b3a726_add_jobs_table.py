@@ -0,0 +1,65 @@
+"""add_jobs_table
+
+Revision ID: d9e1f5b3a726
+Revises: b2d8f4a6c931
+Create Date: 2025-06-03 16:12:44.208913
+
+"""
+
+from typing import Optional, Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d9e1f5b3a726"
+down_revision: Optional[str] = "b2d8f4a6c931"
+branch_labels: Optional[Sequence[str]] = None
+depends_on: Optional[Sequence[str]] = None
+
+
+def upgrade() -> None:
+    """Creates the jobs table, the queue of the background jobs."""
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(length=32), nullable=False),
+        sa.Column(
+            "status", sa.String(length=16), server_default="queued", nullable=False
+        ),
+        sa.Column("params", sa.JSON(), nullable=False),
+        sa.Column("progress", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("total", sa.Integer(), nullable=True),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column(
+            "cancel_requested", sa.Boolean(), server_default=sa.false(), nullable=False
+        ),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("(CURRENT_TIMESTAMP)"),
+            nullable=False,
+        ),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("(CURRENT_TIMESTAMP)"),
+            nullable=False,
+        ),
+        sa.Column(
+            "tenant_id", sa.String(length=64), server_default="default", nullable=False
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_jobs")),
+    )
+    op.create_index("ix_jobs_tenant_id_status", "jobs", ["tenant_id", "status"])
+    op.create_index("ix_jobs_status_updated_at", "jobs", ["status", "updated_at"])
+
+
+def downgrade() -> None:
+    """Drops the jobs table."""
+    op.drop_index("ix_jobs_status_updated_at", table_name="jobs")
+    op.drop_index("ix_jobs_tenant_id_status", table_name="jobs")
+    op.drop_table("jobs")
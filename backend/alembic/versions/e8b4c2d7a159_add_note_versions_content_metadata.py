@@ -0,0 +1,87 @@
+"""add_note_versions_content_metadata
+
+Revision ID: e8b4c2d7a159
+Revises: d5a8e1f3b692
+Create Date: 2025-05-16 14:08:52.611730
+
+"""
+
+import hashlib
+from typing import Optional, Sequence
+
+import sqlalchemy as sa
+from alembic import op
+from app.core import delta
+
+# revision identifiers, used by Alembic.
+revision: str = "e8b4c2d7a159"
+down_revision: Optional[str] = "d5a8e1f3b692"
+branch_labels: Optional[Sequence[str]] = None
+depends_on: Optional[Sequence[str]] = None
+
+# Lightweight table definition used by the data migration, independent of
+# the current ORM model
+note_versions = sa.table(
+    "note_versions",
+    sa.column("id", sa.Integer),
+    sa.column("note_id", sa.Integer),
+    sa.column("content_data", sa.LargeBinary),
+    sa.column("base_version_id", sa.Integer),
+    sa.column("content_length", sa.Integer),
+    sa.column("content_hash", sa.String),
+)
+
+
+def upgrade() -> None:
+    """Stores the length and hash of each version's content."""
+    with op.batch_alter_table("note_versions", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("content_length", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("content_hash", sa.String(64), nullable=True))
+
+    connection = op.get_bind()
+    note_ids = connection.execute(
+        sa.select(note_versions.c.note_id).distinct()
+    ).scalars()
+    # One note at a time, so that memory is bounded by the largest history
+    for note_id in list(note_ids):
+        rows = connection.execute(
+            sa.select(
+                note_versions.c.id,
+                note_versions.c.content_data,
+                note_versions.c.base_version_id,
+            )
+            .where(note_versions.c.note_id == note_id)
+            .order_by(note_versions.c.id)
+        ).all()
+        snapshots = {}
+        for version_id, content_data, base_version_id in rows:
+            if base_version_id is None:
+                content = delta.decompress_text(content_data)
+                snapshots[version_id] = content
+            else:
+                content = delta.decompress_delta(
+                    snapshots[base_version_id], content_data
+                )
+            connection.execute(
+                note_versions.update()
+                .where(note_versions.c.id == version_id)
+                .values(
+                    content_length=len(content),
+                    content_hash=hashlib.sha256(content.encode("utf-8")).hexdigest(),
+                )
+            )
+
+    with op.batch_alter_table("note_versions", schema=None) as batch_op:
+        batch_op.alter_column(
+            "content_length", existing_type=sa.Integer(), nullable=False
+        )
+        batch_op.alter_column(
+            "content_hash", existing_type=sa.String(64), nullable=False
+        )
+
+
+def downgrade() -> None:
+    """Drops the content metadata of the versions."""
+    with op.batch_alter_table("note_versions", schema=None) as batch_op:
+        batch_op.drop_column("content_hash")
+        batch_op.drop_column("content_length")
@@ -0,0 +1,41 @@
+"""add_note_changes_table
+
+Revision ID: f3a6d9c1b274
+Revises: e8b4c2d7a159
+Create Date: 2025-05-18 09:42:17.305126
+
+"""
+
+from typing import Optional, Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f3a6d9c1b274"
+down_revision: Optional[str] = "e8b4c2d7a159"
+branch_labels: Optional[Sequence[str]] = None
+depends_on: Optional[Sequence[str]] = None
+
+
+def upgrade() -> None:
+    """Creates the change log read by the change feed."""
+    op.create_table(
+        "note_changes",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("note_id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(length=16), nullable=False),
+        sa.Column(
+            "changed_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("(CURRENT_TIMESTAMP)"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_note_changes")),
+        sqlite_autoincrement=True,
+    )
+
+
+def downgrade() -> None:
+    """Drops the change log."""
+    op.drop_table("note_changes")
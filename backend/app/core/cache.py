@@ -0,0 +1,270 @@
+"""
+Read-through cache of API reads, shared by the workers through Redis or
+kept in process.
+
+Values are serialized bytes, never ORM objects, so a cached entry cannot
+trigger a lazy load or leak a session. Writers call `Cache.invalidate`,
+which deletes the entries they made stale and bumps a generation counter:
+readers include the generation in the keys of results that any write can
+change (the listings), and only fill the cache if no write happened while
+they were reading the database.
+"""
+
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, Optional, Tuple
+
+from .config import settings
+
+# Counter bumped by every write
+GENERATION_KEY = "generation"
+
+
+class CacheBackend:
+    """Storage of a cache: bytes values with a TTL, and counters."""
+
+    name = "none"
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes) -> None:
+        raise NotImplementedError
+
+    async def delete(self, *keys: str) -> None:
+        raise NotImplementedError
+
+    async def counter(self, key: str) -> int:
+        raise NotImplementedError
+
+    async def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+    async def clear(self) -> None:
+        raise NotImplementedError
+
+
+class NullCache(CacheBackend):
+    """Disables caching: nothing is ever stored."""
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    async def set(self, key: str, value: bytes) -> None:
+        pass
+
+    async def delete(self, *keys: str) -> None:
+        pass
+
+    async def counter(self, key: str) -> int:
+        return 0
+
+    async def incr(self, key: str) -> int:
+        return 0
+
+    async def clear(self) -> None:
+        pass
+
+
+class MemoryCache(CacheBackend):
+    """
+    In-process LRU cache with a TTL, private to each worker.
+
+    Args:
+        max_entries: Number of entries above which the least recently used
+            ones are evicted
+        ttl: Seconds an entry is served after being stored
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        # Counters are never evicted: a reset would make old generations
+        # valid again
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    async def counter(self, key: str) -> int:
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    async def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    async def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache shared by all the workers, stored in Redis.
+
+    Args:
+        client: A `redis.asyncio.Redis` client (or a compatible one, such as
+            fakeredis in tests)
+        ttl: Seconds an entry is served after being stored
+        prefix: Prefix of every key, to share a Redis database
+    """
+
+    name = "redis"
+
+    def __init__(self, client, ttl: float, prefix: str = "allonotes:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, ttl: float) -> "RedisCache":
+        # Optional dependency, only needed with CACHE_BACKEND=redis
+        try:
+            from redis import asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError(
+                "CACHE_BACKEND=redis requires the redis package"
+            ) from exc
+        return cls(redis.Redis.from_url(url), ttl)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes) -> None:
+        await self.client.set(self.prefix + key, value, px=int(self.ttl * 1000))
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+    async def counter(self, key: str) -> int:
+        return int(await self.client.get(self.prefix + key) or 0)
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(self.prefix + key)
+
+    async def clear(self) -> None:
+        # The generation counter is kept, like in MemoryCache
+        generation = self.prefix + GENERATION_KEY
+        async for key in self.client.scan_iter(match=self.prefix + "*"):
+            if key.decode() != generation:
+                await self.client.delete(key)
+
+
+def create_backend() -> CacheBackend:
+    """Builds the cache backend selected in the settings."""
+    if settings.CACHE_BACKEND == "memory":
+        return MemoryCache(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL_SECONDS)
+    if settings.CACHE_BACKEND == "redis":
+        if not settings.REDIS_URL:
+            raise RuntimeError("CACHE_BACKEND=redis requires REDIS_URL")
+        return RedisCache.from_url(settings.REDIS_URL, settings.CACHE_TTL_SECONDS)
+    return NullCache()
+
+
+class Cache:
+    """
+    Read-through cache on top of a backend, counting hits and misses.
+
+    Args:
+        backend: The storage of the entries
+    """
+
+    def __init__(self, backend: CacheBackend):
+        self.configure(backend)
+
+    def configure(self, backend: CacheBackend) -> None:
+        """Switches to another backend and resets the counters."""
+        self.backend = backend
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+
+    async def generation(self) -> int:
+        """The number of writes so far, to read before loading a value."""
+        return await self.backend.counter(GENERATION_KEY)
+
+    async def lookup(self, kind: str, key: str) -> Optional[bytes]:
+        """
+        Gets a cached value, counted as a hit or a miss of its kind.
+
+        Args:
+            kind: The kind of value, e.g. "note"
+            key: The key of the value
+
+        Returns:
+            The cached bytes, or None on a miss.
+        """
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses[kind] += 1
+        else:
+            self.hits[kind] += 1
+        return value
+
+    async def fill(self, key: str, value: bytes, generation: int) -> None:
+        """
+        Stores a value loaded after a miss.
+
+        Args:
+            key: The key of the value
+            value: The serialized value
+            generation: The generation read before loading the value. If a
+                write happened since, the value may be stale and is dropped.
+        """
+        if await self.generation() == generation:
+            await self.backend.set(key, value)
+
+    async def store(self, key: str, value: bytes) -> None:
+        """
+        Stores a value no write can make stale, such as a diff between two
+        immutable versions, whatever the generation.
+
+        Args:
+            key: The key of the value
+            value: The serialized value
+        """
+        await self.backend.set(key, value)
+
+    async def invalidate(self, *keys: str) -> None:
+        """
+        Records a write: deletes `keys` and starts a new generation.
+
+        Args:
+            keys: The keys of the values the write made stale
+        """
+        await self.backend.incr(GENERATION_KEY)
+        await self.backend.delete(*keys)
+
+
+cache = Cache(create_backend())
@@ -0,0 +1,275 @@
+"""
+Compression of the responses, negotiated with Accept-Encoding.
+
+`CompressionMiddleware` compresses the textual responses of at least
+COMPRESSION_MIN_SIZE bytes, and streamed ones chunk by chunk. Event
+streams are left alone: an event must not wait in a compressor buffer.
+gzip is always available, br and zstd when the optional brotli and
+zstandard packages are installed.
+
+A compressed response carries the ETag of its uncompressed body with the
+coding appended (see `http_cache.encoded_etag`). The compressed bodies of
+immutable resources, marked by `cache_compressed`, are cached by ETag and
+coding: fetching them again does not compress them again.
+"""
+
+import importlib
+import zlib
+from types import ModuleType
+from typing import Dict, Optional, Sequence, Tuple
+
+from fastapi import Request
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .cache import cache
+from .config import settings
+from .http_cache import encoded_etag
+
+
+def _optional_module(name: str) -> Optional[ModuleType]:
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+brotli = _optional_module("brotli")
+zstandard = _optional_module("zstandard")
+
+# Server preference among the codings a client accepts as much
+PREFERENCE = ("zstd", "br", "gzip")
+# Media types worth compressing, by prefix
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson")
+# Streamed as they happen, uncompressed
+UNBUFFERED_TYPES = ("text/event-stream",)
+# Key of the request state marking an immutable response
+CACHE_STATE_KEY = "cache_compressed"
+
+
+def available_codings() -> Tuple[str, ...]:
+    """Lists the codings this worker can produce, preferred first."""
+    modules = {"zstd": zstandard, "br": brotli}
+    return tuple(
+        coding
+        for coding in PREFERENCE
+        if coding == "gzip" or modules[coding] is not None
+    )
+
+
+def negotiate(accept_encoding: str, codings: Sequence[str]) -> Optional[str]:
+    """
+    Picks the content coding of a response (RFC 9110 12.5.3).
+
+    Args:
+        accept_encoding: The Accept-Encoding header of the request
+        codings: The codings available, preferred first
+
+    Returns:
+        The available coding the client weighs highest, ties going to the
+        preferred one, or None to send the body as is.
+    """
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, *params = (part.strip() for part in item.split(";"))
+        weight = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if name:
+            weights[name.lower()] = weight
+
+    default = weights.get("*", 0.0)
+    best, best_weight = None, 0.0
+    for coding in codings:
+        weight = weights.get(coding, default)
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    # The identity is acceptable unless excluded, and wins over a coding
+    # the client weighs lower
+    identity = weights.get("identity", default if "*" in weights else 1.0)
+    return best if best_weight >= identity else None
+
+
+def compress(coding: str, body: bytes) -> bytes:
+    """
+    Compresses a whole body.
+
+    Args:
+        coding: One of `available_codings()`
+        body: The uncompressed body
+
+    Returns:
+        The body in the given content coding.
+    """
+    if coding == "zstd":
+        return zstandard.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL).compress(
+            body
+        )
+    if coding == "br":
+        return brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return zlib.compress(body, settings.COMPRESSION_GZIP_LEVEL, wbits=31)
+
+
+class StreamCompressor:
+    """
+    Compresses a streamed body chunk by chunk.
+
+    Each chunk is flushed, so that the client can decode everything sent
+    so far.
+    """
+
+    def __init__(self, coding: str):
+        self.coding = coding
+        if coding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(
+                level=settings.COMPRESSION_ZSTD_LEVEL
+            ).compressobj()
+        elif coding == "br":
+            self._compressor = brotli.Compressor(
+                quality=settings.COMPRESSION_BROTLI_QUALITY
+            )
+        else:
+            self._compressor = zlib.compressobj(
+                settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31
+            )
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.coding == "zstd":
+            return self._compressor.compress(data) + self._compressor.flush(
+                zstandard.COMPRESSOBJ_FLUSH_BLOCK
+            )
+        if self.coding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self) -> bytes:
+        if self.coding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def cache_compressed(request: Request) -> None:
+    """
+    Marks the response of a request as immutable for the given ETag.
+
+    Its compressed bodies are then cached, by ETag and coding.
+    """
+    setattr(request.state, CACHE_STATE_KEY, True)
+
+
+class CompressionMiddleware:
+    """
+    Compresses the responses in the coding negotiated with the client.
+
+    A plain ASGI middleware: the start of a compressible response is held
+    until its first chunk, which tells whether the body is complete and
+    large enough. Other responses, event streams included, start at once.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        coding = negotiate(
+            Headers(scope=scope).get("accept-encoding", ""), available_codings()
+        )
+        start: Optional[Message] = None
+        compressor: Optional[StreamCompressor] = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                if self._compressible(message):
+                    start = message
+                else:
+                    await send(message)
+            elif message["type"] != "http.response.body":
+                await send(message)
+            elif start is not None:
+                first, start = start, None
+                compressor = await self._begin(scope, coding, first, message, send)
+            elif compressor is not None:
+                body = compressor.chunk(message.get("body", b""))
+                if not message.get("more_body", False):
+                    body += compressor.finish()
+                await send({**message, "body": body})
+            else:
+                await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def _compressible(start: Message) -> bool:
+        headers = Headers(raw=start.get("headers", []))
+        media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return (
+            "content-encoding" not in headers
+            and media_type.startswith(COMPRESSIBLE_TYPES)
+            and media_type not in UNBUFFERED_TYPES
+        )
+
+    async def _begin(
+        self,
+        scope: Scope,
+        coding: Optional[str],
+        start: Message,
+        message: Message,
+        send: Send,
+    ) -> Optional[StreamCompressor]:
+        """Sends the start and first chunk of a response, compressed or not."""
+        headers = MutableHeaders(scope=start)
+        # The body depends on Accept-Encoding, even when sent as is
+        headers.add_vary_header("Accept-Encoding")
+
+        body = message.get("body", b"")
+        streamed = message.get("more_body", False)
+        if coding is None or (
+            not streamed and len(body) < settings.COMPRESSION_MIN_SIZE
+        ):
+            await send(start)
+            await send(message)
+            return None
+
+        etag = headers.get("etag")
+        if streamed:
+            compressor = StreamCompressor(coding)
+            del headers["content-length"]
+            headers["content-encoding"] = coding
+            if etag is not None:
+                headers["etag"] = encoded_etag(etag, coding)
+            await send(start)
+            await send({**message, "body": compressor.chunk(body)})
+            return compressor
+
+        key = None
+        if etag is not None and scope.get("state", {}).get(CACHE_STATE_KEY):
+            key = f"compressed:{coding}:{etag}"
+        compressed = await cache.lookup("compressed", key) if key else None
+        if compressed is None:
+            compressed = compress(coding, body)
+            if key is not None:
+                await cache.store(key, compressed)
+        if len(compressed) >= len(body):
+            # Incompressible: not worth the decoding
+            await send(start)
+            await send(message)
+            return None
+
+        headers["content-encoding"] = coding
+        headers["content-length"] = str(len(compressed))
+        if etag is not None:
+            headers["etag"] = encoded_etag(etag, coding)
+        await send(start)
+        await send({**message, "body": compressed})
+        return None
@@ -1,3 +1,5 @@
+from typing import Dict, List, Literal, Optional
+
 from pydantic_settings import BaseSettings
 
 
@@ -5,6 +7,140 @@ class Settings(BaseSettings):
     # SQLITE Config
     DATABASE_URL: str
 
+    # Tenants (X-Tenant-ID header): rejects requests without it, instead of
+    # serving them the "default" tenant
+    TENANT_REQUIRED: bool = False
+    # Tenants moved to a database of their own, by tenant ID (JSON in the
+    # environment), migrated like the main one. The others share
+    # DATABASE_URL
+    TENANT_DATABASES: Dict[str, str] = {}
+
+    # Async database stack: serves the API through an AsyncSession on
+    # aiosqlite / asyncpg instead of a blocking Session on the threadpool
+    DB_ASYNC: bool = False
+    # Defaults to DATABASE_URL with the matching async driver
+    ASYNC_DATABASE_URL: Optional[str] = None
+
+    # Connection pool (ignored for in-memory SQLite databases)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    # Seconds after which a connection is replaced, -1 to keep them forever
+    DB_POOL_RECYCLE: int = -1
+    # Tests connections with a lightweight query before handing them out
+    DB_POOL_PRE_PING: bool = False
+
+    # SQLite pragmas applied to every new connection. WAL lets readers run
+    # while a writer commits, NORMAL sync is safe in WAL mode
+    SQLITE_JOURNAL_MODE: Literal["DELETE", "TRUNCATE", "PERSIST", "WAL"] = "WAL"
+    SQLITE_SYNCHRONOUS: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = "NORMAL"
+    # Milliseconds a connection waits for a lock before raising "locked"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    # Page cache per connection, negative values are in KiB
+    SQLITE_CACHE_SIZE: int = -20000
+    # Bytes of the database file memory mapped, 0 disables it
+    SQLITE_MMAP_SIZE: int = 128 * 1024 * 1024
+
+    # Maximum number of items accepted by a bulk endpoint
+    BULK_MAX_ITEMS: int = 1000
+
+    # Number of notes fetched and serialized at a time by the NDJSON export
+    EXPORT_BATCH_SIZE: int = 500
+
+    # NDJSON import: notes inserted per transaction, maximum size of a line
+    # and number of line errors detailed in the response
+    IMPORT_BATCH_SIZE: int = 500
+    IMPORT_MAX_LINE_BYTES: int = 10 * 1024 * 1024
+    IMPORT_MAX_REPORTED_ERRORS: int = 100
+
+    # Serializes the listings with orjson straight from the rows instead of
+    # validating a Pydantic model per item (same JSON, requires orjson)
+    FAST_JSON: bool = False
+
+    # Length of the content preview sent by the summary listing
+    NOTE_PREVIEW_CHARS: int = 200
+
+    # Read-through cache of notes: "memory" is an LRU private to each
+    # worker, "redis" is shared by all of them (requires REDIS_URL)
+    CACHE_BACKEND: Literal["none", "memory", "redis"] = "memory"
+    CACHE_TTL_SECONDS: float = 60
+    CACHE_MAX_ENTRIES: int = 10000
+    REDIS_URL: Optional[str] = None
+
+    # Versions storage: one full snapshot every N versions, deltas in between
+    VERSION_SNAPSHOT_INTERVAL: int = 10
+
+    # Updates sent with the same X-Edit-Session header less than this many
+    # seconds after the previous version of the note do not write a new one
+    # (autosaves), 0 versions every update
+    VERSION_COALESCE_SECONDS: float = 0
+
+    # Versions retention, enforced by the compaction task. The last
+    # VERSION_KEEP_LAST versions of a note are always kept; older ones are
+    # thinned to one per bucket after VERSION_THIN_AFTER_DAYS and deleted
+    # after VERSION_MAX_AGE_DAYS. With only VERSION_KEEP_LAST set, it caps
+    # the history. Everything is kept by default.
+    VERSION_KEEP_LAST: int = 0
+    VERSION_THIN_AFTER_DAYS: Optional[float] = None
+    VERSION_THIN_BUCKET: Literal["hour", "day"] = "day"
+    VERSION_MAX_AGE_DAYS: Optional[float] = None
+    # Versions deleted per transaction, so writers never wait long
+    COMPACTION_BATCH_SIZE: int = 500
+    # Seconds between two runs in the background of the API, 0 disables it
+    # (the task can also run from cron: python -m app.tasks.compaction).
+    # With several workers, each database is compacted by one at a time
+    COMPACTION_INTERVAL_SECONDS: float = 0
+
+    # Change feed (GET /api/v1/notes/changes): seconds between two reads of
+    # the change log by an idle stream, to see the writes of the other
+    # workers (those of its own worker are pushed at once), seconds between
+    # keep-alive comments, and changes read at a time
+    CHANGE_FEED_POLL_SECONDS: float = 1
+    CHANGE_FEED_HEARTBEAT_SECONDS: float = 15
+    CHANGE_FEED_BATCH_SIZE: int = 100
+    # Default number of notes (or changes) read by a sync request
+    SYNC_PAGE_SIZE: int = 500
+    # Changes older than this are pruned by the compaction task, None keeps
+    # them all. Clients resuming from a pruned change, in the feed or the
+    # sync, must reload the notes
+    CHANGE_LOG_MAX_AGE_DAYS: Optional[float] = 30
+
+    # Per request instrumentation: latency, response size and SQL statements
+    # recorded by route and served on /metrics, and a Server-Timing header
+    # with the database time of each response
+    METRICS_ENABLED: bool = True
+    SERVER_TIMING: bool = True
+
+    # Response compression negotiated with Accept-Encoding: zstd and br when
+    # the optional zstandard and brotli packages are installed, gzip always.
+    # Smaller bodies are sent as is, compressing them costs more than it saves
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024
+    # Levels favouring speed: bodies are compressed on each request, except
+    # the cached ones of immutable resources
+    COMPRESSION_GZIP_LEVEL: int = 4
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_ZSTD_LEVEL: int = 3
+
+    # Background jobs (POST /api/v1/jobs/): run by a pool of threads in each
+    # worker, at most JOBS_MAX_WORKERS at a time. A tenant may have
+    # JOBS_MAX_QUEUED jobs waiting for a thread
+    JOBS_MAX_WORKERS: int = 2
+    JOBS_MAX_QUEUED: int = 100
+    # Directory of the files written by the export jobs
+    JOBS_RESULTS_DIR: str = "./job_results"
+    # Finished jobs and their files are deleted after this many days by the
+    # compaction task, None keeps them all
+    JOBS_MAX_AGE_DAYS: Optional[float] = 7
+    # Tenants allowed to enqueue the jobs processing a whole database
+    # (reindex), besides those with a database of their own
+    JOBS_ADMIN_TENANTS: List[str] = []
+    # On startup, runs the jobs left queued by the previous run of the API,
+    # and those left running without progress for JOBS_STALE_SECONDS (their
+    # worker died)
+    JOBS_RESUME_ON_STARTUP: bool = True
+    JOBS_STALE_SECONDS: float = 600
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -0,0 +1,66 @@
+import json
+import zlib
+from difflib import SequenceMatcher
+from typing import List, Union
+
+# A delta is a list of operations applied to the lines of a base text:
+# [start, end] copies base lines start..end, a string inserts new text.
+DeltaOp = Union[List[int], str]
+
+
+def compress_text(text: str) -> bytes:
+    """Compresses a full text snapshot."""
+    return zlib.compress(text.encode("utf-8"))
+
+
+def decompress_text(data: bytes) -> str:
+    """Decompresses a snapshot produced by `compress_text`."""
+    return zlib.decompress(data).decode("utf-8")
+
+
+def make_delta(base: str, target: str) -> List[DeltaOp]:
+    """
+    Computes a line based delta turning `base` into `target`.
+
+    Args:
+        base: The text the delta is applied to
+        target: The text the delta produces
+
+    Returns:
+        The list of delta operations.
+    """
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    matcher = SequenceMatcher(None, base_lines, target_lines, autojunk=False)
+
+    ops: List[DeltaOp] = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:  # replace and insert bring new lines, delete brings none
+            ops.append("".join(target_lines[j1:j2]))
+    return ops
+
+
+def apply_delta(base: str, ops: List[DeltaOp]) -> str:
+    """Rebuilds the target text of a delta from its base text."""
+    base_lines = base.splitlines(keepends=True)
+    parts = []
+    for op in ops:
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            start, end = op
+            parts.extend(base_lines[start:end])
+    return "".join(parts)
+
+
+def compress_delta(base: str, target: str) -> bytes:
+    """Computes and compresses the delta turning `base` into `target`."""
+    ops = make_delta(base, target)
+    return zlib.compress(json.dumps(ops, separators=(",", ":")).encode("utf-8"))
+
+
+def decompress_delta(base: str, data: bytes) -> str:
+    """Rebuilds a text from its base and a delta produced by `compress_delta`."""
+    return apply_delta(base, json.loads(zlib.decompress(data)))
@@ -0,0 +1,61 @@
+import difflib
+from typing import Any, Dict, List
+
+
+def _lines(text: str) -> List[str]:
+    return text.splitlines(keepends=True)
+
+
+def unified_diff(
+    base: str, target: str, from_label: str, to_label: str, context: int = 3
+) -> str:
+    """
+    Renders a line based unified diff, as `diff -u` would.
+
+    Args:
+        base: The old text
+        target: The new text
+        from_label: Name of the old text in the header
+        to_label: Name of the new text in the header
+        context: Number of unchanged lines shown around each change
+
+    Returns:
+        The diff, empty when both texts are equal.
+    """
+    lines = difflib.unified_diff(
+        _lines(base), _lines(target), from_label, to_label, n=context
+    )
+    # Lines without a final newline would run into the next one
+    return "".join(line if line.endswith("\n") else line + "\n" for line in lines)
+
+
+def diff_ops(base: str, target: str) -> List[Dict[str, Any]]:
+    """
+    Computes a structured line based diff.
+
+    Args:
+        base: The old text
+        target: The new text
+
+    Returns:
+        One operation per run of lines, in order, with its line ranges
+        (0-based, end exclusive) and the lines it removes and adds, none
+        for an "equal" run.
+    """
+    base_lines, target_lines = _lines(base), _lines(target)
+    matcher = difflib.SequenceMatcher(None, base_lines, target_lines, autojunk=False)
+    ops: List[Dict[str, Any]] = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        changed = tag != "equal"
+        ops.append(
+            {
+                "op": tag,
+                "from_start": i1,
+                "from_end": i2,
+                "to_start": j1,
+                "to_end": j2,
+                "removed": base_lines[i1:i2] if changed else [],
+                "added": target_lines[j1:j2] if changed else [],
+            }
+        )
+    return ops
@@ -0,0 +1,138 @@
+import hashlib
+import re
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, List, Optional
+
+from fastapi import Request, Response, status
+
+# Content coding appended to the ETag of a compressed representation
+_CODING_SUFFIX = re.compile(r'-[a-z]+"$')
+
+
+class PreconditionFailedError(Exception):
+    """Raised when the If-Match header of a write matches no current ETag."""
+
+
+def make_etag(body: bytes) -> str:
+    """
+    Builds a strong ETag from the serialized representation of a resource.
+
+    Args:
+        body: The exact bytes sent for the resource
+
+    Returns:
+        A quoted entity tag, e.g. '"3f2a..."'.
+    """
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def encoded_etag(etag: str, coding: str) -> str:
+    """
+    Derives the ETag of a compressed representation from the identity one.
+
+    The representations differ, so their strong ETags must too. Conditional
+    headers carrying either of them match the resource (see `etag_matches`).
+
+    Args:
+        etag: The ETag of the uncompressed body
+        coding: The content coding, e.g. "gzip"
+
+    Returns:
+        The ETag with the coding appended inside the quotes.
+    """
+    return f'{etag[:-1]}-{coding}"'
+
+
+def http_date(value: datetime) -> str:
+    """Formats a datetime as an HTTP date (naive datetimes are UTC)."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def _parse_etags(header: str) -> List[str]:
+    # Tags of compressed representations stand for the resource
+    return [
+        _CODING_SUFFIX.sub('"', tag.strip()) for tag in header.split(",") if tag.strip()
+    ]
+
+
+def etag_matches(header: Optional[str], etag: str, weak: bool = False) -> bool:
+    """
+    Tells whether an If-Match or If-None-Match header matches an ETag.
+
+    Args:
+        header: The header value: "*" or a list of entity tags
+        etag: The current ETag of the resource
+        weak: Uses the weak comparison (If-None-Match), which ignores the
+            W/ prefix. The strong one (If-Match) never matches a weak tag.
+
+    Returns:
+        True if one of the tags matches.
+    """
+    if not header:
+        return False
+    tags = _parse_etags(header)
+    if "*" in tags:
+        return True
+    if weak:
+        return etag in [tag.removeprefix("W/") for tag in tags]
+    return etag in tags
+
+
+def is_not_modified(
+    request: Request, etag: str, last_modified: Optional[datetime] = None
+) -> bool:
+    """
+    Evaluates the conditional headers of a GET request (RFC 9110 13.2.2).
+
+    If-None-Match takes precedence; If-Modified-Since is only used without
+    it, and only when the resource has a modification date.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag, weak=True)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):  # Invalid dates are ignored
+        return False
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    # HTTP dates have a one second resolution
+    return last_modified.replace(microsecond=0) <= since
+
+
+def conditional_response(
+    request: Request,
+    body: bytes,
+    last_modified: Optional[datetime] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """
+    Sends a JSON body with its validators, or 304 if the client has it.
+
+    Args:
+        request: The GET request, read for its conditional headers
+        body: The serialized JSON body
+        last_modified: The modification date of the resource, if it has a
+            reliable one
+        headers: Other headers to send, also with a 304
+
+    Returns:
+        A 200 response with the body, or an empty 304 Not Modified.
+    """
+    etag = make_etag(body)
+    response_headers = {**(headers or {}), "ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        response_headers["Last-Modified"] = http_date(last_modified)
+
+    if is_not_modified(request, etag, last_modified):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=response_headers
+        )
+    return Response(body, media_type="application/json", headers=response_headers)
@@ -0,0 +1,152 @@
+"""
+Per request performance instrumentation.
+
+`MetricsMiddleware` times each request, and SQLAlchemy cursor hooks count
+the statements it runs and the time spent in the database. They are
+recorded per route in the histograms of the metrics registry (served by
+/metrics), and sent to the client in a Server-Timing header. A route
+whose statements per request grow with the data is an N+1 query.
+
+The statistics of the current request live in a context variable: the
+threadpool and `AsyncSession.run_sync` both run the CRUD functions in the
+context of the request.
+"""
+
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import settings
+from .metrics import COUNT_BUCKETS, SIZE_BUCKETS, Histogram, registry
+
+# Label of requests matching no route, so that unknown paths cannot create
+# series without bound
+UNMATCHED_ROUTE = "unmatched"
+
+request_duration = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time to serve a request, its body included",
+        ("method", "route", "status"),
+    )
+)
+response_size = registry.register(
+    Histogram(
+        "http_response_size_bytes",
+        "Size of the response bodies",
+        ("method", "route"),
+        buckets=SIZE_BUCKETS,
+    )
+)
+db_statements = registry.register(
+    Histogram(
+        "db_statements_per_request",
+        "SQL statements run by a request",
+        ("method", "route"),
+        buckets=COUNT_BUCKETS,
+    )
+)
+db_duration = registry.register(
+    Histogram(
+        "db_duration_seconds_per_request",
+        "Time a request spent running SQL statements",
+        ("method", "route"),
+    )
+)
+
+
+class RequestStats:
+    """Database work of a request, filled by the cursor hooks."""
+
+    def __init__(self) -> None:
+        self.statements = 0
+        self.db_seconds = 0.0
+
+    def server_timing(self, total_seconds: float) -> str:
+        """Renders the Server-Timing header value, durations in milliseconds."""
+        return (
+            f'db;desc="{self.statements} statements";dur={self.db_seconds * 1000:.1f}, '
+            f"total;dur={total_seconds * 1000:.1f}"
+        )
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar(
+    "current_request", default=None
+)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_request.get() is not None:
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_request.get()
+    started = conn.info.get("query_started_at")
+    if stats is None or not started:
+        return
+    stats.statements += 1
+    stats.db_seconds += time.perf_counter() - started.pop()
+
+
+def install_sql_hooks() -> None:
+    """Listens to the statements of every engine (idempotent)."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """
+    Records the latency, response size and database work of each request.
+
+    A plain ASGI middleware: streaming responses are measured until their
+    last chunk, and the endpoints run in the context it sets.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_measured(message: Message) -> None:
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.SERVER_TIMING:
+                    # Streamed bodies are not over yet: only the work done
+                    # before the first byte is reported
+                    MutableHeaders(scope=message).append(
+                        "Server-Timing",
+                        stats.server_timing(time.perf_counter() - started),
+                    )
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_measured)
+        finally:
+            current_request.reset(token)
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            labels = {"method": scope["method"], "route": route}
+            request_duration.observe(
+                time.perf_counter() - started, status=str(status), **labels
+            )
+            response_size.observe(size, **labels)
+            db_statements.observe(stats.statements, **labels)
+            db_duration.observe(stats.db_seconds, **labels)
@@ -0,0 +1,144 @@
+"""
+Histograms rendered in the Prometheus text format.
+
+A minimal in-process registry, enough for the request metrics of
+core/instrumentation.py without a client library. Like the cache
+counters, the values belong to the worker serving /metrics: each worker
+is scraped as its own target.
+"""
+
+from typing import Dict, Iterable, List, Sequence, Tuple, TypeVar
+
+# Seconds, from a fast cache hit to a slow export
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Statements run by a request: more than a few is an N+1 query
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# Response bodies, in bytes
+SIZE_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+def _escape(value: str, quote: bool = True) -> str:
+    value = value.replace("\\", "\\\\").replace("\n", "\\n")
+    # Only label values are quoted
+    return value.replace('"', '\\"') if quote else value
+
+
+def _labels(names: Sequence[str], values: Sequence[str], **extra: str) -> str:
+    pairs = [*zip(names, values), *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(v))}"' for name, v in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    """A named family of series, one per combination of label values."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {_escape(self.documentation, quote=False)}",
+            f"# TYPE {self.name} {self.kind}",
+            *self.samples(),
+        ]
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class Histogram(Metric):
+    """
+    Counts observations in cumulative buckets, with their sum and count.
+
+    Args:
+        buckets: Increasing upper bounds, +Inf is added
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        # Per series: the count of each bucket (not cumulative), then the sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        counts, total = self._series.setdefault(
+            key, ([0] * (len(self.buckets) + 1), [0.0])
+        )
+        index = next(
+            (i for i, bound in enumerate(self.buckets) if value <= bound),
+            len(self.buckets),
+        )
+        counts[index] += 1
+        total[0] += value
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series is not None else 0
+
+    def samples(self) -> Iterable[str]:
+        names = self.label_names
+        for key, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = bound if isinstance(bound, str) else _number(bound)
+                yield f"{self.name}_bucket{_labels(names, key, le=le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(names, key)} {_number(total[0])}"
+            yield f"{self.name}_count{_labels(names, key)} {cumulative}"
+
+    def clear(self) -> None:
+        self._series.clear()
+
+
+M = TypeVar("M", bound=Metric)
+
+
+class Registry:
+    """The metrics exposed by /metrics."""
+
+    def __init__(self) -> None:
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: M) -> M:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Renders every metric in the Prometheus text exposition format."""
+        return "".join(metric.render() for metric in self.metrics)
+
+    def clear(self) -> None:
+        """Resets every series, e.g. between tests."""
+        for metric in self.metrics:
+            metric.clear()
+
+
+registry = Registry()
+
+# Content type of the text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
@@ -0,0 +1,44 @@
+from typing import AsyncIterable, AsyncIterator, Optional
+
+
+async def iter_lines(
+    chunks: AsyncIterable[bytes], max_line_bytes: int
+) -> AsyncIterator[Optional[bytes]]:
+    """
+    Splits a stream of bytes into lines, without reading it all in memory.
+
+    Only the current line is buffered. A line longer than `max_line_bytes`
+    is dropped as it is read and yielded as None, so that a body without
+    newlines cannot fill the memory.
+
+    Args:
+        chunks: The body chunks, e.g. `request.stream()`
+        max_line_bytes: The size above which a line is rejected
+
+    Returns:
+        An async iterator of the lines, without their line terminator, and
+        None for each rejected line.
+    """
+    buffer = bytearray()
+    too_long = False
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end < 0:
+                break
+            if not too_long:
+                buffer += chunk[start:end]
+            yield None if too_long or len(buffer) > max_line_bytes else bytes(buffer)
+            buffer.clear()
+            too_long = False
+            start = end + 1
+        if not too_long:
+            buffer += chunk[start:]
+            if len(buffer) > max_line_bytes:
+                buffer.clear()
+                too_long = True
+    if too_long:
+        yield None
+    elif buffer:
+        yield bytes(buffer)
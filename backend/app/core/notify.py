@@ -0,0 +1,58 @@
+"""
+Wakes up the change feed streams of this worker when a note is written.
+
+Only the writes served by the same process are notified: streams also poll
+the change log every CHANGE_FEED_POLL_SECONDS to pick up the others.
+"""
+
+import asyncio
+from contextlib import contextmanager
+from typing import Iterator, Set
+
+
+class ChangeNotifier:
+    """Set of the events of the listening streams, set on each write."""
+
+    def __init__(self) -> None:
+        self._listeners: Set[asyncio.Event] = set()
+
+    @contextmanager
+    def listen(self) -> Iterator[asyncio.Event]:
+        """
+        Registers a listener for the duration of a stream.
+
+        The listener should be cleared before reading the change log, then
+        awaited: a write in between sets it, and is never missed.
+        """
+        woken = asyncio.Event()
+        self._listeners.add(woken)
+        try:
+            yield woken
+        finally:
+            self._listeners.discard(woken)
+
+    def notify(self) -> None:
+        """Wakes up every listener, called after a write is committed."""
+        for woken in self._listeners:
+            woken.set()
+
+    @property
+    def listeners(self) -> int:
+        return len(self._listeners)
+
+
+async def wait_for(woken: asyncio.Event, timeout: float) -> bool:
+    """
+    Waits for a listener to be woken up.
+
+    Returns:
+        Whether it was, False when the timeout expired first.
+    """
+    try:
+        await asyncio.wait_for(woken.wait(), timeout)
+    except asyncio.TimeoutError:
+        return False
+    return True
+
+
+change_notifier = ChangeNotifier()
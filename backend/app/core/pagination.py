@@ -0,0 +1,95 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Encodes the keyset values of the last row of a page into an opaque cursor.
+
+    Args:
+        values: The ordering key of the row (datetimes are sent as ISO strings)
+
+    Returns:
+        A URL-safe string to send back as `cursor` to fetch the next page.
+    """
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    Decodes a cursor produced by `encode_cursor`.
+
+    Args:
+        cursor: The opaque cursor received from the client
+        size: The number of keyset values the caller expects
+
+    Returns:
+        The list of keyset values.
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError as exc:  # includes binascii.Error
+        raise InvalidCursorError("Invalid pagination cursor") from exc
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursorError("Invalid pagination cursor")
+    return values
+
+
+def parse_cursor_datetime(value: Any) -> datetime:
+    """Parses a datetime stored in a cursor, rejecting anything else."""
+    if not isinstance(value, str):
+        raise InvalidCursorError("Invalid pagination cursor")
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError as exc:
+        raise InvalidCursorError("Invalid pagination cursor") from exc
+
+
+def parse_cursor_id(value: Any) -> int:
+    """Parses a row id stored in a cursor, rejecting anything else."""
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise InvalidCursorError("Invalid pagination cursor")
+    return value
+
+
+def next_cursor(
+    items: Sequence[Any], limit: int, key: Callable[[Any], Tuple[Any, ...]]
+) -> Optional[str]:
+    """
+    Builds the cursor of the page following `items`.
+
+    Returns None when the page is not full, meaning there is nothing left.
+    """
+    if limit <= 0 or len(items) < limit:
+        return None
+    return encode_cursor(*key(items[-1]))
+
+
+class Page(NamedTuple):
+    """A serialized page of a listing and the cursor of the next one."""
+
+    body: bytes
+    next_cursor: Optional[str] = None
+
+    def to_bytes(self) -> bytes:
+        """Packs the page into one value, e.g. to cache it."""
+        # Cursors are base64url: they never contain a newline
+        return (self.next_cursor or "").encode() + b"\n" + self.body
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Page":
+        """Unpacks a page packed by `to_bytes`."""
+        cursor, _, body = data.partition(b"\n")
+        return cls(body, cursor.decode() or None)
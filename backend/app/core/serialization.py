@@ -0,0 +1,28 @@
+"""
+JSON encoding of the fast serialization path (FAST_JSON).
+
+Rows are dumped by orjson as plain dicts, without building a Pydantic
+model per object. The output is byte for byte the one of Pydantic's
+`model_dump_json` for the same fields in the same order: compact, UTF-8,
+naive datetimes without offset and UTC ones with a "Z".
+"""
+
+from typing import Any
+
+
+def dumps(value: Any) -> bytes:
+    """
+    Serializes lists and dicts of JSON types and datetimes with orjson.
+
+    Args:
+        value: The value to serialize
+
+    Returns:
+        The JSON bytes.
+    """
+    # Optional dependency, only needed with FAST_JSON enabled
+    try:
+        import orjson
+    except ImportError as exc:
+        raise RuntimeError("FAST_JSON requires the orjson package") from exc
+    return orjson.dumps(value, option=orjson.OPT_UTC_Z)
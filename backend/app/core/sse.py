@@ -0,0 +1,35 @@
+from typing import Optional
+
+
+def format_event(
+    data: str, event: Optional[str] = None, event_id: Optional[int] = None
+) -> str:
+    """
+    Renders a Server-Sent Event.
+
+    Args:
+        data: The payload, split into one data line per line
+        event: The event type, "message" for the client when omitted
+        event_id: The id the client sends back in Last-Event-ID when it
+            reconnects
+
+    Returns:
+        The event fields, ended by a blank line.
+    """
+    lines = []
+    if event is not None:
+        lines.append(f"event: {event}")
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+def format_comment(text: str = "") -> str:
+    """Renders an SSE comment line, ignored by clients (a keep-alive)."""
+    return f": {text}\n\n"
+
+
+def format_retry(milliseconds: int) -> str:
+    """Renders the reconnection delay a client waits after a disconnection."""
+    return f"retry: {milliseconds}\n\n"
@@ -1,8 +1,59 @@
+from . import aio, listing  # noqa: F401
+from .bulk import (  # noqa: F401
+    bulk_create_notes,
+    bulk_delete_notes,
+    bulk_update_notes,
+    import_notes,
+)
+from .changes import (  # noqa: F401
+    get_change_bounds,
+    get_changes,
+    prune_changes,
+    record_changes,
+)
+from .export import export_notes, write_export  # noqa: F401
+from .job import (  # noqa: F401
+    DATABASE_JOB_KINDS,
+    FINISHED_STATUSES,
+    JOB_KINDS,
+    JobFinishedError,
+    JobNotFinishedError,
+    cancel_job,
+    claim_job,
+    count_queued_jobs,
+    create_job,
+    delete_job,
+    finish_job,
+    get_job,
+    prune_jobs,
+    requeue_job,
+    resumable_jobs,
+    update_job_progress,
+)
 from .note import (  # noqa: F401
+    SORT_FIELDS,
+    SUMMARY_FIELDS,
+    NoteListing,
     create_note,
     delete_note,
     get_note,
+    get_note_rows,
+    get_note_summaries,
     get_notes,
+    make_preview,
+    note_cursor_key,
+    serialize_note,
     update_note,
 )
-from .note_version import get_note_versions, restore_note_version  # noqa: F401
+from .note_version import (  # noqa: F401
+    count_note_versions,
+    diff_note_versions,
+    get_note_version,
+    get_note_versions,
+    get_version_contents,
+    restore_note_version,
+    version_cursor_key,
+)
+from .retention import compact_versions  # noqa: F401
+from .search import search_notes  # noqa: F401
+from .sync import ExpiredSyncTokenError, sync_notes  # noqa: F401
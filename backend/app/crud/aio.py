@@ -0,0 +1,421 @@
+"""
+Async versions of the CRUD functions, used by the endpoints.
+
+The sync implementations in note.py and note_version.py stay the single
+source of the data access logic. With an AsyncSession they run through
+`AsyncSession.run_sync` on the async driver; with a sync Session they run
+on the threadpool (see `run_db`).
+
+Returned models are fully loaded before leaving the session's greenlet,
+so serializing them never triggers a lazy load.
+
+`get_note` and the notes listings read through the cache (see
+core/cache.py); listings are returned serialized, as pages (see listing.py).
+Every write invalidates the entries it makes stale, and wakes up the
+change feed streams (see `stream_changes`).
+"""
+
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from .. import models, schemas
+from ..core.cache import cache
+from ..core.config import settings
+from ..core.notify import change_notifier, wait_for
+from ..core.pagination import Page
+from ..db.session import (
+    DbSession,
+    SessionFactory,
+    detached_sessionmaker,
+    run_db,
+    run_db_detached,
+)
+from ..db.tenant import tenant_of
+from . import bulk as bulk_crud
+from . import changes as changes_crud
+from . import job as job_crud
+from . import listing as listing_crud
+from . import note as note_crud
+from . import note_version as version_crud
+from . import search as search_crud
+from . import sync as sync_crud
+
+
+def note_cache_key(db: DbSession, note_id: int) -> str:
+    # Every key holds the tenant: each one has its own IDs and notes
+    return f"note:{tenant_of(db)}:{note_id}"
+
+
+async def _written(*keys: str) -> None:
+    # Called once a write is committed
+    await cache.invalidate(*keys)
+    change_notifier.notify()
+
+
+async def get_note(db: DbSession, note_id: int) -> Optional[schemas.Note]:
+    """Cached version of `crud.get_note`, returning the Note schema."""
+    key = note_cache_key(db, note_id)
+    cached = await cache.lookup("note", key)
+    if cached is not None:
+        return schemas.Note.model_validate_json(cached)
+
+    generation = await cache.generation()
+    db_note = await run_db(db, note_crud.get_note, note_id)
+    # Missing notes are not cached: their id may be assigned again
+    if db_note is None:
+        return None
+    note = schemas.Note.model_validate(db_note)
+    await cache.fill(key, note.model_dump_json().encode(), generation)
+    return note
+
+
+async def get_notes_page(
+    db: DbSession,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    listing: note_crud.NoteListing = note_crud.NoteListing(),
+) -> Page:
+    """Cached version of `crud.listing.notes_page`."""
+    # Any write can change a listing: the key belongs to the generation
+    generation = await cache.generation()
+    key = (
+        f"notes:{tenant_of(db)}:{generation}:{skip}:{limit}:{cursor}"
+        f":{listing.cache_key()}"
+    )
+    cached = await cache.lookup("notes", key)
+    if cached is not None:
+        return Page.from_bytes(cached)
+
+    page = await run_db(
+        db,
+        listing_crud.notes_page,
+        skip=skip,
+        limit=limit,
+        cursor=cursor,
+        listing=listing,
+    )
+    await cache.fill(key, page.to_bytes(), generation)
+    return page
+
+
+async def get_note_summaries_page(
+    db: DbSession,
+    fields: Sequence[str] = note_crud.SUMMARY_FIELDS,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    listing: note_crud.NoteListing = note_crud.NoteListing(),
+) -> Page:
+    """Cached version of `crud.listing.note_summaries_page`."""
+    generation = await cache.generation()
+    key = (
+        f"summaries:{tenant_of(db)}:{generation}:{','.join(fields)}"
+        f":{skip}:{limit}:{cursor}:{listing.cache_key()}"
+    )
+    cached = await cache.lookup("summaries", key)
+    if cached is not None:
+        return Page.from_bytes(cached)
+
+    page = await run_db(
+        db,
+        listing_crud.note_summaries_page,
+        fields,
+        skip=skip,
+        limit=limit,
+        cursor=cursor,
+        listing=listing,
+    )
+    await cache.fill(key, page.to_bytes(), generation)
+    return page
+
+
+async def create_note(db: DbSession, note: schemas.NoteCreate) -> models.Note:
+    """Async version of `crud.create_note`."""
+    db_note = await run_db(db, note_crud.create_note, note)
+    await _written()
+    return db_note
+
+
+async def update_note(
+    db: DbSession,
+    note_id: int,
+    note_update: schemas.NoteUpdate,
+    if_match: Optional[str] = None,
+    edit_session: Optional[str] = None,
+) -> Optional[Tuple[models.Note, bool]]:
+    """Async version of `crud.update_note`."""
+    updated = await run_db(
+        db,
+        note_crud.update_note,
+        note_id,
+        note_update,
+        if_match=if_match,
+        edit_session=edit_session,
+    )
+    if updated is not None:
+        await _written(note_cache_key(db, note_id))
+    return updated
+
+
+async def delete_note(db: DbSession, note_id: int) -> Optional[models.Note]:
+    """Async version of `crud.delete_note`."""
+    db_note = await run_db(db, note_crud.delete_note, note_id)
+    if db_note is not None:
+        await _written(note_cache_key(db, note_id))
+    return db_note
+
+
+async def get_note_versions_page(
+    db: DbSession,
+    note_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Page:
+    """Async version of `crud.listing.note_versions_page`."""
+    return await run_db(
+        db,
+        listing_crud.note_versions_page,
+        note_id,
+        skip=skip,
+        limit=limit,
+        cursor=cursor,
+    )
+
+
+async def get_note_version_summaries_page(
+    db: DbSession,
+    note_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Page:
+    """Async version of `crud.listing.note_version_summaries_page`."""
+    return await run_db(
+        db,
+        listing_crud.note_version_summaries_page,
+        note_id,
+        skip=skip,
+        limit=limit,
+        cursor=cursor,
+    )
+
+
+async def get_note_version(
+    db: DbSession, note_id: int, version_id: int
+) -> Optional[schemas.NoteVersion]:
+    """Async version of `crud.get_note_version`, returning the schema."""
+    version = await run_db(db, version_crud.get_note_version, note_id, version_id)
+    if version is None:
+        return None
+    return schemas.NoteVersion.model_validate(version)
+
+
+async def restore_note_version(
+    db: DbSession, note_id: int, version_id: int
+) -> Optional[models.Note]:
+    """Async version of `crud.restore_note_version`."""
+    db_note = await run_db(db, version_crud.restore_note_version, note_id, version_id)
+    if db_note is not None:
+        await _written(note_cache_key(db, db_note.id))
+    return db_note
+
+
+def diff_cache_key(
+    db: DbSession,
+    from_version_id: int,
+    to_version_id: int,
+    diff_format: str,
+    context: int,
+) -> str:
+    return (
+        f"diff:{tenant_of(db)}:{from_version_id}:{to_version_id}"
+        f":{diff_format}:{context}"
+    )
+
+
+async def diff_note_versions(
+    db: DbSession,
+    note_id: int,
+    from_version_id: int,
+    to_version_id: Optional[int] = None,
+    diff_format: str = "unified",
+    context: int = 3,
+) -> Optional[bytes]:
+    """
+    Async version of `crud.note_version.diff_note_versions`.
+
+    Versions are immutable, so the diff of two of them is memoized whatever
+    the writes; their existence is still checked, as they can be deleted.
+    A diff against the current note is always computed.
+    """
+    if to_version_id is None:
+        return await run_db(
+            db,
+            version_crud.diff_note_versions,
+            note_id,
+            from_version_id,
+            diff_format=diff_format,
+            context=context,
+        )
+
+    version_ids = {from_version_id, to_version_id}
+    found = await run_db(db, version_crud.count_note_versions, note_id, version_ids)
+    if found < len(version_ids):
+        return None
+    key = diff_cache_key(db, from_version_id, to_version_id, diff_format, context)
+    cached = await cache.lookup("diff", key)
+    if cached is not None:
+        return cached
+    body = await run_db(
+        db,
+        version_crud.diff_note_versions,
+        note_id,
+        from_version_id,
+        to_version_id,
+        diff_format=diff_format,
+        context=context,
+    )
+    if body is not None:
+        await cache.store(key, body)
+    return body
+
+
+async def search_notes(
+    db: DbSession, q: str, skip: int = 0, limit: int = 20
+) -> List[Tuple[models.Note, float]]:
+    """Async version of `crud.search_notes`."""
+    return await run_db(db, search_crud.search_notes, q, skip=skip, limit=limit)
+
+
+async def bulk_create_notes(
+    db: DbSession, notes: Sequence[schemas.NoteCreate]
+) -> List[models.Note]:
+    """Async version of `crud.bulk_create_notes`."""
+    created = await run_db(db, bulk_crud.bulk_create_notes, notes)
+    if created:
+        await _written()
+    return created
+
+
+async def bulk_update_notes(
+    db: DbSession, updates: Sequence[schemas.NoteBulkUpdate]
+) -> Tuple[List[models.Note], List[int]]:
+    """Async version of `crud.bulk_update_notes`."""
+    updated, missing = await run_db(db, bulk_crud.bulk_update_notes, updates)
+    if updated:
+        await _written(*(note_cache_key(db, note.id) for note in updated))
+    return updated, missing
+
+
+async def bulk_delete_notes(db: DbSession, note_ids: Sequence[int]) -> List[int]:
+    """Async version of `crud.bulk_delete_notes`."""
+    deleted = await run_db(db, bulk_crud.bulk_delete_notes, note_ids)
+    if deleted:
+        await _written(*(note_cache_key(db, note_id) for note_id in deleted))
+    return deleted
+
+
+async def import_notes(
+    db: DbSession, notes: Sequence[schemas.NoteImport], preserve_versions: bool = False
+) -> Tuple[List[int], int]:
+    """Async version of `crud.import_notes`."""
+    note_ids, versions = await run_db(
+        db, bulk_crud.import_notes, notes, preserve_versions=preserve_versions
+    )
+    if note_ids:
+        await _written()
+    return note_ids, versions
+
+
+async def sync_notes(
+    db: DbSession, since: Optional[str] = None, limit: int = 500
+) -> schemas.NoteSync:
+    """Async version of `crud.sync_notes`, returning the schema."""
+    result = await run_db(db, sync_crud.sync_notes, since, limit=limit)
+    return schemas.NoteSync.model_validate(result, from_attributes=True)
+
+
+async def get_change_bounds(db: DbSession) -> Tuple[Optional[int], int]:
+    """Async version of `crud.changes.get_change_bounds`."""
+    return await run_db(db, changes_crud.get_change_bounds)
+
+
+async def create_job(db: DbSession, kind: str, params: Dict[str, Any]) -> models.Job:
+    """Async version of `crud.create_job`."""
+    return await run_db(db, job_crud.create_job, kind, params)
+
+
+async def get_job(db: DbSession, job_id: int) -> Optional[models.Job]:
+    """Async version of `crud.get_job`."""
+    return await run_db(db, job_crud.get_job, job_id)
+
+
+async def count_queued_jobs(db: DbSession) -> int:
+    """Async version of `crud.count_queued_jobs`."""
+    return await run_db(db, job_crud.count_queued_jobs)
+
+
+async def cancel_job(db: DbSession, job_id: int) -> Optional[models.Job]:
+    """Async version of `crud.cancel_job`."""
+    return await run_db(db, job_crud.cancel_job, job_id)
+
+
+async def delete_job(db: DbSession, job_id: int) -> Optional[models.Job]:
+    """Async version of `crud.delete_job`."""
+    return await run_db(db, job_crud.delete_job, job_id)
+
+
+def stream_changes(
+    db: DbSession, after: int, is_disconnected: Callable[[], Awaitable[bool]]
+) -> AsyncIterator[List[schemas.NoteChange]]:
+    """
+    Follows the change log, for the change feed.
+
+    The log is read when this worker commits a write, and at least every
+    CHANGE_FEED_POLL_SECONDS for the writes of the others. Each read uses
+    its own session, on the database and tenant of the request session,
+    which the stream outlives.
+
+    Args:
+        db: The database session of the request
+        after: The sequence number of the last change already seen
+        is_disconnected: Tells whether the client went away, which ends
+            the stream
+
+    Returns:
+        An async iterator of the new changes, oldest first, with an empty
+        list after each idle poll.
+    """
+    return _follow_changes(detached_sessionmaker(db), after, is_disconnected)
+
+
+async def _follow_changes(
+    factory: SessionFactory, after: int, is_disconnected: Callable[[], Awaitable[bool]]
+) -> AsyncIterator[List[schemas.NoteChange]]:
+    with change_notifier.listen() as woken:
+        while not await is_disconnected():
+            woken.clear()
+            rows = await run_db_detached(
+                factory,
+                changes_crud.get_changes,
+                after,
+                settings.CHANGE_FEED_BATCH_SIZE,
+            )
+            changes = [schemas.NoteChange.model_validate(row) for row in rows]
+            if changes:
+                after = changes[-1].seq
+                yield changes
+            elif not await wait_for(woken, settings.CHANGE_FEED_POLL_SECONDS):
+                # Nothing new: lets the caller send a keep-alive
+                yield changes
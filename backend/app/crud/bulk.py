@@ -0,0 +1,252 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from .. import models, schemas
+from ..db.tenant import tenant_of
+from . import version_store
+from .changes import record_changes
+
+
+def _detach(db: Session, notes: Sequence[models.Note]) -> None:
+    # Detached before the commit, the notes keep their loaded state instead
+    # of being expired and reloaded one SELECT at a time
+    for note in notes:
+        db.expunge(note)
+
+
+# CREATE
+def bulk_create_notes(
+    db: Session, notes: Sequence[schemas.NoteCreate]
+) -> List[models.Note]:
+    """
+    Creates many notes in a single transaction.
+
+    The rows are written by one INSERT ... RETURNING, batched by the driver,
+    instead of one transaction and one refresh per note.
+
+    Args:
+        db: The database session
+        notes: Pydantic schemas containing data for the new notes
+
+    Returns:
+        The SQLAlchemy Note model instances of the created notes, in order.
+    """
+    if not notes:
+        return []
+    created = db.scalars(
+        insert(models.Note).returning(models.Note),
+        [{**note.model_dump(), "tenant_id": tenant_of(db)} for note in notes],
+    ).all()
+    # RETURNING order is not guaranteed, but ids are assigned in VALUES order.
+    # (sort_by_parameter_order would fall back to one INSERT per row on SQLite)
+    created = sorted(created, key=lambda note: note.id)
+    record_changes(db, "create", [note.id for note in created])
+    _detach(db, created)
+    db.commit()
+    return list(created)
+
+
+# UPDATE
+def bulk_update_notes(
+    db: Session, updates: Sequence[schemas.NoteBulkUpdate]
+) -> Tuple[List[models.Note], List[int]]:
+    """
+    Updates many notes in a single transaction, versioning each of them.
+
+    The statement count does not depend on the number of notes: one SELECT of
+    the notes, one of their latest snapshots, one batched INSERT of the
+    versions, one batched UPDATE, one SELECT of the updated notes and one
+    batched INSERT of their change log entries.
+
+    Args:
+        db: The database session
+        updates: Pydantic schemas with the ID and the fields to update,
+            one per note
+
+    Returns:
+        The updated SQLAlchemy Note model instances in the order of `updates`,
+        and the IDs that matched no note.
+    """
+    if not updates:
+        return [], []
+    note_ids = [item.id for item in updates]
+    current = {
+        note.id: note
+        for note in db.scalars(select(models.Note).where(models.Note.id.in_(note_ids)))
+    }
+    found = [item for item in updates if item.id in current]
+    missing = [item.id for item in updates if item.id not in current]
+    if not found:
+        return [], missing
+
+    # Capture the current state of every note in a version
+    snapshots = version_store.get_latest_snapshots(db, current.keys())
+    db.execute(
+        insert(models.NoteVersion),
+        [
+            version_store.version_values(
+                note.id,
+                note.title,
+                note.content,
+                snapshots.get(note.id),
+                tenant_id=note.tenant_id,
+            )
+            for note in (current[item.id] for item in found)
+        ],
+    )
+
+    db.execute(
+        update(models.Note),
+        [{"id": item.id, **item.model_dump(exclude_unset=True)} for item in found],
+    )
+    updated = {
+        note.id: note
+        for note in db.scalars(
+            select(models.Note)
+            .where(models.Note.id.in_([item.id for item in found]))
+            .execution_options(populate_existing=True)
+        )
+    }
+    record_changes(db, "update", [item.id for item in found])
+    _detach(db, list(updated.values()))
+    db.commit()
+    return [updated[item.id] for item in found], missing
+
+
+# DELETE
+def bulk_delete_notes(db: Session, note_ids: Sequence[int]) -> List[int]:
+    """
+    Deletes many notes with a single DELETE statement.
+
+    Their deletion is logged by one batched INSERT.
+
+    Args:
+        db: The database session
+        note_ids: The IDs of the notes to be deleted
+
+    Returns:
+        The IDs of the notes that existed and were deleted.
+    """
+    if not note_ids:
+        return []
+    deleted = db.scalars(
+        delete(models.Note)
+        .where(models.Note.id.in_(list(note_ids)))
+        .returning(models.Note.id)
+    ).all()
+    record_changes(db, "delete", deleted)
+    db.commit()
+    return list(deleted)
+
+
+def _as_utc(value: Optional[datetime], default: datetime) -> datetime:
+    if value is None:
+        return default
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _insert_histories(
+    db: Session, histories: Dict[int, Sequence[schemas.NoteImportVersion]]
+) -> int:
+    # Version ids must follow the order of each history, and a delta needs
+    # the id of its snapshot: each round inserts the next snapshot of every
+    # note, then the deltas based on it.
+    segments: Dict[int, List[List[Dict[str, Any]]]] = {}
+    now = datetime.now(timezone.utc)
+    tenant = tenant_of(db)
+    for note_id, versions in histories.items():
+        encoded = version_store.encode_history([v.content for v in versions])
+        for version, (content_data, is_delta) in zip(versions, encoded):
+            values = {
+                "note_id": note_id,
+                "tenant_id": tenant,
+                "title": version.title,
+                "content_data": content_data,
+                "version_timestamp": _as_utc(version.version_timestamp, now),
+                **version_store.content_metadata(version.content),
+            }
+            if is_delta:
+                segments[note_id][-1].append(values)
+            else:
+                segments.setdefault(note_id, []).append([values])
+
+    rounds = max((len(note_segments) for note_segments in segments.values()), default=0)
+    for index in range(rounds):
+        current = [s[index] for s in segments.values() if index < len(s)]
+        snapshot_ids = dict(
+            db.execute(
+                insert(models.NoteVersion).returning(
+                    models.NoteVersion.note_id, models.NoteVersion.id
+                ),
+                [segment[0] for segment in current],
+            ).all()
+        )
+        deltas = [
+            {**values, "base_version_id": snapshot_ids[values["note_id"]]}
+            for segment in current
+            for values in segment[1:]
+        ]
+        if deltas:
+            db.execute(insert(models.NoteVersion), deltas)
+    return sum(len(versions) for versions in histories.values())
+
+
+# IMPORT
+def import_notes(
+    db: Session, notes: Sequence[schemas.NoteImport], preserve_versions: bool = False
+) -> Tuple[List[int], int]:
+    """
+    Inserts a batch of imported notes in a single transaction.
+
+    Notes keep their timestamps when the archive has them. Their version
+    histories are stored as snapshots and deltas, with two statements per
+    VERSION_SNAPSHOT_INTERVAL versions of the longest history.
+
+    Args:
+        db: The database session
+        notes: Pydantic schemas of the imported notes
+        preserve_versions: Also imports the versions of each note
+
+    Returns:
+        The IDs of the created notes, in order, and the number of versions
+        imported.
+    """
+    if not notes:
+        return [], 0
+    now = datetime.now(timezone.utc)
+    tenant = tenant_of(db)
+    rows = []
+    for note in notes:
+        created_at = _as_utc(note.created_at, now)
+        rows.append(
+            {
+                "title": note.title,
+                "content": note.content,
+                "created_at": created_at,
+                "updated_at": _as_utc(note.updated_at, created_at),
+                "tenant_id": tenant,
+            }
+        )
+    # Ids are assigned in VALUES order, see bulk_create_notes
+    note_ids = sorted(
+        db.scalars(insert(models.Note).returning(models.Note.id), rows).all()
+    )
+
+    imported_versions = 0
+    if preserve_versions:
+        imported_versions = _insert_histories(
+            db,
+            {
+                note_id: note.versions
+                for note_id, note in zip(note_ids, notes)
+                if note.versions
+            },
+        )
+    record_changes(db, "create", note_ids)
+    db.commit()
+    return note_ids, imported_versions
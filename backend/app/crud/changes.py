@@ -0,0 +1,125 @@
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import Row, delete, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..db.tenant import ALL_TENANTS, tenant_of
+
+# Kinds of the logged changes
+CHANGE_KINDS = ("create", "update", "delete", "restore")
+
+# PostgreSQL advisory lock key serializing the writers of the change log
+# (b"note_cha" as a bigint)
+CHANGE_LOG_LOCK_KEY = 0x6E6F74655F636861
+
+
+def record_changes(db: Session, kind: str, note_ids: Sequence[int]) -> None:
+    """
+    Logs writes to notes, in the transaction of the writes.
+
+    Committed with them, so the log never misses nor invents a change.
+    Readers take every change after the last one they saw, which requires
+    sequence numbers to become visible in order: SQLite runs one writer at
+    a time, and on PostgreSQL a transaction-level advisory lock, held until
+    the commit, makes the writers of the log take their turn too. Without
+    it a transaction could commit a lower sequence number after a reader
+    moved past a higher one, and the change would be skipped for good.
+
+    Args:
+        db: The database session
+        kind: One of CHANGE_KINDS
+        note_ids: The IDs of the written notes
+    """
+    if not note_ids:
+        return
+    if db.get_bind().dialect.name == "postgresql":
+        # Before the sequence numbers are drawn
+        db.execute(
+            text("SELECT pg_advisory_xact_lock(:key)"), {"key": CHANGE_LOG_LOCK_KEY}
+        )
+    db.execute(
+        insert(models.NoteChange),
+        [
+            {"note_id": note_id, "kind": kind, "tenant_id": tenant_of(db)}
+            for note_id in note_ids
+        ],
+    )
+
+
+def get_changes(db: Session, after: int, limit: int = 100) -> List[Row]:
+    """
+    Fetches the changes logged after a sequence number, oldest first.
+
+    Changes are committed in the order of their sequence numbers (see
+    `record_changes`): a reader never sees one before an earlier one.
+
+    Args:
+        db: The database session
+        after: The sequence number of the last change already seen
+        limit: Maximum number of changes to be fetched
+
+    Returns:
+        A list of rows with the columns of the NoteChange schema.
+    """
+    NoteChange = models.NoteChange
+    return list(
+        db.execute(
+            select(
+                NoteChange.id.label("seq"),
+                NoteChange.note_id,
+                NoteChange.kind,
+                NoteChange.changed_at,
+            )
+            .where(NoteChange.id > after)
+            .order_by(NoteChange.id)
+            .limit(limit)
+        )
+    )
+
+
+def get_change_bounds(db: Session) -> Tuple[Optional[int], int]:
+    """
+    Returns the sequence numbers of the oldest and latest logged changes.
+
+    Of every tenant: the sequence is shared, and the changes of a tenant can
+    be pruned only when the log is.
+
+    Args:
+        db: The database session
+
+    Returns:
+        The oldest sequence number still in the log and the latest one,
+        (None, 0) if the log is empty.
+    """
+    oldest, latest = db.execute(
+        select(
+            func.min(models.NoteChange.id), func.max(models.NoteChange.id)
+        ).execution_options(**{ALL_TENANTS: True})
+    ).one()
+    return oldest, latest or 0
+
+
+def prune_changes(db: Session, before: datetime) -> int:
+    """
+    Deletes the changes logged before a date, and commits.
+
+    The latest change is always kept, so that the sequence goes on from it
+    on any database.
+
+    Args:
+        db: The database session
+        before: Changes logged earlier are deleted
+
+    Returns:
+        The number of deleted changes.
+    """
+    latest = select(func.max(models.NoteChange.id)).scalar_subquery()
+    result = db.execute(
+        delete(models.NoteChange).where(
+            models.NoteChange.changed_at < before, models.NoteChange.id < latest
+        )
+    )
+    db.commit()
+    return result.rowcount
@@ -0,0 +1,219 @@
+import json
+from collections import defaultdict
+from typing import (
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+from sqlalchemy import Row, Select, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from .. import models
+from ..core import delta
+from ..db.session import DbSession, detached_sessionmaker
+
+
+def _notes_query(batch_size: int) -> Select:
+    # Plain rows read from a server-side cursor: no ORM identity map and no
+    # Pydantic model per note
+    return (
+        select(
+            models.Note.id,
+            models.Note.title,
+            models.Note.content,
+            models.Note.created_at,
+            models.Note.updated_at,
+        )
+        .order_by(models.Note.id)
+        .execution_options(yield_per=batch_size)
+    )
+
+
+def _versions_query(note_ids: List[int]) -> Select:
+    NoteVersion = models.NoteVersion
+    return (
+        select(
+            NoteVersion.id,
+            NoteVersion.note_id,
+            NoteVersion.title,
+            NoteVersion.content_data,
+            NoteVersion.base_version_id,
+            NoteVersion.version_timestamp,
+        )
+        .where(NoteVersion.note_id.in_(note_ids))
+        .order_by(NoteVersion.note_id, NoteVersion.id)
+    )
+
+
+def _isoformat(value) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def version_contents(rows: Sequence[Row]) -> Dict[int, str]:
+    """
+    Rebuilds the contents of stored versions.
+
+    Args:
+        rows: Version rows with id, content_data and base_version_id, holding
+            the snapshots the deltas are based on
+
+    Returns:
+        The content of each version by version id.
+    """
+    snapshots = {
+        row.id: delta.decompress_text(row.content_data)
+        for row in rows
+        if row.base_version_id is None
+    }
+    return {
+        row.id: (
+            snapshots[row.id]
+            if row.base_version_id is None
+            else delta.decompress_delta(
+                snapshots[row.base_version_id], row.content_data
+            )
+        )
+        for row in rows
+    }
+
+
+def render_batch(notes: Sequence[Row], versions: Optional[Sequence[Row]] = None) -> str:
+    """
+    Serializes a batch of notes as NDJSON, one note per line.
+
+    Args:
+        notes: Note rows
+        versions: The version rows of these notes, embedded in each note
+            when given
+
+    Returns:
+        The NDJSON lines, each one ending with a newline.
+    """
+    versions_by_note = defaultdict(list)
+    if versions is not None:
+        contents = version_contents(versions)
+        for row in versions:
+            versions_by_note[row.note_id].append(
+                {
+                    "id": row.id,
+                    "title": row.title,
+                    "content": contents[row.id],
+                    "version_timestamp": _isoformat(row.version_timestamp),
+                }
+            )
+
+    lines = []
+    for note in notes:
+        record = {
+            "id": note.id,
+            "title": note.title,
+            "content": note.content,
+            "created_at": _isoformat(note.created_at),
+            "updated_at": _isoformat(note.updated_at),
+        }
+        if versions is not None:
+            record["versions"] = versions_by_note[note.id]
+        lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+    return "".join(lines)
+
+
+def _export_batches(
+    session: Session, include_versions: bool, batch_size: int
+) -> Iterator[Tuple[int, str]]:
+    # The number of notes of each batch, and their NDJSON
+    result = session.execute(_notes_query(batch_size))
+    for notes in result.partitions():
+        versions = None
+        if include_versions:
+            note_ids = [note.id for note in notes]
+            versions = session.execute(_versions_query(note_ids)).all()
+        yield len(notes), render_batch(notes, versions)
+
+
+def _iter_export(
+    factory: sessionmaker, include_versions: bool, batch_size: int
+) -> Iterator[str]:
+    with factory() as session:
+        for _, chunk in _export_batches(session, include_versions, batch_size):
+            yield chunk
+
+
+async def _aiter_export(
+    factory: async_sessionmaker, include_versions: bool, batch_size: int
+) -> AsyncIterator[str]:
+    async with factory() as session:
+        result = await session.stream(_notes_query(batch_size))
+        async for notes in result.partitions():
+            versions = None
+            if include_versions:
+                note_ids = [note.id for note in notes]
+                versions = (await session.execute(_versions_query(note_ids))).all()
+            yield render_batch(notes, versions)
+
+
+def export_notes(
+    db: DbSession, include_versions: bool = False, batch_size: int = 500
+) -> Union[Iterator[str], AsyncIterator[str]]:
+    """
+    Streams every note as NDJSON, ordered by id.
+
+    The notes are fetched batch_size rows at a time from a server-side
+    cursor, and the versions of each batch with one query, so memory does
+    not grow with the number of notes. The iterator uses its own session on
+    the same database and tenant: the request session is closed before a
+    streaming response is sent.
+
+    Args:
+        db: The database session of the request
+        include_versions: Embeds the versions of each note, oldest first
+        batch_size: Number of notes fetched and serialized at a time
+
+    Returns:
+        An iterator of NDJSON chunks, async when db is an AsyncSession.
+    """
+    factory = detached_sessionmaker(db)
+    if isinstance(db, AsyncSession):
+        return _aiter_export(factory, include_versions, batch_size)
+    return _iter_export(factory, include_versions, batch_size)
+
+
+def write_export(
+    db: Session,
+    out: TextIO,
+    include_versions: bool = False,
+    batch_size: int = 500,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> int:
+    """
+    Writes every note as NDJSON to a file, like `export_notes` streams them.
+
+    Args:
+        db: The database session
+        out: The text file written
+        include_versions: Embeds the versions of each note, oldest first
+        batch_size: Number of notes fetched and serialized at a time
+        progress: Called with the number of notes written and the total,
+            before the first batch and after each one
+
+    Returns:
+        The number of notes written.
+    """
+    total = db.scalar(select(func.count(models.Note.id)))
+    written = 0
+    if progress is not None:
+        progress(written, total)
+    for count, chunk in _export_batches(db, include_versions, batch_size):
+        out.write(chunk)
+        written += count
+        if progress is not None:
+            progress(written, total)
+    return written
@@ -0,0 +1,306 @@
+"""
+The jobs table, queue of the background jobs (see app/tasks/jobs.py).
+
+Every change of status is a conditional UPDATE: a job is claimed by one
+thread only, and never cancelled once finished. A claim is identified by
+its started_at: once a job is requeued, the thread of its previous claim
+neither reports progress nor records an outcome.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import ColumnElement
+
+from .. import models
+from ..db.tenant import tenant_of
+
+JOB_KINDS = ("export", "compaction", "reindex")
+# Kinds processing a whole database, every tenant of it
+DATABASE_JOB_KINDS = ("reindex",)
+# Statuses a job never leaves
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+class JobFinishedError(ValueError):
+    """Raised when cancelling a job that already finished."""
+
+
+class JobNotFinishedError(ValueError):
+    """Raised when deleting a job that has not finished."""
+
+
+def create_job(db: Session, kind: str, params: Dict[str, Any]) -> models.Job:
+    """
+    Queues a job, and commits.
+
+    Args:
+        db: The database session
+        kind: One of JOB_KINDS
+        params: The parameters of the job, as JSON
+
+    Returns:
+        The SQLAlchemy Job model instance of the queued job.
+    """
+    db_job = models.Job(kind=kind, params=params, tenant_id=tenant_of(db))
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+
+def get_job(db: Session, job_id: int) -> Optional[models.Job]:
+    """
+    Fetches a job by its ID.
+
+    Args:
+        db: The database session
+        job_id: The ID of the job
+
+    Returns:
+        The SQLAlchemy Job model instance if found, otherwise None.
+    """
+    return db.execute(
+        select(models.Job).where(models.Job.id == job_id)
+    ).scalar_one_or_none()
+
+
+def count_queued_jobs(db: Session) -> int:
+    """Counts the jobs of the session's tenant waiting to run."""
+    return db.scalar(
+        select(func.count(models.Job.id)).where(models.Job.status == "queued")
+    )
+
+
+def cancel_job(db: Session, job_id: int) -> Optional[models.Job]:
+    """
+    Cancels a job, and commits.
+
+    A queued job is cancelled at once, a running one is flagged and stops
+    at its next progress report.
+
+    Args:
+        db: The database session
+        job_id: The ID of the job
+
+    Returns:
+        The job after the cancellation, None if not found.
+
+    Raises:
+        JobFinishedError: If the job already finished.
+    """
+    db_job = get_job(db, job_id)
+    if db_job is None:
+        return None
+    if db_job.status in FINISHED_STATUSES:
+        raise JobFinishedError("Job already finished")
+
+    Job = models.Job
+    # Either one applies, even if the job was claimed in the meantime
+    db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == "queued")
+        .values(status="cancelled", finished_at=func.now())
+    )
+    db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == "running")
+        .values(cancel_requested=True)
+    )
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+
+def delete_job(db: Session, job_id: int) -> Optional[models.Job]:
+    """
+    Deletes a finished job, and commits.
+
+    Args:
+        db: The database session
+        job_id: The ID of the job
+
+    Returns:
+        The deleted job, None if not found.
+
+    Raises:
+        JobNotFinishedError: If the job is queued or running.
+    """
+    db_job = get_job(db, job_id)
+    if db_job is None:
+        return None
+    Job = models.Job
+    deleted = db.execute(
+        delete(Job).where(Job.id == job_id, Job.status.in_(FINISHED_STATUSES))
+    )
+    db.commit()
+    if deleted.rowcount == 0:
+        raise JobNotFinishedError("Job not finished, cancel it first")
+    return db_job
+
+
+def prune_jobs(db: Session, before: datetime) -> List[Tuple[int, str]]:
+    """
+    Deletes the jobs finished before a date, and commits.
+
+    Args:
+        db: The database session
+        before: Jobs finished earlier are deleted
+
+    Returns:
+        The ID and tenant of each deleted job.
+    """
+    Job = models.Job
+    finished = (Job.status.in_(FINISHED_STATUSES), Job.finished_at < before)
+    pruned = [
+        tuple(row) for row in db.execute(select(Job.id, Job.tenant_id).where(*finished))
+    ]
+    if pruned:
+        db.execute(delete(Job).where(Job.id.in_([job_id for job_id, _ in pruned])))
+        db.commit()
+    return pruned
+
+
+def claim_job(db: Session, job_id: int) -> Optional[models.Job]:
+    """
+    Marks a queued job as running, and commits.
+
+    Args:
+        db: The database session
+        job_id: The ID of the job
+
+    Returns:
+        The claimed job, None if it is no longer queued (cancelled, or
+        claimed by another worker).
+    """
+    Job = models.Job
+    claimed = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == "queued")
+        .values(status="running", started_at=func.now())
+    )
+    db.commit()
+    if claimed.rowcount == 0:
+        return None
+    return get_job(db, job_id)
+
+
+def _claimed(job_id: int, claimed_at: datetime) -> Tuple[ColumnElement, ...]:
+    # The job is still running under the claim that started it at claimed_at
+    Job = models.Job
+    return (Job.id == job_id, Job.status == "running", Job.started_at == claimed_at)
+
+
+def update_job_progress(
+    db: Session,
+    job_id: int,
+    claimed_at: datetime,
+    progress: int,
+    total: Optional[int] = None,
+) -> bool:
+    """
+    Records the progress of a running job, and commits.
+
+    Args:
+        db: The database session
+        job_id: The ID of the job
+        claimed_at: The started_at of the claim running it
+        progress: Units of work done
+        total: Units of work in all, unchanged when None
+
+    Returns:
+        Whether the job must stop: asked to by a cancellation, or no longer
+        running under this claim (requeued as stale).
+    """
+    Job = models.Job
+    values: Dict[str, Any] = {"progress": progress}
+    if total is not None:
+        values["total"] = total
+    reported = db.execute(
+        update(Job).where(*_claimed(job_id, claimed_at)).values(**values)
+    )
+    db.commit()
+    if reported.rowcount == 0:
+        return True
+    return bool(db.scalar(select(Job.cancel_requested).where(Job.id == job_id)))
+
+
+def finish_job(
+    db: Session,
+    job_id: int,
+    claimed_at: datetime,
+    status: str,
+    result: Optional[Dict[str, Any]] = None,
+    error: Optional[str] = None,
+) -> bool:
+    """
+    Records the outcome of a job, and commits.
+
+    Args:
+        db: The database session
+        job_id: The ID of the job
+        claimed_at: The started_at of the claim running it
+        status: One of FINISHED_STATUSES
+        result: What the job produced, as JSON
+        error: Why the job failed
+
+    Returns:
+        Whether it was recorded, False if the job is no longer running
+        under this claim.
+    """
+    Job = models.Job
+    values: Dict[str, Any] = {
+        "status": status,
+        "result": result,
+        "error": error,
+        "finished_at": func.now(),
+    }
+    if status == "succeeded":
+        values["progress"] = func.coalesce(Job.total, Job.progress)
+    finished = db.execute(
+        update(Job).where(*_claimed(job_id, claimed_at)).values(**values)
+    )
+    db.commit()
+    return finished.rowcount > 0
+
+
+def requeue_job(db: Session, job_id: int, claimed_at: datetime) -> None:
+    """Puts a job running under a claim back in the queue, and commits."""
+    Job = models.Job
+    db.execute(
+        update(Job)
+        .where(*_claimed(job_id, claimed_at))
+        .values(status="queued", started_at=None)
+    )
+    db.commit()
+
+
+def resumable_jobs(db: Session, stale_before: datetime) -> List[Tuple[int, str]]:
+    """
+    Lists the jobs to run again after a restart, and commits.
+
+    The running jobs whose progress did not move since stale_before lost
+    their worker: they are queued again. Every job is idempotent.
+
+    Args:
+        db: The database session, of every tenant
+        stale_before: Running jobs last updated earlier are requeued
+
+    Returns:
+        The ID and tenant of each queued job, oldest first.
+    """
+    Job = models.Job
+    db.execute(
+        update(Job)
+        .where(Job.status == "running", Job.updated_at < stale_before)
+        .values(status="queued", started_at=None)
+    )
+    db.commit()
+    return [
+        (job_id, tenant)
+        for job_id, tenant in db.execute(
+            select(Job.id, Job.tenant_id).where(Job.status == "queued").order_by(Job.id)
+        )
+    ]
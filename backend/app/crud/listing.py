@@ -0,0 +1,160 @@
+"""
+Listing pages serialized to JSON, ready to be sent and cached.
+
+By default items go through their Pydantic schema. With FAST_JSON they are
+read as plain rows (or dicts built from the models) and dumped by orjson,
+skipping the per-item validation; both paths produce the same bytes.
+"""
+
+from functools import partial
+from typing import List, Optional, Sequence
+
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+
+from .. import schemas
+from ..core import serialization
+from ..core.config import settings
+from ..core.pagination import Page, next_cursor
+from . import note as note_crud
+from . import note_version as version_crud
+
+NoteList = TypeAdapter(List[schemas.Note])
+NoteSummaryList = TypeAdapter(List[schemas.NoteSummary])
+NoteVersionList = TypeAdapter(List[schemas.NoteVersion])
+NoteVersionSummaryList = TypeAdapter(List[schemas.NoteVersionSummary])
+
+
+def notes_page(
+    db: Session,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    listing: note_crud.NoteListing = note_crud.NoteListing(),
+) -> Page:
+    """
+    Fetches and serializes a page of the notes listing, see `crud.get_notes`.
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed.
+    """
+    page = {"skip": skip, "limit": limit, "cursor": cursor, "listing": listing}
+    if settings.FAST_JSON:
+        rows = note_crud.get_note_rows(db, **page)
+        body = serialization.dumps([row._asdict() for row in rows])
+    else:
+        rows = note_crud.get_notes(db, **page)
+        body = NoteList.dump_json(NoteList.validate_python(rows, from_attributes=True))
+    key = partial(note_crud.note_cursor_key, sort=listing.sort)
+    return Page(body, next_cursor(rows, limit, key))
+
+
+def note_summaries_page(
+    db: Session,
+    fields: Sequence[str] = note_crud.SUMMARY_FIELDS,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    listing: note_crud.NoteListing = note_crud.NoteListing(),
+) -> Page:
+    """
+    Fetches and serializes a page of note summaries, see
+    `crud.get_note_summaries`.
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed.
+    """
+    rows = note_crud.get_note_summaries(
+        db, fields, skip=skip, limit=limit, cursor=cursor, listing=listing
+    )
+    cursor = next_cursor(rows, limit, partial(_summary_cursor_key, listing.sort))
+    if listing.sort not in ("updated_at", *fields):
+        # Only selected for the cursor
+        for row in rows:
+            del row[listing.sort]
+    if settings.FAST_JSON:
+        body = serialization.dumps(rows)
+    else:
+        body = NoteSummaryList.dump_json(
+            NoteSummaryList.validate_python(rows), exclude_unset=True
+        )
+    return Page(body, cursor)
+
+
+def _summary_cursor_key(sort: str, values: dict) -> tuple:
+    return (values[sort], values["id"])
+
+
+def note_versions_page(
+    db: Session,
+    note_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Page:
+    """
+    Fetches and serializes a page of versions, see `crud.get_note_versions`.
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed.
+    """
+    versions = version_crud.get_note_versions(
+        db, note_id, skip=skip, limit=limit, cursor=cursor
+    )
+    if settings.FAST_JSON:
+        # The content is rebuilt from snapshots and deltas by the model
+        body = serialization.dumps(
+            [
+                {
+                    "title": version.title,
+                    "content": version.content,
+                    "note_id": version.note_id,
+                    "id": version.id,
+                    "version_timestamp": version.version_timestamp,
+                }
+                for version in versions
+            ]
+        )
+    else:
+        body = NoteVersionList.dump_json(
+            NoteVersionList.validate_python(versions, from_attributes=True)
+        )
+    return Page(body, next_cursor(versions, limit, version_crud.version_cursor_key))
+
+
+def note_version_summaries_page(
+    db: Session,
+    note_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Page:
+    """
+    Fetches and serializes a page of version metadata, without loading the
+    content, see `crud.get_note_versions`.
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed.
+    """
+    versions = version_crud.get_note_versions(
+        db, note_id, skip=skip, limit=limit, cursor=cursor, with_content=False
+    )
+    if settings.FAST_JSON:
+        body = serialization.dumps(
+            [
+                {
+                    "id": version.id,
+                    "note_id": version.note_id,
+                    "title": version.title,
+                    "version_timestamp": version.version_timestamp,
+                    "content_length": version.content_length,
+                    "content_hash": version.content_hash,
+                }
+                for version in versions
+            ]
+        )
+    else:
+        body = NoteVersionSummaryList.dump_json(
+            NoteVersionSummaryList.validate_python(versions, from_attributes=True)
+        )
+    return Page(body, next_cursor(versions, limit, version_crud.version_cursor_key))
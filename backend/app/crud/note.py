@@ -1,38 +1,320 @@
-from typing import List, Optional
-
-from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import (
+    Row,
+    Select,
+    bindparam,
+    desc,
+    func,
+    insert,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql import ColumnElement
 
 from .. import models, schemas
+from ..core.config import settings
+from ..core.http_cache import PreconditionFailedError, etag_matches, make_etag
+from ..core.pagination import (
+    InvalidCursorError,
+    decode_cursor,
+    parse_cursor_datetime,
+    parse_cursor_id,
+)
+from ..db.tenant import tenant_of
+from . import version_store
+from .changes import record_changes
+
+# Fields a note summary can be limited to (id and updated_at are always sent)
+SUMMARY_FIELDS = ("title", "created_at", "preview")
+# Columns the notes listing can be sorted by, ties broken by id
+SORT_FIELDS = ("updated_at", "created_at", "title")
+
+
+class NoteListing(NamedTuple):
+    """
+    Order and filters of the notes listing.
+
+    Each sort column has an index (tenant_id, column, id), which also serves
+    its filters. Date ranges are half-open: from `*_after` included to
+    `*_before` excluded, naive datetimes being UTC. The title prefix is
+    case-sensitive, so that it is a range of the title index.
+    """
+
+    sort: str = "updated_at"
+    order: str = "desc"
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+    updated_after: Optional[datetime] = None
+    updated_before: Optional[datetime] = None
+    # Last: the cache key is split on ":" and only this field is free text
+    title_prefix: Optional[str] = None
+
+    def cache_key(self) -> str:
+        return ":".join("" if value is None else str(value) for value in self)
+
+
+def prefix_upper_bound(prefix: str) -> Optional[str]:
+    """
+    Computes the smallest string after every string starting with `prefix`.
+
+    Args:
+        prefix: A non-empty string
+
+    Returns:
+        The prefix with its last character incremented, None when no string
+        is greater (only the highest code points).
+    """
+    prefix = prefix.rstrip(chr(0x10FFFF))
+    if not prefix:
+        return None
+    following = ord(prefix[-1]) + 1
+    # Surrogates can't be encoded: skip to the next valid code point
+    if 0xD800 <= following <= 0xDFFF:
+        following = 0xE000
+    return prefix[:-1] + chr(following)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Timestamps are stored in UTC, and on SQLite without offset
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _listing_filters(listing: NoteListing) -> List[ColumnElement]:
+    Note = models.Note
+    filters = []
+    for column, after, before in (
+        (Note.created_at, listing.created_after, listing.created_before),
+        (Note.updated_at, listing.updated_after, listing.updated_before),
+    ):
+        if after is not None:
+            filters.append(column >= _as_utc(after))
+        if before is not None:
+            filters.append(column < _as_utc(before))
+    if listing.title_prefix:
+        # A range instead of LIKE, which SQLite can't match with the index
+        filters.append(Note.title >= listing.title_prefix)
+        upper = prefix_upper_bound(listing.title_prefix)
+        if upper is not None:
+            filters.append(Note.title < upper)
+    return filters
+
+
+def _parse_cursor_value(sort: str, value: Any) -> Any:
+    if sort == "title":
+        if not isinstance(value, str):
+            raise InvalidCursorError("Invalid pagination cursor")
+        return value
+    return parse_cursor_datetime(value)
 
 
 # READ
-def get_note(db: Session, note_id: int) -> Optional[models.Note]:
+def get_note(
+    db: Session, note_id: int, for_update: bool = False
+) -> Optional[models.Note]:
     """
     Fetches note by its ID.
 
     Args:
         db: The database session
         note_id: The ID of the note to retrieve
+        for_update: Locks the row until the end of the transaction
+            (SELECT ... FOR UPDATE, ignored by SQLite)
 
     Returns:
         The SQLAlchemy Note model instance if found, otherwise None.
     """
-    return db.query(models.Note).filter(models.Note.id == note_id).first()
+    query = db.query(models.Note).filter(models.Note.id == note_id)
+    if for_update:
+        query = query.with_for_update()
+    return query.first()
+
+
+def serialize_note(note) -> bytes:
+    """
+    Serializes a note as sent by the API, the source of its ETag.
 
+    Args:
+        note: A Note model instance or schema
 
-def get_notes(db: Session, skip: int = 0, limit: int = 10) -> List[models.Note]:
+    Returns:
+        The JSON representation of the note.
+    """
+    return schemas.Note.model_validate(note).model_dump_json().encode()
+
+
+def _paginate(
+    query: Query,
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+    listing: NoteListing = NoteListing(),
+) -> Query:
+    """Filters and orders a notes query as `listing` says, and selects a page."""
+    column = getattr(models.Note, listing.sort)
+    descending = listing.order == "desc"
+    query = query.filter(*_listing_filters(listing))
+    if descending:
+        query = query.order_by(desc(column), desc(models.Note.id))
+    else:
+        query = query.order_by(column, models.Note.id)
+    if cursor is not None:
+        value, note_id = decode_cursor(cursor, size=2)
+        # Seek past the last row of the previous page instead of OFFSET,
+        # so deep pages cost the same as the first one
+        keys = tuple_(column, models.Note.id)
+        last = (_parse_cursor_value(listing.sort, value), parse_cursor_id(note_id))
+        query = query.filter(keys < last if descending else keys > last)
+    else:
+        query = query.offset(skip)
+    return query.limit(limit)
+
+
+def get_notes(
+    db: Session,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    listing: NoteListing = NoteListing(),
+) -> List[models.Note]:
     """
-    Fetches all  notes.
+    Fetches all  notes, most recently updated first unless sorted otherwise.
 
     Args:
         db: The database session
-        skip: The number of notes to be skipped
+        skip: The number of notes to be skipped (ignored when a cursor is given)
         limit: Maximum number of notes to be fetched
+        cursor: Opaque keyset cursor returned with the previous page, of the
+            same listing
+        listing: The order and filters of the listing
 
     Returns:
         A list of SQLAlchemy Note model instances.
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed.
+    """
+    return _paginate(db.query(models.Note), skip, limit, cursor, listing).all()
+
+
+def get_note_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    listing: NoteListing = NoteListing(),
+) -> List[Row]:
+    """
+    Fetches a page of notes like `get_notes`, as plain rows.
+
+    Args:
+        db: The database session
+        skip: The number of notes to be skipped (ignored when a cursor is given)
+        limit: Maximum number of notes to be fetched
+        cursor: Opaque keyset cursor returned with the previous page
+        listing: The order and filters of the listing
+
+    Returns:
+        A list of rows with the columns of the Note schema, in its order.
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed.
+    """
+    columns = (getattr(models.Note, field) for field in schemas.Note.model_fields)
+    return _paginate(db.query(*columns), skip, limit, cursor, listing).all()
+
+
+def make_preview(text: str, size: int, more: bool = False) -> str:
+    """
+    Shortens a note content to a one line preview of at most `size` characters.
+
+    Args:
+        text: The beginning of the content
+        size: The maximum length of the preview
+        more: Whether the content goes on after `text`
+
+    Returns:
+        The text with its whitespace collapsed, cut on a word boundary and
+        ended with an ellipsis when it was shortened.
+    """
+    text = " ".join(text.split())
+    if len(text) <= size and not more:
+        return text
+    cut = text[: size - 1]
+    # Drop the last word if it is cut ("" when the rest was not read)
+    following = text[size - 1 : size]
+    if following != " " and " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut.rstrip() + "\u2026"
+
+
+def get_note_summaries(
+    db: Session,
+    fields: Sequence[str] = SUMMARY_FIELDS,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    listing: NoteListing = NoteListing(),
+) -> List[Dict[str, Any]]:
+    """
+    Fetches a page of notes as summaries, like `get_notes`.
+
+    Only the requested columns are selected: the content is never loaded,
+    the preview is cut from a prefix read with SUBSTR.
+
+    Args:
+        db: The database session
+        fields: The fields returned besides id and updated_at, among
+            SUMMARY_FIELDS
+        skip: The number of notes to be skipped (ignored when a cursor is given)
+        limit: Maximum number of notes to be fetched
+        cursor: Opaque keyset cursor returned with the previous page
+        listing: The order and filters of the listing
+
+    Returns:
+        A list of dicts with id, updated_at and `fields`, in the order of
+        the NoteSummary schema, and the sort column when it is not one of
+        them, for the cursor.
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed.
     """
-    return db.query(models.Note).offset(skip).limit(limit).all()
+    # Whitespace is collapsed afterwards: read enough to fill the preview
+    prefix_size = 2 * settings.NOTE_PREVIEW_CHARS
+    columns = {
+        "title": models.Note.title,
+        "created_at": models.Note.created_at,
+        "preview": func.substr(models.Note.content, 1, prefix_size).label("preview"),
+    }
+    selected = list(fields)
+    if listing.sort not in ("updated_at", *fields):
+        selected.append(listing.sort)
+    query = db.query(
+        models.Note.id,
+        models.Note.updated_at,
+        *(columns[field] for field in selected),
+    )
+    summaries = []
+    for row in _paginate(query, skip, limit, cursor, listing):
+        values = row._asdict()
+        if "preview" in values:
+            values["preview"] = make_preview(
+                values["preview"],
+                settings.NOTE_PREVIEW_CHARS,
+                more=len(values["preview"]) >= prefix_size,
+            )
+        summaries.append(values)
+    return summaries
+
+
+def note_cursor_key(note: Any, sort: str = "updated_at") -> Tuple:
+    """Returns the keyset ordering of the notes listing for a note or row."""
+    return (getattr(note, sort), note.id)
 
 
 # CREATE
@@ -48,57 +330,206 @@ def create_note(db: Session, note: schemas.NoteCreate) -> models.Note:
         The SQLAlchemy Note model instance of the created note
     """
 
-    db_note = models.Note(title=note.title, content=note.content)
+    db_note = models.Note(
+        title=note.title, content=note.content, tenant_id=tenant_of(db)
+    )
 
     db.add(db_note)
+    # The id of the note is needed by the change log
+    db.flush()
+    record_changes(db, "create", [db_note.id])
     db.commit()
     db.refresh(db_note)
     return db_note
 
 
 # UPDATE
-def update_note(
-    db: Session, note_id: int, note_update: schemas.NoteUpdate
+def _note_for_write_query(for_update: bool) -> Select:
+    snapshot, onclause, versions_after = version_store.latest_snapshot_join(
+        bindparam("note_id")
+    )
+    coalesce = version_store.same_session_version(bindparam("note_id"))
+    query = (
+        select(
+            models.Note,
+            snapshot.id,
+            snapshot.content_data,
+            versions_after,
+            coalesce.label("coalesce"),
+        )
+        .outerjoin(snapshot, onclause)
+        .where(models.Note.id == bindparam("note_id"))
+        # Read again after a write was overtaken: the note of the session is
+        # refreshed
+        .execution_options(populate_existing=True)
+    )
+    return query.with_for_update(of=models.Note) if for_update else query
+
+
+# Built once: the aliases make these statements costly to construct
+NOTE_FOR_WRITE = _note_for_write_query(for_update=False)
+NOTE_FOR_WRITE_LOCKED = _note_for_write_query(for_update=True)
+
+
+def get_note_for_write(
+    db: Session,
+    note_id: int,
+    for_update: bool = False,
+    edit_session: Optional[str] = None,
+) -> Optional[Tuple[models.Note, Optional[version_store.Snapshot], bool]]:
+    """
+    Fetches a note and the latest snapshot of its history in one query.
+
+    Args:
+        db: The database session
+        note_id: The ID of the note
+        for_update: Locks the note row until the end of the transaction
+        edit_session: The client edit session of the update, if any
+
+    Returns:
+        The SQLAlchemy Note model instance, its latest snapshot (a
+        `version_store.Snapshot`, None without versions) and whether the
+        update can be coalesced with the latest version (same edit session,
+        less than VERSION_COALESCE_SECONDS ago), or None if the note is not
+        found.
+    """
+    query = NOTE_FOR_WRITE_LOCKED if for_update else NOTE_FOR_WRITE
+    window = timedelta(seconds=settings.VERSION_COALESCE_SECONDS)
+    params = {
+        "note_id": note_id,
+        # Without a window, no version matches a NULL session
+        "edit_session": edit_session if window else None,
+        "coalesce_since": datetime.now(timezone.utc) - window,
+    }
+    row = db.execute(query, params).first()
+    if row is None:
+        return None
+    db_note, snapshot_id, snapshot_data, after, coalesce = row
+    snapshot = (snapshot_id, snapshot_data, after) if snapshot_id is not None else None
+    return db_note, snapshot, bool(coalesce)
+
+
+def write_note(
+    db: Session,
+    db_note: models.Note,
+    snapshot: Optional[version_store.Snapshot],
+    values: Dict[str, Any],
+    edit_session: Optional[str] = None,
+    versioned: bool = True,
+    change: str = "update",
 ) -> Optional[models.Note]:
     """
-    Updates a note and creates a version before saving.
+    Updates a note, versioning the state it replaces, and commits.
+
+    Three statements: an UPDATE ... RETURNING that reloads the note,
+    updated_at included, without a refresh, the INSERT of the version and
+    the INSERT of the change log entry.
+
+    The UPDATE only applies to the state of `db_note`: the version holds
+    the state that was actually replaced, and a write in between is never
+    lost. The UPDATE takes the write lock first, so nothing else can
+    change the note until the commit.
 
     Args:
         db: The database session
-        note_id: The id of the updated note
-        note_update: Pydantic schema with fields to update
+        db_note: The note, in the state it was read
+        snapshot: The latest snapshot of the note, see `get_note_for_write`
+        values: The new column values
+        edit_session: The client edit session recorded with the version
+        versioned: False skips the version, for a coalesced update
+        change: The kind of change logged, "update" or "restore"
 
     Returns:
-        The SQLAlchemy Note model instance of the update note
-        or None if no note is found.
+        The updated SQLAlchemy Note model instance, detached from the session
+        so that the commit does not expire it, or None if the note changed
+        since it was read (nothing is written then).
     """
-    db_note = get_note(db, note_id=note_id)
-    if not db_note:
+    Note = models.Note
+    # Reloaded in place by the RETURNING: the replaced state is kept first
+    replaced = (db_note.id, db_note.title, db_note.content, db_note.tenant_id)
+    written = db.scalars(
+        update(Note)
+        .where(
+            Note.id == db_note.id,
+            Note.title == db_note.title,
+            Note.content == db_note.content,
+            Note.updated_at == db_note.updated_at,
+        )
+        .values(**values)
+        .returning(Note)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    ).one_or_none()
+    if written is None:
         return None
+    if versioned:
+        note_id, title, content, tenant_id = replaced
+        db.execute(
+            insert(models.NoteVersion).values(
+                **version_store.version_values(
+                    note_id, title, content, snapshot, edit_session, tenant_id
+                )
+            )
+        )
+    record_changes(db, change, [written.id])
+    db.expunge(written)
+    db.commit()
+    return written
 
-    # Capture current state
-    current_title = db_note.title
-    current_content = db_note.content
 
-    # Create NoteVersion instance
-    db_note_version = models.NoteVersion(
-        note_id=db_note.id,
-        title=current_title,
-        content=current_content,
-        # version_timestamp is handled by server_default
-    )
-    # Add the new version to the session
-    db.add(db_note_version)
+def update_note(
+    db: Session,
+    note_id: int,
+    note_update: schemas.NoteUpdate,
+    if_match: Optional[str] = None,
+    edit_session: Optional[str] = None,
+) -> Optional[Tuple[models.Note, bool]]:
+    """
+    Updates a note and creates a version before saving.
 
-    # Takes the Pydantic schema fields excluding the ones that are undefined
-    update_data = note_update.model_dump(exclude_unset=True)
+    Four statements: the SELECT of the note with its latest snapshot, then
+    the writes of `write_note`.
+    Successive updates of an edit session within VERSION_COALESCE_SECONDS
+    of its latest version skip the INSERT: that version already holds the
+    state before the burst of edits.
+    If another write came in between, the note is read again, locked, and
+    `if_match` checked against that state.
 
-    for key, value in update_data.items():
-        setattr(db_note, key, value)
+    Args:
+        db: The database session
+        note_id: The id of the updated note
+        note_update: Pydantic schema with fields to update
+        if_match: An If-Match header: the note is only updated if its
+            current ETag is one of the listed ones
+        edit_session: An X-Edit-Session header identifying the client
+            editor, e.g. an autosaving tab
 
-    db.commit()
-    db.refresh(db_note)
-    return db_note
+    Returns:
+        The SQLAlchemy Note model instance of the update note and whether a
+        version was created, or None if no note is found.
+
+    Raises:
+        PreconditionFailedError: If the note changed since `if_match` was read.
+    """
+    # Takes the Pydantic schema fields excluding the ones that are undefined
+    update_data = note_update.model_dump(exclude_unset=True)
+    for for_update in (False, True):
+        found = get_note_for_write(
+            db, note_id, for_update=for_update, edit_session=edit_session
+        )
+        if found is None:
+            return None
+        db_note, snapshot, coalesce = found
+        if if_match is not None and not etag_matches(
+            if_match, make_etag(serialize_note(db_note))
+        ):
+            raise PreconditionFailedError("The note was modified since it was read")
+        written = write_note(
+            db, db_note, snapshot, update_data, edit_session, versioned=not coalesce
+        )
+        if written is not None:
+            return written, not coalesce
+    # The locked read can't be overtaken
+    raise PreconditionFailedError("The note was modified while it was written")
 
 
 # DELETE
@@ -120,6 +551,7 @@ def delete_note(db: Session, note_id: int) -> Optional[models.Note]:
         return None
 
     db.delete(db_note)
+    record_changes(db, "delete", [note_id])
     db.commit()
 
     return db_note
@@ -1,13 +1,33 @@
-from typing import List, Optional
+from typing import Dict, List, Optional, Sequence, Tuple
 
 from sqlalchemy import desc  # To sort by date descending
-from sqlalchemy.orm import Session
+from sqlalchemy import Select, bindparam, func, select
+from sqlalchemy.orm import Session, aliased, selectinload, undefer
 
-from .. import crud, models
+from .. import models, schemas
+from ..core import delta, diff
+from ..core.http_cache import PreconditionFailedError
+from ..core.pagination import decode_cursor, parse_cursor_id
+from . import note as note_crud
+from . import version_store
+
+# Loads the deferred content of versions, and the snapshots the deltas are
+# based on in one query
+_CONTENT_OPTIONS = (
+    undefer(models.NoteVersion.content_data),
+    selectinload(models.NoteVersion.base_version).undefer(
+        models.NoteVersion.content_data
+    ),
+)
 
 
 def get_note_versions(
-    db: Session, note_id: int, skip: int = 0, limit: int = 100
+    db: Session,
+    note_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    with_content: bool = True,
 ) -> List[models.NoteVersion]:
     """
     Fetches all versions for a specific note, ordered by creation time descending.
@@ -15,70 +35,263 @@ def get_note_versions(
     Args:
         db: The database session.
         note_id: The ID of the note whose versions are to be retrieved.
-        skip: The number of versions to skip (for pagination).
+        skip: The number of versions to skip (ignored when a cursor is given).
         limit: The maximum number of versions to return.
+        cursor: Opaque keyset cursor returned with the previous page.
+        with_content: Loads the stored content of the versions and of their
+            snapshots. Without it, only the metadata columns are read.
 
     Returns:
         A list of SQLAlchemy NoteVersion model instances.
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed.
     """
-    return (
-        db.query(models.NoteVersion)
-        .filter(models.NoteVersion.note_id == note_id)
+    query = (
+        db.query(models.NoteVersion).filter(models.NoteVersion.note_id == note_id)
         # Order by ID descending for reliable ordering (newest first)
         .order_by(desc(models.NoteVersion.id))
-        .offset(skip)
-        .limit(limit)
-        .all()
     )
+    if with_content:
+        query = query.options(*_CONTENT_OPTIONS)
+    if cursor is not None:
+        (last_id,) = decode_cursor(cursor, size=1)
+        query = query.filter(models.NoteVersion.id < parse_cursor_id(last_id))
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
+
+
+def get_note_version(
+    db: Session, note_id: int, version_id: int
+) -> Optional[models.NoteVersion]:
+    """
+    Fetches a single version of a note, with its content.
 
+    Args:
+        db: The database session.
+        note_id: The ID of the note the version must belong to.
+        version_id: The ID of the version.
 
-def restore_note_version(db: Session, version_id: int) -> Optional[models.Note]:
+    Returns:
+        The SQLAlchemy NoteVersion model instance, or None if it is not
+        found or belongs to another note.
+    """
+    return (
+        db.query(models.NoteVersion)
+        .options(*_CONTENT_OPTIONS)
+        .filter(
+            models.NoteVersion.id == version_id,
+            models.NoteVersion.note_id == note_id,
+        )
+        .first()
+    )
+
+
+def version_cursor_key(version: models.NoteVersion) -> Tuple:
+    """Returns the keyset ordering of the versions listing for a version."""
+    return (version.id,)
+
+
+def _decode_content(content_data: bytes, base_data: Optional[bytes]) -> str:
+    # The text of a version from its payload and its base snapshot's
+    if base_data is None:
+        return delta.decompress_text(content_data)
+    return delta.decompress_delta(delta.decompress_text(base_data), content_data)
+
+
+def _version_for_restore_query(for_update: bool) -> Select:
+    # The version, its base snapshot, its note and the note's latest snapshot
+    target = aliased(models.NoteVersion)
+    base = aliased(models.NoteVersion)
+    snapshot, onclause, versions_after = version_store.latest_snapshot_join(
+        target.note_id
+    )
+    query = (
+        select(
+            models.Note,
+            target.title,
+            target.content_data,
+            base.content_data,
+            snapshot.id,
+            snapshot.content_data,
+            versions_after,
+        )
+        .select_from(target)
+        .join(models.Note, models.Note.id == target.note_id)
+        .outerjoin(base, base.id == target.base_version_id)
+        .outerjoin(snapshot, onclause)
+        .where(
+            target.id == bindparam("version_id"),
+            target.note_id == bindparam("note_id"),
+        )
+        .execution_options(populate_existing=True)
+    )
+    return query.with_for_update(of=models.Note) if for_update else query
+
+
+# Built once: the aliases make these statements costly to construct
+VERSION_FOR_RESTORE = _version_for_restore_query(for_update=False)
+VERSION_FOR_RESTORE_LOCKED = _version_for_restore_query(for_update=True)
+
+
+def restore_note_version(
+    db: Session, note_id: int, version_id: int
+) -> Optional[models.Note]:
     """
     Restores a note to the state of a specific version.
 
     This creates a new version of the current state before restoring.
+    Four statements: one SELECT of the version, its base snapshot, the
+    note and the note's latest snapshot, then the writes of
+    `crud.note.write_note`.
 
     Args:
         db: The database session.
+        note_id: The ID of the note the version must belong to.
         version_id: The ID of the NoteVersion to restore from.
 
     Returns:
-        The updated Note object if successful, None otherwise.
+        The updated Note object if successful, None if the version is not
+        found or belongs to another note, before anything is written.
     """
-    # Get the note version to restore from
-    target_version = (
-        db.query(models.NoteVersion).filter(models.NoteVersion.id == version_id).first()
-    )
-    if not target_version:
-        return None  # Version not found
+    params = {"note_id": note_id, "version_id": version_id}
+    # Read again, locked, if another write came in between (see
+    # `crud.note.write_note`)
+    for query in (VERSION_FOR_RESTORE, VERSION_FOR_RESTORE_LOCKED):
+        row = db.execute(query, params).first()
+        if row is None:
+            return None  # Version not found, or of another note
+        (
+            original_note,
+            title,
+            content_data,
+            base_data,
+            snapshot_id,
+            snapshot_data,
+            after,
+        ) = row
+
+        # Rebuild the content of the version to restore
+        content = _decode_content(content_data, base_data)
+
+        # Create a new version of the *current* state before overwriting, and
+        # update the original note with the content from the target version
+        restored = note_crud.write_note(
+            db,
+            original_note,
+            (snapshot_id, snapshot_data, after) if snapshot_id is not None else None,
+            {"title": title, "content": content},
+            change="restore",
+        )
+        if restored is not None:
+            return restored
+    # The locked read can't be overtaken
+    raise PreconditionFailedError("The note was modified while it was written")
 
-    #  Get the original note
-    original_note = crud.get_note(db=db, note_id=target_version.note_id)
 
-    # Create a new version of the *current* state before overwriting
-    current_state_version = models.NoteVersion(
-        note_id=original_note.id,
-        title=original_note.title,
-        content=original_note.content,
+def get_version_contents(
+    db: Session, note_id: int, version_ids: Sequence[int]
+) -> Dict[int, Tuple[str, str]]:
+    """
+    Fetches the title and full content of versions of a note in one query.
+
+    Args:
+        db: The database session.
+        note_id: The ID of the note the versions must belong to.
+        version_ids: The IDs of the versions.
+
+    Returns:
+        A dict of version ID to (title, content); versions not found or of
+        another note are missing from it.
+    """
+    base = aliased(models.NoteVersion)
+    rows = db.execute(
+        select(
+            models.NoteVersion.id,
+            models.NoteVersion.title,
+            models.NoteVersion.content_data,
+            base.content_data,
+        )
+        .outerjoin(base, base.id == models.NoteVersion.base_version_id)
+        .where(
+            models.NoteVersion.note_id == note_id,
+            models.NoteVersion.id.in_(list(version_ids)),
+        )
     )
-    db.add(current_state_version)
+    return {
+        version_id: (title, _decode_content(content_data, base_data))
+        for version_id, title, content_data, base_data in rows
+    }
 
-    # Update the original note with the content from the target version
-    original_note.title = target_version.title
-    original_note.content = target_version.content
 
-    # Commit changes (saves the new current_state_version
-    # AND the updated original_note)
-    db.commit()
+def count_note_versions(db: Session, note_id: int, version_ids: Sequence[int]) -> int:
+    """Counts how many of the given versions exist and belong to a note."""
+    return db.scalar(
+        select(func.count(models.NoteVersion.id)).where(
+            models.NoteVersion.note_id == note_id,
+            models.NoteVersion.id.in_(list(version_ids)),
+        )
+    )
 
-    # Refresh the original_note instance to get updated state
-    db.refresh(original_note)
 
-    return original_note
+def diff_note_versions(
+    db: Session,
+    note_id: int,
+    from_version_id: int,
+    to_version_id: Optional[int] = None,
+    diff_format: str = "unified",
+    context: int = 3,
+) -> Optional[bytes]:
+    """
+    Computes the changes between two versions of a note.
 
+    Args:
+        db: The database session.
+        note_id: The ID of the note.
+        from_version_id: The ID of the old version.
+        to_version_id: The ID of the new version, None for the current note.
+        diff_format: "unified" for a `diff -u` text, "structured" for a
+            list of operations (see `core.diff.diff_ops`).
+        context: Unchanged lines around the changes of a unified diff.
 
-# We could add other functions here later, like:
-# def get_note_version(db: Session, version_id: int) -> Optional[models.NoteVersion]:
-#    """Fetches a specific version by its ID."""
-#    # Implementation needed
-#    pass
+    Returns:
+        The serialized NoteDiff schema, or None if the note or a version is
+        not found.
+    """
+    contents = get_version_contents(
+        db,
+        note_id,
+        [from_version_id] + ([to_version_id] if to_version_id is not None else []),
+    )
+    if from_version_id not in contents:
+        return None
+    if to_version_id is None:
+        db_note = note_crud.get_note(db, note_id)
+        if db_note is None:
+            return None
+        target, to_label = (db_note.title, db_note.content), "current"
+    elif to_version_id in contents:
+        target, to_label = contents[to_version_id], f"version {to_version_id}"
+    else:
+        return None
+
+    (from_title, base), (to_title, content) = contents[from_version_id], target
+    if diff_format == "structured":
+        changes = {"ops": diff.diff_ops(base, content)}
+    else:
+        changes = {
+            "unified": diff.unified_diff(
+                base, content, f"version {from_version_id}", to_label, context
+            )
+        }
+    result = schemas.NoteDiff(
+        note_id=note_id,
+        from_version_id=from_version_id,
+        to_version_id=to_version_id,
+        from_title=from_title,
+        to_title=to_title,
+        format=diff_format,
+        **changes,
+    )
+    return result.model_dump_json().encode()
@@ -0,0 +1,342 @@
+"""
+Retention of note versions: decides which versions a policy expires and
+deletes them in small transactions.
+
+Deltas are stored against a snapshot (see version_store). When a snapshot
+expires but some of its deltas are kept, the oldest kept delta is rewritten
+as the new snapshot and the others as deltas against it before anything is
+deleted. The latest snapshot of a note is never deleted: writers encode new
+versions against it without locking the note.
+"""
+
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import (
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from sqlalchemy import Row, delete, func, select, update
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..core import delta
+from ..core.config import settings
+
+# Notes examined per candidates query
+CANDIDATES_PAGE_SIZE = 100
+
+
+class RetentionPolicy(NamedTuple):
+    """
+    Which versions of a note are kept.
+
+    Attributes:
+        keep_last: Number of most recent versions always kept
+        thin_after: Age after which only the newest version of each bucket
+            is kept
+        thin_bucket: Length of a bucket, "hour" or "day"
+        max_age: Age after which versions are deleted
+    """
+
+    keep_last: int = 0
+    thin_after: Optional[timedelta] = None
+    thin_bucket: str = "day"
+    max_age: Optional[timedelta] = None
+
+    @classmethod
+    def from_settings(cls) -> "RetentionPolicy":
+        """Builds the policy configured by the VERSION_* settings."""
+
+        def days(value: Optional[float]) -> Optional[timedelta]:
+            return timedelta(days=value) if value is not None else None
+
+        return cls(
+            keep_last=settings.VERSION_KEEP_LAST,
+            thin_after=days(settings.VERSION_THIN_AFTER_DAYS),
+            thin_bucket=settings.VERSION_THIN_BUCKET,
+            max_age=days(settings.VERSION_MAX_AGE_DAYS),
+        )
+
+    @property
+    def has_age_rule(self) -> bool:
+        return self.thin_after is not None or self.max_age is not None
+
+    @property
+    def enabled(self) -> bool:
+        return self.keep_last > 0 or self.has_age_rule
+
+    def cutoff(self, now: datetime) -> Optional[datetime]:
+        """The date before which versions may expire, None if any may."""
+        ages = [age for age in (self.thin_after, self.max_age) if age is not None]
+        return now - min(ages) if ages else None
+
+
+class CompactionResult(NamedTuple):
+    notes: int = 0
+    deleted: int = 0
+    rebased: int = 0
+
+
+class CompactionMetrics:
+    """Totals of the compaction runs since the worker started."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.notes = 0
+        self.deleted = 0
+        self.rebased = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_duration_seconds: Optional[float] = None
+
+    def record(self, result: CompactionResult, started_at: datetime) -> None:
+        finished_at = datetime.now(timezone.utc)
+        with self._lock:
+            self.runs += 1
+            self.notes += result.notes
+            self.deleted += result.deleted
+            self.rebased += result.rebased
+            self.last_run_at = finished_at
+            self.last_duration_seconds = (finished_at - started_at).total_seconds()
+
+
+metrics = CompactionMetrics()
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive UTC datetimes
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _bucket(value: datetime, size: str) -> datetime:
+    if size == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def expired_versions(
+    versions: Sequence[Tuple[int, datetime]], policy: RetentionPolicy, now: datetime
+) -> Set[int]:
+    """
+    Applies a retention policy to the history of a note.
+
+    Args:
+        versions: The (id, timestamp) of each version, newest first, with
+            UTC aware timestamps
+        policy: The retention policy
+        now: The current date, aware
+
+    Returns:
+        The IDs of the versions the policy does not keep.
+    """
+    if not policy.enabled:
+        return set()
+
+    expired: Set[int] = set()
+    kept_buckets: Set[datetime] = set()
+    for index, (version_id, timestamp) in enumerate(versions):
+        age = now - timestamp
+        thinned = policy.thin_after is not None and age > policy.thin_after
+        if index >= policy.keep_last:
+            if not policy.has_age_rule or (
+                policy.max_age is not None and age > policy.max_age
+            ):
+                expired.add(version_id)
+                continue
+            # Newest first: the version kept in a bucket is its last state
+            if thinned and _bucket(timestamp, policy.thin_bucket) in kept_buckets:
+                expired.add(version_id)
+                continue
+        if thinned:
+            kept_buckets.add(_bucket(timestamp, policy.thin_bucket))
+    return expired
+
+
+def _candidate_note_ids(
+    db: Session, policy: RetentionPolicy, now: datetime, after_id: int
+) -> List[int]:
+    # Notes with more versions than the kept ones, and old enough versions
+    NoteVersion = models.NoteVersion
+    query = (
+        select(NoteVersion.note_id)
+        .where(NoteVersion.note_id > after_id)
+        .group_by(NoteVersion.note_id)
+        .having(func.count(NoteVersion.id) > policy.keep_last)
+        .order_by(NoteVersion.note_id)
+        .limit(CANDIDATES_PAGE_SIZE)
+    )
+    cutoff = policy.cutoff(now)
+    if cutoff is not None:
+        query = query.having(func.min(NoteVersion.version_timestamp) < cutoff)
+    return list(db.scalars(query))
+
+
+def _rebase(db: Session, orphans: Sequence[Row]) -> None:
+    # Rewrites the kept deltas of expired snapshots, grouped by snapshot:
+    # the oldest becomes a snapshot, the others deltas against it
+    NoteVersion = models.NoteVersion
+    base_ids = {row.base_version_id for row in orphans}
+    payloads: Dict[int, bytes] = dict(
+        db.execute(
+            select(NoteVersion.id, NoteVersion.content_data).where(
+                NoteVersion.id.in_(base_ids | {row.id for row in orphans})
+            )
+        ).all()
+    )
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for row in sorted(orphans, key=lambda row: row.id):
+        groups[row.base_version_id].append(row.id)
+
+    values = []
+    for base_id, version_ids in groups.items():
+        base = delta.decompress_text(payloads[base_id])
+        snapshot_id = version_ids[0]
+        snapshot = delta.decompress_delta(base, payloads[snapshot_id])
+        values.append(
+            {
+                "id": snapshot_id,
+                "content_data": delta.compress_text(snapshot),
+                "base_version_id": None,
+            }
+        )
+        for version_id in version_ids[1:]:
+            content = delta.decompress_delta(base, payloads[version_id])
+            full = delta.compress_text(content)
+            patch = delta.compress_delta(snapshot, content)
+            is_delta = len(patch) < len(full)
+            values.append(
+                {
+                    "id": version_id,
+                    "content_data": patch if is_delta else full,
+                    "base_version_id": snapshot_id if is_delta else None,
+                }
+            )
+    db.execute(update(NoteVersion), values)
+
+
+def compact_note(
+    db: Session,
+    note_id: int,
+    policy: RetentionPolicy,
+    now: datetime,
+    batch_size: int,
+    dry_run: bool = False,
+) -> CompactionResult:
+    """
+    Deletes the expired versions of a note.
+
+    The deltas of the deleted snapshots are rebased in the transaction of the
+    first batch; each batch is committed on its own, deltas first so that no
+    statement deletes a snapshot a remaining row is based on.
+
+    Args:
+        db: The database session
+        note_id: The ID of the note
+        policy: The retention policy
+        now: The current date, aware
+        batch_size: Number of versions deleted per transaction
+        dry_run: Only counts what would be deleted
+
+    Returns:
+        The number of versions deleted and rebased.
+    """
+    NoteVersion = models.NoteVersion
+    rows = db.execute(
+        select(
+            NoteVersion.id, NoteVersion.base_version_id, NoteVersion.version_timestamp
+        )
+        .where(NoteVersion.note_id == note_id)
+        .order_by(NoteVersion.id.desc())
+    ).all()
+    expired = expired_versions(
+        [(row.id, _as_utc(row.version_timestamp)) for row in rows], policy, now
+    )
+    latest_snapshot = next(
+        (row.id for row in rows if row.base_version_id is None), None
+    )
+    expired.discard(latest_snapshot)
+    if not expired:
+        return CompactionResult()
+
+    orphans = [
+        row for row in rows if row.id not in expired and row.base_version_id in expired
+    ]
+    if dry_run:
+        return CompactionResult(1, len(expired), len(orphans))
+
+    if orphans:
+        _rebase(db, orphans)
+    is_snapshot = {row.id: row.base_version_id is None for row in rows}
+    ordered = sorted(expired, key=lambda version_id: is_snapshot[version_id])
+    for start in range(0, len(ordered), batch_size):
+        batch = ordered[start : start + batch_size]
+        db.execute(delete(NoteVersion).where(NoteVersion.id.in_(batch)))
+        db.commit()
+    return CompactionResult(1, len(expired), len(orphans))
+
+
+def compact_versions(
+    db: Session,
+    policy: Optional[RetentionPolicy] = None,
+    now: Optional[datetime] = None,
+    batch_size: Optional[int] = None,
+    dry_run: bool = False,
+    progress: Optional[Callable[[int], None]] = None,
+) -> CompactionResult:
+    """
+    Enforces a retention policy on the versions of every note.
+
+    Args:
+        db: The database session
+        policy: The retention policy, defaults to the configured one
+        now: The date the ages are computed from, defaults to now
+        batch_size: Number of versions deleted per transaction, defaults to
+            COMPACTION_BATCH_SIZE
+        dry_run: Only counts what would be deleted
+        progress: Called with the number of notes examined, before the
+            first one and after each one
+
+    Returns:
+        The number of notes compacted and of versions deleted and rebased.
+    """
+    started_at = datetime.now(timezone.utc)
+    policy = policy or RetentionPolicy.from_settings()
+    now = now or started_at
+    batch_size = batch_size or settings.COMPACTION_BATCH_SIZE
+    if not policy.enabled:
+        return CompactionResult()
+
+    notes = deleted = rebased = examined = 0
+    after_id = 0
+    if progress is not None:
+        progress(examined)
+    while True:
+        note_ids = _candidate_note_ids(db, policy, now, after_id)
+        # Ends the read transaction: each note is compacted in its own
+        db.commit()
+        for note_id in note_ids:
+            result = compact_note(db, note_id, policy, now, batch_size, dry_run)
+            notes += result.notes
+            deleted += result.deleted
+            rebased += result.rebased
+            examined += 1
+            if progress is not None:
+                progress(examined)
+        if len(note_ids) < CANDIDATES_PAGE_SIZE:
+            break
+        after_id = note_ids[-1]
+
+    result = CompactionResult(notes, deleted, rebased)
+    if not dry_run:
+        metrics.record(result, started_at)
+    return result
@@ -0,0 +1,79 @@
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import column, func, literal_column, select, table
+from sqlalchemy.orm import Session
+
+from .. import models
+
+# External content FTS5 table maintained by triggers (see app/db/search.py)
+notes_fts = table("notes_fts", column("rowid"))
+
+# Words, including accented letters, digits and inner apostrophes
+TOKEN_RE = re.compile(r"\w+(?:'\w+)*")
+
+
+def build_fts5_query(q: str) -> Optional[str]:
+    """
+    Turns free text into an FTS5 query matching all its words.
+
+    Each word is quoted, so FTS5 operators and punctuation typed by users
+    can't produce a syntax error, and the last word matches as a prefix
+    to support search-as-you-type.
+
+    Args:
+        q: The text typed by the user
+
+    Returns:
+        The FTS5 MATCH expression, or None if the text has no word.
+    """
+    tokens = TOKEN_RE.findall(q)
+    if not tokens:
+        return None
+    quoted = [f'"{token}"' for token in tokens]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def search_notes(
+    db: Session, q: str, skip: int = 0, limit: int = 20
+) -> List[Tuple[models.Note, float]]:
+    """
+    Searches notes by title and content, best matches first.
+
+    Args:
+        db: The database session
+        q: The text to search for
+        skip: The number of results to be skipped
+        limit: Maximum number of results to be fetched
+
+    Returns:
+        A list of (SQLAlchemy Note model instance, relevance score) tuples.
+        Higher scores are better matches.
+    """
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "sqlite":
+        match = build_fts5_query(q)
+        if match is None:
+            return []
+        # bm25() is lower for better matches; title hits weigh 10x more
+        score = (-func.bm25(literal_column("notes_fts"), 10.0, 1.0)).label("score")
+        query = (
+            select(models.Note, score)
+            .select_from(notes_fts)
+            .join(models.Note, models.Note.id == notes_fts.c.rowid)
+            .where(literal_column("notes_fts").op("MATCH")(match))
+        )
+    elif dialect == "postgresql":
+        ts_query = func.websearch_to_tsquery("simple", q)
+        search_vector = literal_column("notes.search_vector")
+        score = func.ts_rank(search_vector, ts_query).label("score")
+        query = select(models.Note, score).where(search_vector.op("@@")(ts_query))
+    else:
+        raise NotImplementedError(f"Full-text search is not supported on {dialect}")
+
+    rows = db.execute(
+        query.order_by(score.desc(), models.Note.id.desc()).offset(skip).limit(limit)
+    ).all()
+    return [(note, float(note_score)) for note, note_score in rows]
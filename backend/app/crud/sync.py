@@ -0,0 +1,126 @@
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..core.pagination import (
+    InvalidCursorError,
+    decode_cursor,
+    encode_cursor,
+    parse_cursor_id,
+)
+from .changes import get_change_bounds
+
+
+class ExpiredSyncTokenError(ValueError):
+    """Raised when changes after a sync token were pruned from the change log."""
+
+
+def encode_sync_token(seq: int, after_id: Optional[int] = None) -> str:
+    """
+    Encodes the position of a client in the sync.
+
+    Args:
+        seq: The sequence number of the latest change the client has
+        after_id: During the initial sync, the ID of the last note sent
+
+    Returns:
+        An opaque token, sent back as `since` by the next sync.
+    """
+    return encode_cursor(seq, after_id)
+
+
+def decode_sync_token(token: str) -> List[Any]:
+    """
+    Decodes a token produced by `encode_sync_token`.
+
+    Returns:
+        The sequence number and the ID of the last note sent, None once the
+        initial sync is over.
+
+    Raises:
+        InvalidCursorError: If the token is malformed.
+    """
+    try:
+        seq, after_id = decode_cursor(token, size=2)
+        return [
+            parse_cursor_id(seq),
+            None if after_id is None else parse_cursor_id(after_id),
+        ]
+    except InvalidCursorError as exc:
+        raise InvalidCursorError("Invalid sync token") from exc
+
+
+def sync_notes(db: Session, since: Optional[str] = None, limit: int = 500) -> Dict:
+    """
+    Fetches the notes written since a sync token, and the deleted ones.
+
+    Without a token, every note is sent, ordered by ID, `limit` at a time:
+    the token remembers the sequence number of the change log when the
+    initial sync began, so the writes made meanwhile are sent by the next
+    incremental sync. Then each sync reads the next `limit` changes of the
+    log, from its primary key, and sends the current state of their notes:
+    changes become visible in the order of their keys (see
+    `record_changes`), so none is skipped.
+    The changes are read before the notes, and committed with the writes
+    they log: a note written in between is sent in a newer state, and again
+    by the next sync, never missed.
+
+    Args:
+        db: The database session
+        since: The token returned by the previous sync
+        limit: Maximum number of notes (or changes) read
+
+    Returns:
+        A dict with the fields of the NoteSync schema: `notes` as SQLAlchemy
+        Note model instances, ordered by ID, and the IDs of the `deleted`
+        ones.
+
+    Raises:
+        InvalidCursorError: If the token is malformed.
+        ExpiredSyncTokenError: If changes after the token were pruned, the
+            client must sync again without a token.
+    """
+    oldest, latest = get_change_bounds(db)
+    seq, after_id = decode_sync_token(since) if since is not None else (latest, 0)
+    if seq > latest or (oldest is not None and seq < oldest - 1):
+        raise ExpiredSyncTokenError("The sync token expired, sync again without it")
+
+    if after_id is not None:
+        notes = list(
+            db.scalars(
+                select(models.Note)
+                .where(models.Note.id > after_id)
+                .order_by(models.Note.id)
+                .limit(limit)
+            )
+        )
+        has_more = len(notes) == limit
+        return {
+            "notes": notes,
+            "deleted": [],
+            "token": encode_sync_token(seq, notes[-1].id if has_more else None),
+            "has_more": has_more,
+        }
+
+    changes = db.execute(
+        select(models.NoteChange.id, models.NoteChange.note_id)
+        .where(models.NoteChange.id > seq)
+        .order_by(models.NoteChange.id)
+        .limit(limit)
+    ).all()
+    note_ids = {change.note_id for change in changes}
+    notes = list(
+        db.scalars(
+            select(models.Note)
+            .where(models.Note.id.in_(note_ids))
+            .order_by(models.Note.id)
+        )
+    )
+    return {
+        "notes": notes,
+        "deleted": sorted(note_ids - {note.id for note in notes}),
+        "token": encode_sync_token(changes[-1].id if changes else seq),
+        "has_more": len(changes) == limit,
+    }
@@ -0,0 +1,225 @@
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Select, bindparam, exists, func, select
+from sqlalchemy.orm import Session, aliased
+
+from .. import models
+from ..core import delta
+from ..core.config import settings
+from ..db.tenant import DEFAULT_TENANT
+from ..db.types import Timestamp
+
+# (version id, compressed content, number of versions written after it)
+Snapshot = Tuple[int, bytes, int]
+
+
+def _snapshots_query() -> Select:
+    """Selects snapshots with the number of versions written after them."""
+    later = aliased(models.NoteVersion)
+    versions_after = (
+        select(func.count(later.id))
+        .where(
+            later.note_id == models.NoteVersion.note_id,
+            later.id > models.NoteVersion.id,
+        )
+        .scalar_subquery()
+    )
+    return select(
+        models.NoteVersion.note_id,
+        models.NoteVersion.id,
+        models.NoteVersion.content_data,
+        versions_after,
+    ).where(models.NoteVersion.base_version_id.is_(None))
+
+
+def latest_snapshot_join(note_id: Any) -> Tuple[Any, Any, Any]:
+    """
+    Builds an outer join to the latest snapshot of a note, so that a write
+    can read the note and its snapshot in the same statement.
+
+    Args:
+        note_id: The note ID, as a value or as a column of the query
+
+    Returns:
+        The aliased snapshot entity, the ON clause of the join and the
+        number of versions written after the snapshot, as a column.
+    """
+    snapshot = aliased(models.NoteVersion)
+    later = aliased(models.NoteVersion)
+    candidate = aliased(models.NoteVersion)
+    latest_id = (
+        select(func.max(candidate.id))
+        .where(candidate.note_id == note_id, candidate.base_version_id.is_(None))
+        .scalar_subquery()
+    )
+    versions_after = (
+        select(func.count(later.id))
+        .where(later.note_id == snapshot.note_id, later.id > snapshot.id)
+        .scalar_subquery()
+    )
+    return snapshot, snapshot.id == latest_id, versions_after
+
+
+def same_session_version(note_id: Any) -> Any:
+    """
+    Builds a condition telling whether the latest version of a note was
+    written by an edit session since a date, to coalesce its updates.
+
+    The session and the date are the bind parameters "edit_session" and
+    "coalesce_since"; a NULL session never matches.
+
+    Args:
+        note_id: The note ID, as a value or as a column of the query
+
+    Returns:
+        An EXISTS clause, to select as a boolean column.
+    """
+    latest = aliased(models.NoteVersion)
+    candidate = aliased(models.NoteVersion)
+    latest_id = (
+        select(func.max(candidate.id))
+        .where(candidate.note_id == note_id)
+        .scalar_subquery()
+    )
+    return exists().where(
+        latest.id == latest_id,
+        latest.edit_session == bindparam("edit_session"),
+        latest.version_timestamp > bindparam("coalesce_since", type_=Timestamp),
+    )
+
+
+def get_latest_snapshots(db: Session, note_ids: Iterable[int]) -> Dict[int, Snapshot]:
+    """
+    Fetches the most recent snapshot of several notes in one query.
+
+    Args:
+        db: The database session
+        note_ids: The IDs of the notes
+
+    Returns:
+        A dict of note ID to Snapshot tuple.
+        Notes without versions are missing from it.
+    """
+    latest = (
+        select(func.max(models.NoteVersion.id))
+        .where(
+            models.NoteVersion.note_id.in_(list(note_ids)),
+            models.NoteVersion.base_version_id.is_(None),
+        )
+        .group_by(models.NoteVersion.note_id)
+    )
+    rows = db.execute(_snapshots_query().where(models.NoteVersion.id.in_(latest)))
+    return {row[0]: (row[1], row[2], row[3]) for row in rows}
+
+
+def encode_content(
+    content: str, snapshot: Optional[Snapshot]
+) -> Tuple[bytes, Optional[int]]:
+    """
+    Picks the stored form of a new version's content.
+
+    A full snapshot is written every VERSION_SNAPSHOT_INTERVAL versions;
+    the versions in between only store a delta against that snapshot, so
+    rebuilding any version never needs more than two rows.
+
+    Args:
+        content: The content of the new version
+        snapshot: The latest snapshot of the note (a Snapshot tuple)
+
+    Returns:
+        The compressed payload and the id of its base snapshot (None when the
+        payload is itself a snapshot).
+    """
+    full = delta.compress_text(content)
+    if snapshot is None:
+        return full, None
+
+    snapshot_id, snapshot_data, versions_after = snapshot
+    if versions_after + 1 >= settings.VERSION_SNAPSHOT_INTERVAL:
+        return full, None
+
+    patch = delta.compress_delta(delta.decompress_text(snapshot_data), content)
+    # A rewrite can make the delta bigger than the text itself
+    if len(patch) >= len(full):
+        return full, None
+    return patch, snapshot_id
+
+
+def encode_history(contents: Sequence[str]) -> List[Tuple[bytes, bool]]:
+    """
+    Picks the stored form of each version of a history written at once.
+
+    The successive contents are encoded as `encode_content` would have
+    stored them one version at a time, starting from an empty history.
+
+    Args:
+        contents: The contents of the versions, oldest first
+
+    Returns:
+        The compressed payload of each version and whether it is a delta
+        against the latest snapshot before it.
+    """
+    encoded: List[Tuple[bytes, bool]] = []
+    snapshot: Optional[Snapshot] = None
+    for content in contents:
+        content_data, base_version_id = encode_content(content, snapshot)
+        if base_version_id is None:
+            # The id is only known once inserted and is not needed here
+            snapshot = (0, content_data, 0)
+        else:
+            snapshot = (snapshot[0], snapshot[1], snapshot[2] + 1)
+        encoded.append((content_data, base_version_id is not None))
+    return encoded
+
+
+def content_metadata(content: str) -> Dict[str, Any]:
+    """
+    Builds the metadata columns of a version, sent by the versions listing
+    instead of the content.
+
+    Args:
+        content: The content of the version
+
+    Returns:
+        A dict with its length in characters and its SHA-256, in hex.
+    """
+    return {
+        "content_length": len(content),
+        "content_hash": hashlib.sha256(content.encode("utf-8")).hexdigest(),
+    }
+
+
+def version_values(
+    note_id: int,
+    title: str,
+    content: str,
+    snapshot: Optional[Snapshot],
+    edit_session: Optional[str] = None,
+    tenant_id: str = DEFAULT_TENANT,
+) -> Dict[str, Any]:
+    """
+    Builds the column values of a new version, for bulk inserts.
+
+    Args:
+        note_id: The ID of the versioned note
+        title: The title to keep in the version
+        content: The content to keep in the version
+        snapshot: The latest snapshot of the note
+        edit_session: The client edit session of the update
+        tenant_id: The tenant of the note
+
+    Returns:
+        A dict of NoteVersion column values.
+    """
+    content_data, base_version_id = encode_content(content, snapshot)
+    return {
+        "note_id": note_id,
+        "title": title,
+        "content_data": content_data,
+        "base_version_id": base_version_id,
+        "edit_session": edit_session,
+        "tenant_id": tenant_id,
+        **content_metadata(content),
+        # version_timestamp is handled by server_default
+    }
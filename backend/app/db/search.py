@@ -0,0 +1,107 @@
+"""
+Full-text search index of the notes, maintained by the database itself.
+
+SQLite: an external content FTS5 table, notes_fts, synced by triggers on
+notes insert, update and delete.
+PostgreSQL: a tsvector column, notes.search_vector, filled by a trigger and
+covered by a GIN index.
+
+The statements are attached to the notes table so that create_all / drop_all
+(used by the tests) manage them; deployed databases get them from Alembic.
+"""
+
+from sqlalchemy import DDL, Table, event, text
+from sqlalchemy.orm import Session
+
+SQLITE_CREATE = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+        title, content,
+        content='notes', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes BEGIN
+        INSERT INTO notes_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS notes_fts_update
+    AFTER UPDATE OF title, content ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO notes_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+
+SQLITE_DROP = ["DROP TABLE IF EXISTS notes_fts"]
+
+POSTGRES_CREATE = [
+    "ALTER TABLE notes ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    """
+    CREATE INDEX IF NOT EXISTS ix_notes_search_vector
+    ON notes USING GIN (search_vector)
+    """,
+    # Title matches weigh more than content matches in the ranking
+    """
+    CREATE OR REPLACE FUNCTION notes_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(NEW.content, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER notes_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, content ON notes
+    FOR EACH ROW EXECUTE FUNCTION notes_search_vector_update()
+    """,
+]
+
+POSTGRES_DROP = ["DROP FUNCTION IF EXISTS notes_search_vector_update() CASCADE"]
+
+SQLITE_REBUILD = "INSERT INTO notes_fts(notes_fts) VALUES ('rebuild')"
+# Fires the trigger on every note
+POSTGRES_REBUILD = "UPDATE notes SET title = title"
+
+
+def install_search_ddl(notes: Table) -> None:
+    """Registers the search index statements on the notes table events."""
+    for statement in SQLITE_CREATE:
+        event.listen(notes, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+    for statement in SQLITE_DROP:
+        event.listen(notes, "before_drop", DDL(statement).execute_if(dialect="sqlite"))
+    for statement in POSTGRES_CREATE:
+        event.listen(
+            notes, "after_create", DDL(statement).execute_if(dialect="postgresql")
+        )
+    for statement in POSTGRES_DROP:
+        event.listen(
+            notes, "before_drop", DDL(statement).execute_if(dialect="postgresql")
+        )
+
+
+def rebuild_search_index(db: Session) -> None:
+    """
+    Rebuilds the search index of every note of a database, not committed.
+
+    For an index out of sync with the notes, e.g. after a restore or a bulk
+    load with the triggers disabled. Spans the tenants of the database.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        db.execute(text(SQLITE_REBUILD))
+    elif dialect == "postgresql":
+        db.execute(text(POSTGRES_REBUILD))
@@ -1,28 +1,297 @@
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple, TypeVar, Union
+
+from fastapi import Depends
 from sqlalchemy import create_engine, event
-from sqlalchemy.engine import Engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
 
 from ..core.config import settings
+from .tenant import TENANT_INFO_KEY, get_tenant, tenant_of
+
+T = TypeVar("T")
+
+# Either kind of session handed to the endpoints by get_db
+DbSession = Union[Session, AsyncSession]
+# And their factories
+SessionFactory = Union[sessionmaker, async_sessionmaker]
+
+# Async drivers substituted for the sync ones when ASYNC_DATABASE_URL is unset
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def sqlite_pragmas(**overrides: Any) -> Dict[str, Any]:
+    """
+    Lists the pragmas applied to each SQLite connection, from the settings.
+
+    Args:
+        overrides: Pragma values replacing the configured ones
+
+    Returns:
+        A dict of pragma name to value, in the order they must be applied.
+    """
+    pragmas = {
+        "foreign_keys": "ON",
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        "cache_size": settings.SQLITE_CACHE_SIZE,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+    }
+    pragmas.update(overrides)
+    return pragmas
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas: Dict[str, Any]) -> None:
+    """Runs the given PRAGMA statements on a raw SQLite connection."""
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        # Values come from typed settings, never from user input
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
 
 
-@event.listens_for(Engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
-    """Runs PRAGMA foreign_keys=ON for each new SQLite connection."""
-    # Only for SQLite connections
-    if settings.DATABASE_URL.startswith("sqlite"):
-        cursor = dbapi_connection.cursor()
-        cursor.execute("PRAGMA foreign_keys=ON")
-        cursor.close()
+    """Applies the configured pragmas to each new SQLite connection."""
+    apply_sqlite_pragmas(dbapi_connection, sqlite_pragmas())
+
+
+def engine_options(url: str) -> Dict[str, Any]:
+    """
+    Builds the create_engine keyword arguments for a database URL.
+
+    Args:
+        url: The SQLAlchemy database URL
+
+    Returns:
+        The connection and pool options from the settings.
+    """
+    database_url = make_url(url)
+    options: Dict[str, Any] = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if database_url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+        # In-memory databases live in a single connection, there is no pool
+        if database_url.database in (None, "", ":memory:"):
+            return options
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    return options
+
+
+def to_async_url(url: str) -> str:
+    """
+    Swaps the driver of a sync database URL for its async counterpart.
+
+    Args:
+        url: A sync SQLAlchemy URL such as sqlite:///./sql_app.db
+
+    Returns:
+        The same URL using aiosqlite or asyncpg.
+    """
+    scheme, separator, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + separator + rest
+
+
+def _listen_sqlite_pragmas(sync_engine: Engine) -> None:
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", set_sqlite_pragma)
+
+
+def make_sessionmaker(url: str) -> sessionmaker:
+    """Creates an engine for a database URL and a factory of its sessions."""
+    sync_engine = create_engine(url, **engine_options(url))
+    _listen_sqlite_pragmas(sync_engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
+
+
+def make_async_sessionmaker(
+    url: str, async_url: Optional[str] = None
+) -> async_sessionmaker:
+    """
+    Like `make_sessionmaker`, on the async driver of a sync URL.
+
+    Args:
+        url: The sync SQLAlchemy database URL
+        async_url: An async URL to use instead, e.g. ASYNC_DATABASE_URL
+    """
+    async_url = async_url or to_async_url(url)
+    created = create_async_engine(async_url, **engine_options(async_url))
+    _listen_sqlite_pragmas(created.sync_engine)
+    return async_sessionmaker(autocommit=False, autoflush=False, bind=created)
+
+
+SessionLocal = make_sessionmaker(settings.DATABASE_URL)
+engine = SessionLocal.kw["bind"]
+
+# The async engine only exists when selected, so the async drivers stay
+# optional for deployments using the sync stack
+AsyncSessionLocal: Optional[async_sessionmaker] = (
+    make_async_sessionmaker(settings.DATABASE_URL, settings.ASYNC_DATABASE_URL)
+    if settings.DB_ASYNC
+    else None
+)
+
+# Session factories of the tenants with a database of their own, created on
+# first use: (sync, async) by tenant
+_tenant_factories: Dict[str, Tuple[sessionmaker, Optional[async_sessionmaker]]] = {}
+_tenant_factories_lock = threading.Lock()
+
+
+def tenant_sessionmakers(
+    tenant: str,
+) -> Tuple[sessionmaker, Optional[async_sessionmaker]]:
+    """
+    Routes a tenant to its database.
+
+    Args:
+        tenant: The tenant ID
+
+    Returns:
+        The factories of sync and async sessions (None unless DB_ASYNC) on
+        the database of the tenant in TENANT_DATABASES, else the shared one.
+    """
+    url = settings.TENANT_DATABASES.get(tenant)
+    if url is None:
+        return SessionLocal, AsyncSessionLocal
+    with _tenant_factories_lock:
+        if tenant not in _tenant_factories:
+            _tenant_factories[tenant] = (
+                make_sessionmaker(url),
+                make_async_sessionmaker(url) if settings.DB_ASYNC else None,
+            )
+        return _tenant_factories[tenant]
+
+
+def all_sessionmakers() -> Dict[Optional[str], sessionmaker]:
+    """
+    Lists the databases to maintain, e.g. to compact.
+
+    Returns:
+        The sync session factory of the shared database (under None) and
+        of each tenant with a database of its own.
+    """
+    factories: Dict[Optional[str], sessionmaker] = {None: SessionLocal}
+    for tenant in settings.TENANT_DATABASES:
+        factories[tenant] = tenant_sessionmakers(tenant)[0]
+    return factories
+
+
+async def get_db(tenant: str = Depends(get_tenant)) -> AsyncIterator[DbSession]:
+    """
+    Yields a database session for a request, scoped to its tenant.
+
+    An AsyncSession when DB_ASYNC is enabled, a sync Session otherwise, on
+    the database of the tenant (see `tenant_sessionmakers`).
+    """
+    sync_factory, async_factory = tenant_sessionmakers(tenant)
+    if async_factory is not None:
+        async with async_factory(info={TENANT_INFO_KEY: tenant}) as db:
+            yield db
+    else:
+        db = sync_factory(info={TENANT_INFO_KEY: tenant})
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+
+
+async def run_db(db: DbSession, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Runs a sync CRUD function without blocking the event loop.
+
+    With an AsyncSession the function runs through `run_sync`, on the async
+    driver and without a thread. With a sync Session it runs on the threadpool,
+    as sync endpoints do.
+
+    Args:
+        db: The database session
+        fn: A function taking a sync Session as first argument
+        args: Positional arguments passed after the session
+        kwargs: Keyword arguments passed to the function
+
+    Returns:
+        The return value of the function.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+
+def detached_sessionmaker(db: DbSession) -> SessionFactory:
+    """
+    Builds a factory of sessions like a request's, to outlive it.
+
+    For streaming responses: the request session is closed before they are
+    sent. The new sessions share its bind and its info, and so its tenant.
+
+    Args:
+        db: The database session of the request
+
+    Returns:
+        An async_sessionmaker for an AsyncSession, else a sessionmaker.
+    """
+    if isinstance(db, AsyncSession):
+        return async_sessionmaker(bind=db.bind, info=dict(db.info))
+    return sessionmaker(bind=db.get_bind(), info=dict(db.info))
+
+
+def sync_sessionmaker(db: DbSession) -> sessionmaker:
+    """
+    Like `detached_sessionmaker`, always of sync sessions.
+
+    For the work handed to other threads, such as background jobs. With an
+    AsyncSession, the sessions are on the sync engine of its tenant.
+
+    Args:
+        db: The database session of the request
+
+    Returns:
+        A sessionmaker of sessions with the info of db.
+    """
+    if isinstance(db, AsyncSession):
+        sync_factory, _ = tenant_sessionmakers(tenant_of(db))
+        return sessionmaker(bind=sync_factory.kw["bind"], info=dict(db.info))
+    return sessionmaker(bind=db.get_bind(), info=dict(db.info))
+
 
+async def run_db_detached(
+    factory: SessionFactory,
+    fn: Callable[..., T],
+    *args: Any,
+    **kwargs: Any,
+) -> T:
+    """
+    Runs a sync CRUD function like `run_db`, in a new short-lived session.
 
-engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False})
+    Args:
+        factory: A factory built by `detached_sessionmaker`
+        fn: A function taking a sync Session as first argument
+        args: Positional arguments passed after the session
+        kwargs: Keyword arguments passed to the function
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Returns:
+        The return value of the function.
+    """
+    if isinstance(factory, async_sessionmaker):
+        async with factory() as session:
+            return await session.run_sync(fn, *args, **kwargs)
 
+    def run() -> T:
+        with factory() as session:
+            return fn(session, *args, **kwargs)
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+    return await run_in_threadpool(run)
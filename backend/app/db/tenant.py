@@ -0,0 +1,84 @@
+"""
+Partitioning of the notes between tenants (workspaces).
+
+Every row of the tenant tables carries a tenant_id. The tenant of a request
+is resolved by `get_tenant` and stored in the session info by `get_db`:
+then every ORM SELECT, UPDATE and DELETE of the session is limited to the
+tenant's rows (`with_loader_criteria`), and inserts take the tenant from
+`tenant_of`. A session without a tenant, such as the compaction task's,
+sees every tenant.
+"""
+
+from typing import Optional
+
+from fastapi import Header, HTTPException
+from sqlalchemy import Column, String, event
+from sqlalchemy.orm import ORMExecuteState, Session, with_loader_criteria
+
+from ..core.config import settings
+
+# Tenant of the requests without tenant header, and of the rows that
+# existed before tenants did
+DEFAULT_TENANT = "default"
+TENANT_HEADER = "X-Tenant-ID"
+# Key of the session info holding the tenant
+TENANT_INFO_KEY = "tenant_id"
+# Execution option lifting the tenant criteria of a statement, for the
+# reads that span tenants (e.g. the bounds of the shared change log)
+ALL_TENANTS = "all_tenants"
+
+
+class TenantMixin:
+    """Adds the tenant_id column to a model, scoped by the session."""
+
+    tenant_id = Column(String(64), nullable=False, server_default=DEFAULT_TENANT)
+
+
+def tenant_of(db) -> str:
+    """Returns the tenant of a session (sync or async), for inserts."""
+    return db.info.get(TENANT_INFO_KEY) or DEFAULT_TENANT
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _scope_to_tenant(execute_state: ORMExecuteState) -> None:
+    tenant = execute_state.session.info.get(TENANT_INFO_KEY)
+    if tenant is None or execute_state.execution_options.get(ALL_TENANTS):
+        return
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.is_relationship_load
+    ) or (execute_state.is_update or execute_state.is_delete):
+        # Aliases too: the write path reads versions through several.
+        # Not applied by ORM bulk UPDATEs by primary key, whose callers must
+        # select the rows first
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(
+                TenantMixin,
+                lambda cls: cls.tenant_id == tenant,
+                include_aliases=True,
+            )
+        )
+
+
+async def get_tenant(
+    x_tenant_id: Optional[str] = Header(
+        None, min_length=1, max_length=64, pattern=r"^[A-Za-z0-9_.-]+$"
+    ),
+) -> str:
+    """
+    Resolves the tenant of a request from its X-Tenant-ID header.
+
+    The header is trusted: it must be set by the authenticating proxy in
+    front of the API, not by clients.
+
+    Raises:
+        HTTPException: 400 if the header is missing while TENANT_REQUIRED.
+    """
+    if x_tenant_id is None:
+        if settings.TENANT_REQUIRED:
+            raise HTTPException(
+                status_code=400, detail=f"The {TENANT_HEADER} header is required"
+            )
+        return DEFAULT_TENANT
+    return x_tenant_id
@@ -0,0 +1,14 @@
+from sqlalchemy import DateTime
+from sqlalchemy.dialects.sqlite import DATETIME as SQLITE_DATETIME
+
+# SQLite stores CURRENT_TIMESTAMP as "YYYY-MM-DD HH:MM:SS" while SQLAlchemy
+# renders Python datetimes with microseconds. Using the same format on both
+# sides keeps string comparisons (keyset cursors, date filters) consistent.
+Timestamp = DateTime(timezone=True).with_variant(
+    SQLITE_DATETIME(
+        storage_format=(
+            "%(year)04d-%(month)02d-%(day)02d " "%(hour)02d:%(minute)02d:%(second)02d"
+        )
+    ),
+    "sqlite",
+)
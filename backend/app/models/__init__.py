@@ -1,2 +1,4 @@
+from .job import Job  # noqa: F401
 from .note import Note  # noqa: F401
+from .note_change import NoteChange  # noqa: F401
 from .note_version import NoteVersion  # noqa: F401
@@ -0,0 +1,38 @@
+from app.db.base import Base
+from app.db.tenant import TenantMixin
+from app.db.types import Timestamp
+from sqlalchemy import JSON, Boolean, Column, Index, Integer, String, Text, false
+from sqlalchemy.sql import func
+
+
+class Job(TenantMixin, Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Jobs queued by a tenant, counted against JOBS_MAX_QUEUED
+        Index("ix_jobs_tenant_id_status", "tenant_id", "status"),
+        # Jobs to resume on startup: queued, or running without progress
+        Index("ix_jobs_status_updated_at", "status", "updated_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    # "export", "compaction" or "reindex"
+    kind = Column(String(32), nullable=False)
+    # "queued", "running", "succeeded", "failed" or "cancelled"
+    status = Column(String(16), nullable=False, server_default="queued")
+    params = Column(JSON, nullable=False)
+    # Units of work done out of total (e.g. notes exported), total being
+    # None until the job knows it
+    progress = Column(Integer, nullable=False, server_default="0")
+    total = Column(Integer, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    # Set on a running job, which stops at its next progress report
+    cancel_requested = Column(Boolean, nullable=False, server_default=false())
+    created_at = Column(Timestamp, server_default=func.now(), nullable=False)
+    started_at = Column(Timestamp, nullable=True)
+    finished_at = Column(Timestamp, nullable=True)
+    # Moved by every progress report: a running job whose updated_at stays
+    # put has lost its worker
+    updated_at = Column(
+        Timestamp, server_default=func.now(), onupdate=func.now(), nullable=False
+    )
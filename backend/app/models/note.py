@@ -1,18 +1,24 @@
-from sqlalchemy import Column, DateTime, Integer, Text
+from sqlalchemy import Column, Index, Integer, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
 from ..db.base import Base
+from ..db.search import install_search_ddl
+from ..db.tenant import TenantMixin
+from ..db.types import Timestamp
 
 
-class Note(Base):
+class Note(TenantMixin, Base):
     __tablename__ = "notes"
 
     id = Column(Integer, primary_key=True, index=True)
-    title = Column(Text, index=True, nullable=False)
+    # Indexed with the tenant, see __table_args__
+    title = Column(Text, nullable=False)
     content = Column(Text, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
+    # Filled on insert too, so that (updated_at, id) is a total order
+    # usable by keyset pagination
+    updated_at = Column(Timestamp, server_default=func.now(), onupdate=func.now())
 
     # Define the relationship to NoteVersion
     versions = relationship(
@@ -21,3 +27,14 @@ class Note(Base):
         cascade="all, delete-orphan",
         passive_deletes=True,
     )
+
+    __table_args__ = (
+        # Keyset pagination of the notes listing within a tenant, one index
+        # per sort column, which also serves its range filters
+        Index("ix_notes_tenant_id_updated_at_id", "tenant_id", "updated_at", "id"),
+        Index("ix_notes_tenant_id_created_at_id", "tenant_id", "created_at", "id"),
+        Index("ix_notes_tenant_id_title_id", "tenant_id", "title", "id"),
+    )
+
+
+install_search_ddl(Note.__table__)
@@ -0,0 +1,26 @@
+from app.db.base import Base
+from app.db.tenant import TenantMixin
+from app.db.types import Timestamp
+from sqlalchemy import Column, Index, Integer, String
+from sqlalchemy.sql import func
+
+
+class NoteChange(TenantMixin, Base):
+    __tablename__ = "note_changes"
+    __table_args__ = (
+        # The feed and the sync of a tenant read its changes after a
+        # sequence number
+        Index("ix_note_changes_tenant_id_id", "tenant_id", "id"),
+        # AUTOINCREMENT: ids are never reused, even once the latest changes
+        # are deleted, so they can serve as sequence numbers. They are
+        # shared by the tenants
+        {"sqlite_autoincrement": True},
+    )
+
+    # Sequence number of the change
+    id = Column(Integer, primary_key=True)
+    # Not a foreign key: the deletion of a note is logged too
+    note_id = Column(Integer, nullable=False)
+    # "create", "update", "delete" or "restore"
+    kind = Column(String(16), nullable=False)
+    changed_at = Column(Timestamp, server_default=func.now(), nullable=False)
@@ -1,22 +1,71 @@
+from app.core import delta
 from app.db.base import Base
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, Text
-from sqlalchemy.orm import relationship
+from app.db.tenant import TenantMixin
+from app.db.types import Timestamp
+from sqlalchemy import Column, ForeignKey, Index, Integer, LargeBinary, String, Text
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 
 
-class NoteVersion(Base):
+class NoteVersion(TenantMixin, Base):
     __tablename__ = "note_versions"
 
     id = Column(Integer, primary_key=True, index=True)
     note_id = Column(
-        Integer, ForeignKey("notes.id", ondelete="CASCADE"), nullable=False, index=True
+        Integer, ForeignKey("notes.id", ondelete="CASCADE"), nullable=False
     )  # Foreign key to notes.id
     title = Column(Text, nullable=False)
-    content = Column(Text, nullable=False)
 
-    version_timestamp = Column(
-        DateTime(timezone=True), server_default=func.now(), nullable=False
-    )
+    # Compressed content: a full snapshot when base_version_id is NULL,
+    # otherwise a delta against the snapshot base_version_id points to.
+    # Use the `content` property to read the text back. Deferred: the
+    # versions listing only sends metadata, queries needing the content
+    # undefer it.
+    content_data = deferred(Column(LargeBinary, nullable=False))
+    base_version_id = Column(Integer, ForeignKey("note_versions.id"), nullable=True)
+
+    # Length in characters and SHA-256 of the full content, so that the
+    # listing can describe a version without rebuilding it
+    content_length = Column(Integer, nullable=False)
+    content_hash = Column(String(64), nullable=False)
+
+    version_timestamp = Column(Timestamp, server_default=func.now(), nullable=False)
+
+    # Client edit session (X-Edit-Session) of the update that wrote the
+    # version, used to coalesce autosaves
+    edit_session = Column(String(64), nullable=True)
 
     # Define the relationship back to the Note
     note = relationship("Note", back_populates="versions")
+
+    # Snapshot a delta is based on (resolved from the identity map when the
+    # snapshot is part of the same page of versions)
+    base_version = relationship("NoteVersion", remote_side=[id])
+
+    __table_args__ = (
+        # Covers both the note_id lookups and the keyset pagination on id.
+        # No tenant_id index: the versions are always read by note
+        Index("ix_note_versions_note_id_id", "note_id", "id"),
+    )
+
+    @property
+    def is_snapshot(self) -> bool:
+        return self.base_version_id is None
+
+    @property
+    def content(self) -> str:
+        """The full content of the version, rebuilt from its stored form."""
+        # Cached per stored payload: a snapshot is decoded once even when
+        # many deltas of the same page are based on it
+        cached = self.__dict__.get("_content_cache")
+        if cached is not None and cached[0] is self.content_data:
+            return cached[1]
+
+        if self.is_snapshot:
+            content = delta.decompress_text(self.content_data)
+        else:
+            content = delta.decompress_delta(
+                self.base_version.content, self.content_data
+            )
+        self.__dict__["_content_cache"] = (self.content_data, content)
+        return content
@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+
+from .. import schemas
+from ..core.cache import cache
+
+# Cache router
+
+router = APIRouter(prefix="/api/v1/cache", tags=["Cache"])
+
+
+# Endpoint to read the cache counters
+@router.get("/stats", response_model=schemas.CacheStats)
+async def read_cache_stats_endpoint():
+    """
+    Gets the hit and miss counters of the cache of this worker
+    Returns the counters per kind of read and the overall hit ratio
+    """
+    hits, misses = sum(cache.hits.values()), sum(cache.misses.values())
+    return schemas.CacheStats(
+        backend=cache.backend.name,
+        hits=dict(cache.hits),
+        misses=dict(cache.misses),
+        hit_ratio=hits / (hits + misses) if hits + misses else 0.0,
+    )
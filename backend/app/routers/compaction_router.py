@@ -0,0 +1,25 @@
+from fastapi import APIRouter
+
+from .. import schemas
+from ..crud.retention import metrics
+
+# Versions compaction router
+
+router = APIRouter(prefix="/api/v1/compaction", tags=["Compaction"])
+
+
+# Endpoint to read the compaction counters
+@router.get("/stats", response_model=schemas.CompactionStats)
+async def read_compaction_stats_endpoint():
+    """
+    Gets the totals of the versions compaction runs of this worker
+    Returns the number of runs and of versions deleted and rebased
+    """
+    return schemas.CompactionStats(
+        runs=metrics.runs,
+        notes=metrics.notes,
+        versions_deleted=metrics.deleted,
+        versions_rebased=metrics.rebased,
+        last_run_at=metrics.last_run_at,
+        last_duration_seconds=metrics.last_duration_seconds,
+    )
@@ -0,0 +1,103 @@
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.responses import FileResponse
+
+from .. import crud, schemas
+from ..core.config import settings
+from ..db.session import DbSession, get_db, sync_sessionmaker
+from ..db.tenant import tenant_of
+from ..tasks.jobs import export_path, job_runner, may_enqueue, remove_result
+
+# Background jobs router
+
+router = APIRouter(prefix="/api/v1/jobs", tags=["Jobs"])
+
+
+# Endpoint to enqueue a job
+@router.post("/", response_model=schemas.Job, status_code=status.HTTP_202_ACCEPTED)
+async def create_job_endpoint(
+    job: schemas.JobCreate, response: Response, db: DbSession = Depends(get_db)
+):
+    """
+    Enqueues a heavy operation, run in the background by the worker
+    export writes the notes of the tenant to a file, compaction thins their
+    versions, reindex rebuilds the search index of the whole database
+    (admin tenants only)
+    Returns the queued job at once, poll its Location for the progress
+    """
+    if not may_enqueue(tenant_of(db), job.kind):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"A {job.kind} job processes every tenant of the database",
+        )
+    if await crud.aio.count_queued_jobs(db) >= settings.JOBS_MAX_QUEUED:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many jobs queued",
+        )
+    db_job = await crud.aio.create_job(db, job.kind, job.params.model_dump())
+    job_runner.submit(sync_sessionmaker(db), db_job.id)
+    response.headers["Location"] = f"{router.prefix}/{db_job.id}"
+    return db_job
+
+
+# Endpoint to read a job
+@router.get("/{job_id}", response_model=schemas.Job)
+async def read_job_endpoint(job_id: int, db: DbSession = Depends(get_db)):
+    """
+    Gets a job of the tenant by its ID
+    Returns its status, progress, and result or error once finished
+    """
+    db_job = await crud.aio.get_job(db, job_id)
+    if db_job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return db_job
+
+
+# Endpoint to cancel a job
+@router.post("/{job_id}/cancel", response_model=schemas.Job)
+async def cancel_job_endpoint(job_id: int, db: DbSession = Depends(get_db)):
+    """
+    Cancels a job: at once if queued, at its next progress report if running
+    Returns the job, with cancel_requested set while it winds down
+    """
+    try:
+        db_job = await crud.aio.cancel_job(db, job_id)
+    except crud.JobFinishedError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    if db_job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return db_job
+
+
+# Endpoint to delete a finished job
+@router.delete("/{job_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_job_endpoint(job_id: int, db: DbSession = Depends(get_db)):
+    """
+    Deletes a finished job, and the file of an export
+    """
+    try:
+        db_job = await crud.aio.delete_job(db, job_id)
+    except crud.JobNotFinishedError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    if db_job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    remove_result(tenant_of(db), job_id)
+
+
+# Endpoint to download the file of an export job
+@router.get("/{job_id}/result", response_class=FileResponse)
+async def read_job_result_endpoint(job_id: int, db: DbSession = Depends(get_db)):
+    """
+    Downloads the NDJSON written by a succeeded export job
+    """
+    db_job = await crud.aio.get_job(db, job_id)
+    if db_job is None or db_job.kind != "export":
+        raise HTTPException(status_code=404, detail="Job not found")
+    if db_job.status != "succeeded":
+        raise HTTPException(status_code=409, detail="Job has not succeeded")
+    path = export_path(tenant_of(db), job_id)
+    if not path.exists():
+        raise HTTPException(status_code=410, detail="Job result deleted")
+    return FileResponse(
+        path, media_type="application/x-ndjson", filename="notes.ndjson"
+    )
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Response
+
+from ..core.metrics import CONTENT_TYPE, registry
+
+# Metrics router, at the path Prometheus scrapes by default
+
+router = APIRouter(tags=["Metrics"])
+
+
+# Endpoint to scrape the metrics
+@router.get("/metrics", response_class=Response)
+async def read_metrics_endpoint():
+    """
+    Gets the metrics of this worker in the Prometheus text format
+    Latency, response size and SQL statements and time per request, by route
+    """
+    return Response(registry.render(), media_type=CONTENT_TYPE)
@@ -1,10 +1,52 @@
-from typing import List
+import json
+import logging
+import time
+from datetime import datetime
+from typing import (
+    Any,
+    AsyncIterator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
 
 from .. import crud, schemas
-from ..db.session import get_db
+from ..core.compression import cache_compressed
+from ..core.config import settings
+from ..core.http_cache import (
+    PreconditionFailedError,
+    conditional_response,
+    make_etag,
+)
+from ..core.ndjson import iter_lines
+from ..core.pagination import InvalidCursorError, Page
+from ..core.sse import format_comment, format_event
+from ..db.session import DbSession, get_db
+
+# Response header carrying the cursor of the next page for keyset pagination
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Response header of an update telling whether it created a version
+VERSION_CREATED_HEADER = "X-Version-Created"
+
+logger = logging.getLogger(__name__)
+
 
 # Notes router
 
@@ -13,84 +55,643 @@ router = APIRouter(prefix="/api/v1/notes", tags=["Notes"])
 
 # Endpoint to create a Note
 @router.post("/", response_model=schemas.Note, status_code=status.HTTP_201_CREATED)
-def create_note_endpoint(note: schemas.NoteCreate, db: Session = Depends(get_db)):
+async def create_note_endpoint(
+    note: schemas.NoteCreate, db: DbSession = Depends(get_db)
+):
     """
     Create a new note.
     Takes the note data (NoteCreate schema) in the body of the request.
     Returns the created Note (schema Note) with status 201
     """
-    return crud.create_note(db=db, note=note)
+    return await crud.aio.create_note(db=db, note=note)
+
+
+def _check_bulk_size(count: int) -> None:
+    if count > settings.BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"A bulk request accepts at most {settings.BULK_MAX_ITEMS} items",
+        )
+
+
+def _error_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc']) or 'item'}: {err['msg']}"
+        for err in exc.errors()
+    )
+
+
+def _validate_bulk_items(
+    items: List[Any], schema: Type[BaseModel]
+) -> Tuple[List[Tuple[int, Any]], List[schemas.BulkItemResult]]:
+    """
+    Validates each item of a bulk request on its own, objects or not.
+    Returns the (index, schema instance) of the valid items and the
+    failed results of the invalid ones, so one bad item does not reject
+    the whole request
+    """
+    valid, failed = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, schema.model_validate(item)))
+        except ValidationError as exc:
+            failed.append(
+                schemas.BulkItemResult(index=index, ok=False, error=_error_message(exc))
+            )
+    return valid, failed
+
+
+def _bulk_result(results: List[schemas.BulkItemResult]) -> schemas.BulkResult:
+    results.sort(key=lambda result: result.index)
+    succeeded = sum(1 for result in results if result.ok)
+    return schemas.BulkResult(
+        succeeded=succeeded, failed=len(results) - succeeded, results=results
+    )
+
+
+# Endpoint to create many notes at once
+@router.post("/bulk", response_model=schemas.BulkResult)
+async def bulk_create_notes_endpoint(
+    items: List[Any] = Body(...), db: DbSession = Depends(get_db)
+):
+    """
+    Creates many notes in a single transaction.
+    Takes a list of notes (NoteCreate schema) in the body of the request.
+    Returns the outcome of each item at its index: the created note, or the
+    validation error of the item
+    """
+    _check_bulk_size(len(items))
+    valid, results = _validate_bulk_items(items, schemas.NoteCreate)
+
+    created = await crud.aio.bulk_create_notes(db=db, notes=[n for _, n in valid])
+    for (index, _), note in zip(valid, created):
+        results.append(
+            schemas.BulkItemResult(
+                index=index, ok=True, id=note.id, note=schemas.Note.model_validate(note)
+            )
+        )
+    return _bulk_result(results)
+
+
+# Endpoint to update many notes at once
+# Declared before /{note_id} so that "bulk" is not read as a note ID
+@router.put("/bulk", response_model=schemas.BulkResult)
+async def bulk_update_notes_endpoint(
+    items: List[Any] = Body(...), db: DbSession = Depends(get_db)
+):
+    """
+    Updates many notes in a single transaction, versioning each of them.
+    Takes a list of updates (NoteBulkUpdate schema: id and fields to update).
+    Returns the outcome of each item at its index: the updated note, or why
+    it failed (invalid item, duplicate id, note not found)
+    """
+    _check_bulk_size(len(items))
+    valid, results = _validate_bulk_items(items, schemas.NoteBulkUpdate)
+
+    seen, updates = set(), []
+    for index, item in valid:
+        if item.id in seen:
+            results.append(
+                schemas.BulkItemResult(
+                    index=index, ok=False, id=item.id, error="Duplicate note id"
+                )
+            )
+        else:
+            seen.add(item.id)
+            updates.append((index, item))
+
+    updated, missing = await crud.aio.bulk_update_notes(
+        db=db, updates=[item for _, item in updates]
+    )
+    updated_by_id = {note.id: note for note in updated}
+    for index, item in updates:
+        if item.id in missing:
+            results.append(
+                schemas.BulkItemResult(
+                    index=index, ok=False, id=item.id, error="Note not found"
+                )
+            )
+        else:
+            results.append(
+                schemas.BulkItemResult(
+                    index=index,
+                    ok=True,
+                    id=item.id,
+                    note=schemas.Note.model_validate(updated_by_id[item.id]),
+                )
+            )
+    return _bulk_result(results)
+
+
+# Endpoint to delete many notes at once
+@router.post("/bulk/delete", response_model=schemas.BulkResult)
+async def bulk_delete_notes_endpoint(
+    payload: schemas.NoteBulkDelete, db: DbSession = Depends(get_db)
+):
+    """
+    Deletes many notes (and their versions) with a single statement.
+    Takes the list of note ids to delete (NoteBulkDelete schema).
+    Returns the outcome of each id at its index
+    """
+    _check_bulk_size(len(payload.ids))
+    deleted = set(await crud.aio.bulk_delete_notes(db=db, note_ids=payload.ids))
+
+    results, seen = [], set()
+    for index, note_id in enumerate(payload.ids):
+        if note_id in seen:
+            error = "Duplicate note id"
+        elif note_id not in deleted:
+            error = "Note not found"
+        else:
+            error = None
+        seen.add(note_id)
+        results.append(
+            schemas.BulkItemResult(
+                index=index, ok=error is None, id=note_id, error=error
+            )
+        )
+    return _bulk_result(results)
+
+
+# Endpoint to import notes from an NDJSON archive
+@router.post("/import", response_model=schemas.ImportResult)
+async def import_notes_endpoint(
+    request: Request,
+    preserve_versions: bool = False,
+    batch_size: Optional[int] = Query(None, ge=1, le=10000),
+    db: DbSession = Depends(get_db),
+):
+    """
+    Imports notes from an NDJSON body (one note per line, as exported).
+    Takes preserve_versions to also import the versions of each note, and
+    the number of notes inserted per transaction (batch_size)
+    The body is read as it arrives and invalid lines are skipped
+    Returns the number of imported notes and the errors of the failed lines
+    """
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    result = schemas.ImportResult(lines=0, imported=0, failed=0, versions=0, errors=[])
+
+    def fail(line: int, error: str) -> None:
+        result.failed += 1
+        if len(result.errors) < settings.IMPORT_MAX_REPORTED_ERRORS:
+            result.errors.append(schemas.ImportLineError(line=line, error=error))
+
+    async def flush(batch: List[schemas.NoteImport]) -> None:
+        note_ids, versions = await crud.aio.import_notes(
+            db=db, notes=batch, preserve_versions=preserve_versions
+        )
+        result.imported += len(note_ids)
+        result.versions += versions
+        batch.clear()
+        logger.info(
+            "Import: %d lines read, %d notes imported, %d failed",
+            result.lines,
+            result.imported,
+            result.failed,
+        )
+
+    batch: List[schemas.NoteImport] = []
+    async for line in iter_lines(request.stream(), settings.IMPORT_MAX_LINE_BYTES):
+        result.lines += 1
+        if line is None:
+            fail(result.lines, "Line too long")
+            continue
+        if not line.strip():
+            continue
+        try:
+            batch.append(schemas.NoteImport.model_validate(json.loads(line)))
+        except ValidationError as exc:
+            fail(result.lines, _error_message(exc))
+            continue
+        except ValueError as exc:  # Not JSON, or not UTF-8
+            fail(result.lines, f"Invalid JSON: {exc}")
+            continue
+        if len(batch) >= batch_size:
+            await flush(batch)
+    if batch:
+        await flush(batch)
+    return result
+
+
+def _page_response(request: Request, page: Page) -> Response:
+    # The cursor of the next page is only sent when the page is full
+    headers = {}
+    if page.next_cursor is not None:
+        headers[NEXT_CURSOR_HEADER] = page.next_cursor
+    return conditional_response(request, page.body, headers=headers)
+
+
+def _summary_fields(view: str, fields: Optional[str]) -> Optional[List[str]]:
+    """
+    Resolves the fields of a summary listing, None for full notes.
+    Unknown fields are rejected with a 400 error
+    """
+    if fields is None:
+        return list(crud.SUMMARY_FIELDS) if view == "summary" else None
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    # id and updated_at are always sent: they identify the note and its state
+    unknown = requested - set(crud.SUMMARY_FIELDS) - {"id", "updated_at"}
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}. "
+            f"Available fields: {', '.join(crud.SUMMARY_FIELDS)}",
+        )
+    return [field for field in crud.SUMMARY_FIELDS if field in requested]
+
+
+def _note_listing(
+    sort: Literal["updated_at", "created_at", "title"] = "updated_at",
+    order: Literal["asc", "desc"] = "desc",
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    updated_after: Optional[datetime] = None,
+    updated_before: Optional[datetime] = None,
+    title_prefix: Optional[str] = Query(None, min_length=1, max_length=100),
+) -> crud.NoteListing:
+    """
+    Reads the order and filters of the notes listing from the query string.
+    Date ranges include *_after and exclude *_before, naive dates are UTC
+    """
+    return crud.NoteListing(
+        sort=sort,
+        order=order,
+        created_after=created_after,
+        created_before=created_before,
+        updated_after=updated_after,
+        updated_before=updated_before,
+        title_prefix=title_prefix,
+    )
 
 
 # Endpoint to read all notes
-@router.get("/", response_model=List[schemas.Note])
-def read_notes_endpoint(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@router.get("/", response_model=Union[List[schemas.Note], List[schemas.NoteSummary]])
+async def read_notes_endpoint(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    view: Literal["full", "summary"] = "full",
+    fields: Optional[str] = None,
+    listing: crud.NoteListing = Depends(_note_listing),
+    db: DbSession = Depends(get_db),
+):
+    """
+    Gets a list of notes with pagination by default, most recently updated first.
+    Takes parameters skip and limit, or the opaque cursor of the previous page
+    When the page is full, the cursor of the next one is sent in X-Next-Cursor
+    sort= (updated_at, created_at or title) and order= (asc or desc) change
+    the order, created_after/created_before, updated_after/updated_before
+    and title_prefix (case-sensitive) filter the notes
+    view=summary sends summaries (NoteSummary schema) with a preview of the
+    content instead of the content, fields= limits them to some fields
+    (title, created_at, preview), besides id and updated_at
+    Answers 304 Not Modified when If-None-Match has the ETag of the page
+    Returns a list of notes (schema Note or NoteSummary)
+    """
+    summary_fields = _summary_fields(view, fields)
+    page_options = {"skip": skip, "limit": limit, "cursor": cursor}
+    try:
+        if summary_fields is None:
+            page = await crud.aio.get_notes_page(db=db, listing=listing, **page_options)
+        else:
+            page = await crud.aio.get_note_summaries_page(
+                db=db, fields=summary_fields, listing=listing, **page_options
+            )
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    # No Last-Modified: a deleted note changes the page but no updated_at
+    return _page_response(request, page)
+
+
+# Endpoint to search notes
+# Declared before /{note_id} so that "search" is not read as a note ID
+@router.get("/search", response_model=List[schemas.NoteSearchResult])
+async def search_notes_endpoint(
+    q: str = Query(..., min_length=1),
+    skip: int = 0,
+    limit: int = Query(20, ge=1, le=100),
+    db: DbSession = Depends(get_db),
+):
+    """
+    Full-text search over note titles and contents.
+    Takes the searched text q and the pagination parameters skip and limit
+    Returns the matching notes ranked by relevance, best match first
+    """
+    results = await crud.aio.search_notes(db=db, q=q, skip=skip, limit=limit)
+    return [
+        schemas.NoteSearchResult(
+            **schemas.Note.model_validate(note).model_dump(), score=score
+        )
+        for note, score in results
+    ]
+
+
+# Endpoint to export all notes
+# Declared before /{note_id} so that "export" is not read as a note ID
+@router.get("/export", response_class=StreamingResponse)
+async def export_notes_endpoint(
+    include_versions: bool = False, db: DbSession = Depends(get_db)
+):
     """
-    Gets a list of notes with pagination by default.
-    Takes parameters skip and limit
-    Returns a list of notes (schema Note)
+    Streams every note as NDJSON (one JSON object per line), ordered by id.
+    Takes include_versions to embed the versions of each note, oldest first
+    Notes are read in batches from a server-side cursor, memory stays flat
     """
-    notes = crud.get_notes(db=db, skip=skip, limit=limit)
-    return notes
+    return StreamingResponse(
+        crud.export_notes(
+            db,
+            include_versions=include_versions,
+            batch_size=settings.EXPORT_BATCH_SIZE,
+        ),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="notes.ndjson"'},
+    )
+
+
+# Endpoint to sync the notes written since a previous sync
+# Declared before /{note_id} so that "sync" is not read as a note ID
+@router.get("/sync", response_model=schemas.NoteSync)
+async def sync_notes_endpoint(
+    since: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    db: DbSession = Depends(get_db),
+):
+    """
+    Gets the notes created or updated since the token of the previous sync,
+    and the IDs of the deleted ones (tombstones)
+    Without a token, gets every note, for the first sync of a client
+    Returns a token to send as since next time, and has_more when the next
+    page can be fetched right away
+    Answers 410 Gone when changes after the token were pruned: the client
+    syncs again without a token
+    """
+    try:
+        return await crud.aio.sync_notes(
+            db, since, limit=limit or settings.SYNC_PAGE_SIZE
+        )
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except crud.ExpiredSyncTokenError as exc:
+        raise HTTPException(status_code=410, detail=str(exc)) from exc
+
+
+async def _change_events(
+    db: DbSession, request: Request, after: int, reset: bool = False
+) -> AsyncIterator[str]:
+    """Renders the change log followed from `after` as Server-Sent Events."""
+    if reset:
+        yield format_event(json.dumps({"seq": after}), event="reset", event_id=after)
+    sent_at = time.monotonic()
+    async for changes in crud.aio.stream_changes(db, after, request.is_disconnected):
+        if changes:
+            yield "".join(
+                format_event(change.model_dump_json(), change.kind, change.seq)
+                for change in changes
+            )
+        elif time.monotonic() - sent_at >= settings.CHANGE_FEED_HEARTBEAT_SECONDS:
+            # Keeps proxies from closing an idle connection
+            yield format_comment("keep-alive")
+        else:
+            continue
+        sent_at = time.monotonic()
+
+
+# Endpoint to follow the writes to notes
+# Declared before /{note_id} so that "changes" is not read as a note ID
+@router.get("/changes", response_class=StreamingResponse)
+async def note_changes_endpoint(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0),
+    last_event_id: Optional[str] = Header(None),
+    db: DbSession = Depends(get_db),
+):
+    """
+    Streams the writes to notes as Server-Sent Events, named create, update,
+    delete or restore, with the NoteChange as data and its seq as id
+    Resumes after the Last-Event-ID header (sent by EventSource when it
+    reconnects) or the since sequence number, follows new changes otherwise
+    A reset event tells that changes to resume from were pruned: the client
+    reloads its notes, then follows on from the seq of the event
+    """
+    if last_event_id is not None:
+        try:
+            since = int(last_event_id)
+        except ValueError as exc:
+            raise HTTPException(
+                status_code=400, detail="Invalid Last-Event-ID header"
+            ) from exc
+
+    oldest, latest = await crud.aio.get_change_bounds(db)
+    # Resuming after a pruned change, or one this log never had, would miss
+    # changes silently
+    reset = since is not None and (
+        since > latest or (oldest is not None and since < oldest - 1)
+    )
+    after = latest if since is None or reset else since
+    return StreamingResponse(
+        _change_events(db, request, after, reset=reset),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # Endpoint to read a specific note
 @router.get("/{note_id}", response_model=schemas.Note)
-def read_note_endpoint(note_id: int, db: Session = Depends(get_db)):
+async def read_note_endpoint(
+    note_id: int, request: Request, db: DbSession = Depends(get_db)
+):
     """
     Get a note based on its ID
+    Sends its ETag and Last-Modified, and answers 304 Not Modified to
+    If-None-Match or If-Modified-Since when the note did not change
     Returns the found note (Note schema) or 404 error
     """
 
-    db_note = crud.get_note(db=db, note_id=note_id)
+    db_note = await crud.aio.get_note(db=db, note_id=note_id)
     if db_note is None:
         # Raise HTTP exception if no note is found
         raise HTTPException(status_code=404, detail="Note not found on update")
-    return db_note
+    return conditional_response(
+        request, crud.serialize_note(db_note), last_modified=db_note.updated_at
+    )
 
 
 # Endpoint to update a note
 @router.put("/{note_id}", response_model=schemas.Note)
-def update_note_endpoint(
-    note_id: int, note: schemas.NoteUpdate, db: Session = Depends(get_db)
+async def update_note_endpoint(
+    note_id: int,
+    note: schemas.NoteUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    x_edit_session: Optional[str] = Header(None, max_length=64),
+    db: DbSession = Depends(get_db),
 ):
     """
     Updates a note based on its ID
-    Returns the updated note
+    With an If-Match header, the note is only updated if its ETag matches,
+    otherwise 412 Precondition Failed is returned (optimistic concurrency)
+    Updates sent with the same X-Edit-Session header shortly after each other
+    are coalesced into one version (see VERSION_COALESCE_SECONDS)
+    Returns the updated note, its new ETag and whether a version was created
     """
-    updated_note = crud.update_note(db=db, note_id=note_id, note_update=note)
-    if updated_note is None:
+    try:
+        updated = await crud.aio.update_note(
+            db=db,
+            note_id=note_id,
+            note_update=note,
+            if_match=if_match,
+            edit_session=x_edit_session,
+        )
+    except PreconditionFailedError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED, detail=str(exc)
+        ) from exc
+    if updated is None:
         raise HTTPException(status_code=404, detail="Note not found")
+    updated_note, version_created = updated
+    response.headers["ETag"] = make_etag(crud.serialize_note(updated_note))
+    response.headers[VERSION_CREATED_HEADER] = "true" if version_created else "false"
     return updated_note
 
 
 # Endpoint to delete a note
 @router.delete("/{note_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_note_endpoint(note_id: int, db: Session = Depends(get_db)):
+async def delete_note_endpoint(note_id: int, db: DbSession = Depends(get_db)):
     """
     Deletes a note based on its ID
     Returns status 204 No content if success and 404 if there is an error
     """
-    deleted_note = crud.delete_note(db, note_id=note_id)
+    deleted_note = await crud.aio.delete_note(db, note_id=note_id)
     if deleted_note is None:
         raise HTTPException(status_code=404, detail="Note not found on delete")
     return None
 
 
 # Endpoint to get versions for a specific note
-@router.get("/{note_id}/versions/", response_model=List[schemas.NoteVersion])
-def read_note_versions_endpoint(
-    note_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
+@router.get(
+    "/{note_id}/versions/",
+    response_model=Union[List[schemas.NoteVersionSummary], List[schemas.NoteVersion]],
+)
+async def read_note_versions_endpoint(
+    note_id: int,
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    view: Literal["summary", "full"] = "summary",
+    db: DbSession = Depends(get_db),
 ):
     """
     Gets a list of versions for a specific note, ordered from newest to oldest.
-    Takes path parameter note_id and query parameters skip and limit.
-    Returns a list of note versions (schema NoteVersion).
+    Takes path parameter note_id and query parameters skip and limit,
+    or the opaque cursor of the previous page (sent in X-Next-Cursor).
+    By default versions are described without their content (length and
+    hash instead), view=full sends the full content of each version.
+    Answers 304 Not Modified when If-None-Match has the ETag of the page.
+    Returns a list of note versions (schema NoteVersionSummary or NoteVersion).
     """
+    read_page = (
+        crud.aio.get_note_versions_page
+        if view == "full"
+        else crud.aio.get_note_version_summaries_page
+    )
+    try:
+        page = await read_page(
+            db=db, note_id=note_id, skip=skip, limit=limit, cursor=cursor
+        )
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return _page_response(request, page)
 
-    versions = crud.get_note_versions(db=db, note_id=note_id, skip=skip, limit=limit)
 
-    return versions
+# Endpoint to get a single version of a note
+@router.get("/{note_id}/versions/{version_id}", response_model=schemas.NoteVersion)
+async def read_note_version_endpoint(
+    note_id: int, version_id: int, request: Request, db: DbSession = Depends(get_db)
+):
+    """
+    Gets a version of a note with its full content
+    Answers 304 Not Modified when If-None-Match has its ETag
+    Returns the version (schema NoteVersion), 404 if it is not a version of
+    the note
+    """
+    version = await crud.aio.get_note_version(db, note_id, version_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Version not found")
+    # Versions never change: their compressed bodies are kept
+    cache_compressed(request)
+    return conditional_response(request, version.model_dump_json().encode())
+
+
+async def _diff_response(
+    request: Request,
+    db: DbSession,
+    note_id: int,
+    version_id: int,
+    other_version_id: Optional[int],
+    diff_format: str,
+    context: int,
+) -> Response:
+    body = await crud.aio.diff_note_versions(
+        db,
+        note_id,
+        version_id,
+        other_version_id,
+        diff_format=diff_format,
+        context=context,
+    )
+    if body is None:
+        raise HTTPException(status_code=404, detail="Note or version not found")
+    if other_version_id is not None:
+        # Neither does the diff of two of them
+        cache_compressed(request)
+    return conditional_response(request, body)
+
+
+# Endpoint to diff a version against another one
+@router.get(
+    "/{note_id}/versions/{version_id}/diff/{other_version_id}",
+    response_model=schemas.NoteDiff,
+)
+async def diff_note_versions_endpoint(
+    note_id: int,
+    version_id: int,
+    other_version_id: int,
+    request: Request,
+    diff_format: Literal["unified", "structured"] = Query("unified", alias="format"),
+    context: int = Query(3, ge=0, le=100),
+    db: DbSession = Depends(get_db),
+):
+    """
+    Gets the changes from a version of a note to another one
+    Takes the format query parameter: a unified diff text (default) or
+    structured line operations, and the context lines of a unified diff
+    Returns the diff (schema NoteDiff), 404 if a version is not found
+    """
+    return await _diff_response(
+        request, db, note_id, version_id, other_version_id, diff_format, context
+    )
+
+
+# Endpoint to diff a version against the current note
+@router.get("/{note_id}/versions/{version_id}/diff", response_model=schemas.NoteDiff)
+async def diff_note_version_current_endpoint(
+    note_id: int,
+    version_id: int,
+    request: Request,
+    diff_format: Literal["unified", "structured"] = Query("unified", alias="format"),
+    context: int = Query(3, ge=0, le=100),
+    db: DbSession = Depends(get_db),
+):
+    """
+    Gets the changes from a version of a note to its current state
+    Takes the same query parameters as the diff between two versions
+    Returns the diff (schema NoteDiff) with a null to_version_id
+    """
+    return await _diff_response(
+        request, db, note_id, version_id, None, diff_format, context
+    )
 
 
 # Endpoint to restore a note to a specific version
@@ -98,30 +699,22 @@ def read_note_versions_endpoint(
     "/{note_id}/versions/{version_id}/restore/",
     response_model=schemas.Note,  # Returns the updated note
 )
-def restore_note_version_endpoint(
-    note_id: int,  # Included for clarity in the path
+async def restore_note_version_endpoint(
+    note_id: int,
     version_id: int,
-    db: Session = Depends(get_db),
+    db: DbSession = Depends(get_db),
 ):
     """
     Restores a note to the state of a specific version.
     Creates a new version of the current state before restoring.
     Returns the updated Note.
     """
-    # We pass version_id to the CRUD function.
-    # note_id is implicitly checked because the version belongs to a note.
-    restored_note = crud.restore_note_version(db=db, version_id=version_id)
+    restored_note = await crud.aio.restore_note_version(
+        db=db, note_id=note_id, version_id=version_id
+    )
 
     if restored_note is None:
-        # This could mean the version_id was invalid
-        raise HTTPException(
-            status_code=404, detail="Version or original note not found"
-        )
-
-    # Ensure the restored note actually matches the note_id from the path
-    if restored_note.id != note_id:
-        raise HTTPException(
-            status_code=400, detail="Version does not belong to the specified note"
-        )
+        # The version does not exist, or belongs to another note
+        raise HTTPException(status_code=404, detail="Version not found")
 
     return restored_note
@@ -1,6 +1,30 @@
-from .note import Note, NoteCreate, NoteIndDBBase, NoteUpdate  # noqa: F401
+from .bulk import (  # noqa: F401
+    BulkItemResult,
+    BulkResult,
+    ImportLineError,
+    ImportResult,
+    NoteBulkDelete,
+    NoteBulkUpdate,
+    NoteImport,
+    NoteImportVersion,
+)
+from .cache import CacheStats  # noqa: F401
+from .compaction import CompactionStats  # noqa: F401
+from .job import Job, JobCreate, JobParams  # noqa: F401
+from .note import (  # noqa: F401
+    Note,
+    NoteCreate,
+    NoteIndDBBase,
+    NoteSearchResult,
+    NoteSummary,
+    NoteUpdate,
+)
+from .note_change import NoteChange, NoteSync  # noqa: F401
 from .note_version import (  # noqa: F401
+    NoteDiff,
+    NoteDiffOp,
     NoteVersion,
     NoteVersionCreate,
     NoteVersionInDBBase,
+    NoteVersionSummary,
 )
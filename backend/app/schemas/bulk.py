@@ -0,0 +1,73 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, field_validator
+
+from .note import Note, NoteCreate, NoteUpdate
+
+
+# Schema of one item of a bulk update: the note ID and the fields to update.
+# A field may be left out, not set to null: the columns are NOT NULL
+class NoteBulkUpdate(NoteUpdate):
+    id: int
+
+    @field_validator("title", "content")
+    @classmethod
+    def not_null(cls, value: Optional[str]) -> str:
+        if value is None:
+            raise ValueError("must not be null")
+        return value
+
+
+# Schema for bulk deletes
+class NoteBulkDelete(BaseModel):
+    ids: List[int]
+
+
+# Outcome of one item of a bulk request, reported at the index it was sent
+class BulkItemResult(BaseModel):
+    index: int
+    ok: bool
+    id: Optional[int] = None
+    # The created or updated note (not sent back for deletes)
+    note: Optional[Note] = None
+    error: Optional[str] = None
+
+
+# Response of the bulk endpoints
+class BulkResult(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult]
+
+
+# One version of an imported note's history
+class NoteImportVersion(BaseModel):
+    title: str
+    content: str
+    version_timestamp: Optional[datetime] = None
+
+
+# Schema of one line of an NDJSON import, as written by the export.
+# Other fields (such as the exported id) are ignored: notes get new IDs.
+class NoteImport(NoteCreate):
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    # Previous versions, oldest first
+    versions: List[NoteImportVersion] = []
+
+
+# A line of an import that could not be imported
+class ImportLineError(BaseModel):
+    line: int
+    error: str
+
+
+# Response of the import endpoint
+class ImportResult(BaseModel):
+    lines: int
+    imported: int
+    failed: int
+    versions: int
+    # The first IMPORT_MAX_REPORTED_ERRORS errors
+    errors: List[ImportLineError]
@@ -0,0 +1,12 @@
+from typing import Dict
+
+from pydantic import BaseModel
+
+
+# Hit and miss counters of the cache, per kind of cached read
+# ("note" for a single note, "notes" for listings), since the worker started
+class CacheStats(BaseModel):
+    backend: str
+    hits: Dict[str, int]
+    misses: Dict[str, int]
+    hit_ratio: float
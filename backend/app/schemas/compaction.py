@@ -0,0 +1,14 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+# Totals of the versions compaction runs of this worker since it started
+class CompactionStats(BaseModel):
+    runs: int
+    notes: int
+    versions_deleted: int
+    versions_rebased: int
+    last_run_at: Optional[datetime] = None
+    last_duration_seconds: Optional[float] = None
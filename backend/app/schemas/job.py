@@ -0,0 +1,39 @@
+from datetime import datetime
+from typing import Any, Dict, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+# Parameters of a job, each one read by a single kind
+class JobParams(BaseModel):
+    # export: embeds the versions of each note
+    include_versions: bool = False
+    # compaction: counts the versions the policy would delete, without deleting
+    dry_run: bool = False
+
+    model_config = ConfigDict(extra="forbid")
+
+
+# Schema to enqueue a job
+class JobCreate(BaseModel):
+    kind: Literal["export", "compaction", "reindex"]
+    params: JobParams = Field(default_factory=JobParams)
+
+
+# Schema to send a job via API. progress counts the units of work done
+# out of total (None until known), result is set once the job succeeded
+class Job(BaseModel):
+    id: int
+    kind: str
+    status: Literal["queued", "running", "succeeded", "failed", "cancelled"]
+    params: Dict[str, Any]
+    progress: int
+    total: Optional[int] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    cancel_requested: bool
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
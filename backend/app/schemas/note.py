@@ -34,3 +34,19 @@ class NoteIndDBBase(NoteBase):
 # Schema to send note via API
 class Note(NoteIndDBBase):
     pass
+
+
+# Schema of a full-text search result, best matches have the highest score
+class NoteSearchResult(Note):
+    score: float
+
+
+# Schema of a note in the summary listing: no content, only a preview.
+# Fields not requested with `fields=` are left out of the response.
+class NoteSummary(BaseModel):
+    id: int
+    updated_at: Optional[datetime] = None
+    title: Optional[str] = None
+    created_at: Optional[datetime] = None
+    # Beginning of the content on one line, ended with "\u2026" if cut
+    preview: Optional[str] = None
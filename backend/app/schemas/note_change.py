@@ -0,0 +1,28 @@
+from datetime import datetime
+from typing import List, Literal
+
+from pydantic import BaseModel
+
+from .note import Note
+
+
+# A write to a note, pushed by the change feed. seq is its sequence number
+# in the change log, increasing with each write
+class NoteChange(BaseModel):
+    seq: int
+    note_id: int
+    kind: Literal["create", "update", "delete", "restore"]
+    changed_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+# Response of an incremental sync: the notes written since the token, the IDs
+# of the deleted ones, and the token of the next sync. has_more asks for
+# the next page right away
+class NoteSync(BaseModel):
+    notes: List[Note]
+    deleted: List[int]
+    token: str
+    has_more: bool
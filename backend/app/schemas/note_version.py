@@ -1,5 +1,6 @@
 # backend/app/schemas/note_version.py
 from datetime import datetime
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel
 
@@ -31,6 +32,44 @@ class NoteVersion(NoteVersionInDBBase):
     pass
 
 
+# Metadata of a version, sent by the versions listing instead of the
+# content: its length in characters and its SHA-256 tell versions apart
+class NoteVersionSummary(BaseModel):
+    id: int
+    note_id: int
+    title: str
+    version_timestamp: datetime
+    content_length: int
+    content_hash: str
+
+    class Config:
+        from_attributes = True
+
+
+# One run of lines of a structured diff (ranges are 0-based, end exclusive)
+class NoteDiffOp(BaseModel):
+    op: Literal["equal", "insert", "delete", "replace"]
+    from_start: int
+    from_end: int
+    to_start: int
+    to_end: int
+    removed: List[str] = []
+    added: List[str] = []
+
+
+# Changes between a version and another one, or the current note
+# (to_version_id is null); `unified` or `ops` is set depending on the format
+class NoteDiff(BaseModel):
+    note_id: int
+    from_version_id: int
+    to_version_id: Optional[int] = None
+    from_title: str
+    to_title: str
+    format: Literal["unified", "structured"]
+    unified: Optional[str] = None
+    ops: Optional[List[NoteDiffOp]] = None
+
+
 # Optional: If we want to return versions within the note itself (less likely)
 # class NoteVersionWithNote(NoteVersion):
 #    note: Note # Would require importing Note from schemas.note
@@ -0,0 +1,170 @@
+"""
+Enforces the versions retention policy of the settings, prunes the change
+log after CHANGE_LOG_MAX_AGE_DAYS and the finished jobs after
+JOBS_MAX_AGE_DAYS.
+
+Runs in the background of the API every COMPACTION_INTERVAL_SECONDS, or
+once from the command line (e.g. from cron):
+
+    python -m app.tasks.compaction [--dry-run] [--batch-size N]
+
+Each worker of the API runs its own task: a database is compacted by one
+of them at a time, the others skip it until their next pass (see
+`compaction_lock`).
+"""
+
+import argparse
+import asyncio
+import fcntl
+import logging
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+
+from ..core.config import settings
+from ..crud.changes import prune_changes
+from ..crud.retention import CompactionResult, compact_versions
+from ..db.session import all_sessionmakers
+from .jobs import prune_jobs
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL advisory lock key of the compaction of a database
+# (b"note_cmp" as a bigint)
+COMPACTION_LOCK_KEY = 0x6E6F74655F636D70
+
+
+@contextmanager
+def compaction_lock(engine: Engine) -> Iterator[bool]:
+    """
+    Takes the compaction lock of a database, without waiting for it.
+
+    A session-level advisory lock on PostgreSQL, an exclusive lock on a
+    file next to the database on SQLite (the workers of one host). An
+    in-memory database belongs to one process: it is never locked.
+
+    Args:
+        engine: The engine of the database
+
+    Yields:
+        Whether the lock was taken, held until the end of the block.
+    """
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as connection:
+            taken = connection.scalar(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": COMPACTION_LOCK_KEY}
+            )
+            # Held by the connection, not left idle in a transaction
+            connection.commit()
+            try:
+                yield bool(taken)
+            finally:
+                if taken:
+                    connection.execute(
+                        text("SELECT pg_advisory_unlock(:key)"),
+                        {"key": COMPACTION_LOCK_KEY},
+                    )
+                    connection.commit()
+        return
+    database = engine.url.database
+    if engine.dialect.name != "sqlite" or database in (None, "", ":memory:"):
+        yield True
+        return
+    with open(f"{database}.compaction-lock", "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def run_compaction(
+    dry_run: bool = False, batch_size: Optional[int] = None
+) -> CompactionResult:
+    """
+    Runs one compaction pass, in a session per database.
+
+    The sessions have no tenant: they compact every tenant of the shared
+    database, then each tenant database of TENANT_DATABASES. A database
+    being compacted by another worker or process is skipped.
+    """
+    max_age = settings.CHANGE_LOG_MAX_AGE_DAYS
+    jobs_max_age = settings.JOBS_MAX_AGE_DAYS
+    result = CompactionResult()
+    for factory in all_sessionmakers().values():
+        engine = factory.kw["bind"].engine
+        # A dry run writes nothing, it needs no lock
+        lock = nullcontext(True) if dry_run else compaction_lock(engine)
+        with lock as locked, factory() as db:
+            if not locked:
+                logger.info(
+                    "Versions compaction: %s already compacted elsewhere, skipped",
+                    engine.url.render_as_string(hide_password=True),
+                )
+                continue
+            compacted = compact_versions(db, batch_size=batch_size, dry_run=dry_run)
+            result = CompactionResult(*map(sum, zip(result, compacted)))
+            if max_age is not None and not dry_run:
+                before = datetime.now(timezone.utc) - timedelta(days=max_age)
+                pruned = prune_changes(db, before)
+                logger.info("Change log: %d changes pruned", pruned)
+            if jobs_max_age is not None and not dry_run:
+                before = datetime.now(timezone.utc) - timedelta(days=jobs_max_age)
+                logger.info("Jobs: %d pruned", prune_jobs(db, before))
+    logger.info(
+        "Versions compaction%s: %d notes, %d versions deleted, %d rebased",
+        " (dry run)" if dry_run else "",
+        *result,
+    )
+    return result
+
+
+async def compact_periodically(interval: float) -> None:
+    """Runs a compaction pass every `interval` seconds, until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # Blocking database work, kept off the event loop
+            await run_in_threadpool(run_compaction)
+        except Exception:
+            # A failed pass must not stop the next ones
+            logger.exception("Versions compaction failed")
+
+
+def start_background_compaction() -> Optional[asyncio.Task]:
+    """Starts the periodic compaction if COMPACTION_INTERVAL_SECONDS is set."""
+    if settings.COMPACTION_INTERVAL_SECONDS <= 0:
+        return None
+    return asyncio.create_task(
+        compact_periodically(settings.COMPACTION_INTERVAL_SECONDS)
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="count the versions the policy would delete, without deleting",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="versions deleted per transaction (default: COMPACTION_BATCH_SIZE)",
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    run_compaction(dry_run=args.dry_run, batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+Background jobs: heavy operations run off the request, on a thread pool.
+
+A job is a row of the jobs table, in the database of its tenant. Enqueued
+by POST /api/v1/jobs/, it is claimed and run by a thread of the worker
+that enqueued it, JOBS_MAX_WORKERS at a time, and writes its progress and
+outcome to its row. No broker: the table is the queue, and the jobs a
+restart left behind are run again on the next start (see `resume_jobs`).
+
+Threads rather than processes: the jobs mostly wait on the database, and
+they share the engines and settings of the worker.
+
+Cancellation is cooperative: a running job stops at its next progress
+report. So does every job when the worker shuts down, back in the queue,
+and a job another worker took over after it went stale. Every job reports
+its progress at least between two stages, so that a job running long
+does not look stale.
+
+Finished jobs and their files are deleted after JOBS_MAX_AGE_DAYS by the
+compaction task, or on request.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Set
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, sessionmaker
+
+from .. import crud, models
+from ..core.config import settings
+from ..crud.job import DATABASE_JOB_KINDS
+from ..db.search import rebuild_search_index
+from ..db.session import all_sessionmakers
+from ..db.tenant import TENANT_INFO_KEY
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """Raised in a job cancelled while it runs."""
+
+
+class JobInterrupted(Exception):
+    """Raised in the jobs running when the worker shuts down."""
+
+
+class JobContext:
+    """
+    What a job runs with: its parameters, sessions and progress reports.
+
+    Attributes:
+        job_id: The ID of the job
+        claimed_at: When it was claimed, identifying the claim running it
+        tenant: The tenant that enqueued it
+        params: Its parameters
+        factory: Sessions on the database of the tenant, scoped to it
+    """
+
+    def __init__(
+        self,
+        job_id: int,
+        claimed_at: datetime,
+        tenant: str,
+        params: Dict[str, Any],
+        factory: sessionmaker,
+        stopping: threading.Event,
+    ):
+        self.job_id = job_id
+        self.claimed_at = claimed_at
+        self.tenant = tenant
+        self.params = params
+        self.factory = factory
+        self._stopping = stopping
+
+    def report(self, progress: int, total: Optional[int] = None) -> None:
+        """
+        Records the progress of the job, and stops it if asked to.
+
+        Raises:
+            JobCancelled: If the job was cancelled, or requeued as stale.
+            JobInterrupted: If the worker is shutting down.
+        """
+        if self._stopping.is_set():
+            raise JobInterrupted()
+        with self.factory() as db:
+            if crud.update_job_progress(
+                db, self.job_id, self.claimed_at, progress, total
+            ):
+                raise JobCancelled()
+
+
+def export_path(tenant: str, job_id: int) -> Path:
+    """The file written by an export job."""
+    return Path(settings.JOBS_RESULTS_DIR) / f"{tenant}-{job_id}.ndjson"
+
+
+def _export(context: JobContext) -> Dict[str, Any]:
+    path = export_path(context.tenant, context.job_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Renamed once complete: the result is never read half written
+    partial = path.with_suffix(".part")
+    try:
+        with context.factory() as db, open(partial, "w", encoding="utf-8") as out:
+            notes = crud.write_export(
+                db,
+                out,
+                include_versions=context.params.get("include_versions", False),
+                batch_size=settings.EXPORT_BATCH_SIZE,
+                progress=context.report,
+            )
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    os.replace(partial, path)
+    return {"notes": notes, "bytes": path.stat().st_size}
+
+
+def _compaction(context: JobContext) -> Dict[str, Any]:
+    # The versions of the tenant only: its session is scoped to it. The
+    # change log is left to the periodic compaction, it is pruned for all
+    # tenants at once. Progress counts the notes examined, total unknown
+    with context.factory() as db:
+        result = crud.compact_versions(
+            db,
+            dry_run=context.params.get("dry_run", False),
+            progress=context.report,
+        )
+    return result._asdict()
+
+
+def _reindex(context: JobContext) -> None:
+    # The whole database: only enqueued by the tenants allowed to (see
+    # `may_enqueue`). One statement, reported before and after: the last
+    # report may still cancel it, before the commit
+    context.report(0, 2)
+    with context.factory() as db:
+        rebuild_search_index(db)
+        context.report(1, 2)
+        db.commit()
+
+
+def may_enqueue(tenant: str, kind: str) -> bool:
+    """
+    Tells whether a tenant may enqueue a job of a kind.
+
+    The jobs of DATABASE_JOB_KINDS process every tenant of a database: they
+    are left to the tenants of JOBS_ADMIN_TENANTS, and to those with a
+    database of their own.
+    """
+    return (
+        kind not in DATABASE_JOB_KINDS
+        or tenant in settings.JOBS_ADMIN_TENANTS
+        or tenant in settings.TENANT_DATABASES
+    )
+
+
+def remove_result(tenant: str, job_id: int) -> None:
+    """Deletes the file of a job, if it wrote one."""
+    export_path(tenant, job_id).unlink(missing_ok=True)
+
+
+def prune_jobs(db: Session, before: datetime) -> int:
+    """
+    Deletes the jobs finished before a date, and their files.
+
+    Args:
+        db: The database session
+        before: Jobs finished earlier are deleted
+
+    Returns:
+        The number of deleted jobs.
+    """
+    pruned = crud.prune_jobs(db, before)
+    for job_id, tenant in pruned:
+        remove_result(tenant, job_id)
+    return len(pruned)
+
+
+# Runs a job and returns its result, by kind
+JOB_HANDLERS: Dict[str, Callable[[JobContext], Optional[Dict[str, Any]]]] = {
+    "export": _export,
+    "compaction": _compaction,
+    "reindex": _reindex,
+}
+
+
+class JobRunner:
+    """The thread pool running the jobs of this worker, created on first use."""
+
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: Set[Future] = set()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def submit(self, factory: sessionmaker, job_id: int) -> Future:
+        """
+        Runs a queued job once a thread is free.
+
+        Args:
+            factory: Sessions on the database of the job, scoped to its
+                tenant
+            job_id: The ID of the job
+        """
+        with self._lock:
+            if self._executor is None:
+                self._stopping.clear()
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.JOBS_MAX_WORKERS, thread_name_prefix="job"
+                )
+            future = self._executor.submit(self._run, factory, job_id)
+            self._futures.add(future)
+        future.add_done_callback(self._forget)
+        return future
+
+    def _forget(self, future: Future) -> None:
+        with self._lock:
+            self._futures.discard(future)
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        """Waits for the jobs submitted so far to finish."""
+        with self._lock:
+            futures = list(self._futures)
+        wait(futures, timeout=timeout)
+
+    def shutdown(self) -> None:
+        """
+        Stops the threads, blocking until the running jobs stop.
+
+        Running jobs stop at their next progress report. They and the jobs
+        not started yet stay queued, for the next start.
+        """
+        self._stopping.set()
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _run(self, factory: sessionmaker, job_id: int) -> None:
+        try:
+            with factory() as db:
+                job = crud.claim_job(db, job_id)
+                if job is None:
+                    # Cancelled, or run by another worker
+                    return
+                kind = job.kind
+                context = JobContext(
+                    job.id,
+                    job.started_at,
+                    job.tenant_id,
+                    job.params,
+                    factory,
+                    self._stopping,
+                )
+            self._execute(kind, context)
+        except Exception:
+            logger.exception("Job %d could not run", job_id)
+
+    def _execute(self, kind: str, context: JobContext) -> None:
+        job_id = context.job_id
+        try:
+            result = JOB_HANDLERS[kind](context)
+        except JobCancelled:
+            outcome = {"status": "cancelled"}
+        except JobInterrupted:
+            with context.factory() as db:
+                crud.requeue_job(db, job_id, context.claimed_at)
+            return
+        except Exception as exc:
+            logger.exception("Job %d failed", job_id)
+            outcome = {"status": "failed", "error": str(exc) or type(exc).__name__}
+        else:
+            outcome = {"status": "succeeded", "result": result}
+        with context.factory() as db:
+            if not crud.finish_job(db, job_id, context.claimed_at, **outcome):
+                logger.warning("Job %d was taken over, outcome dropped", job_id)
+
+
+job_runner = JobRunner()
+
+
+def resume_jobs() -> int:
+    """
+    Submits the jobs a restart left behind, of every database.
+
+    Those left queued, and those left running by a worker that died (see
+    `crud.resumable_jobs`). A job queued by another worker still running
+    may be submitted too: only one claims it. Databases without a jobs
+    table, not migrated yet, are skipped.
+
+    Returns:
+        The number of jobs submitted.
+    """
+    stale_before = datetime.now(timezone.utc) - timedelta(
+        seconds=settings.JOBS_STALE_SECONDS
+    )
+    submitted = 0
+    for factory in all_sessionmakers().values():
+        bind = factory.kw["bind"]
+        if not inspect(bind).has_table(models.Job.__tablename__):
+            # Not migrated yet: nothing to resume, and no reason not to start
+            logger.warning(
+                "Jobs: no jobs table in %s, not resumed",
+                bind.engine.url.render_as_string(hide_password=True),
+            )
+            continue
+        with factory() as db:
+            jobs = crud.resumable_jobs(db, stale_before)
+        for job_id, tenant in jobs:
+            job_runner.submit(
+                sessionmaker(bind=bind, info={TENANT_INFO_KEY: tenant}),
+                job_id,
+            )
+            submitted += 1
+    if submitted:
+        logger.info("Jobs: %d resumed", submitted)
+    return submitted
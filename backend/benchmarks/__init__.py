@@ -0,0 +1,5 @@
+import os
+
+# The app settings require a DATABASE_URL; benchmarks build their own
+# throwaway databases and never use it
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
@@ -0,0 +1,438 @@
+"""
+Load test of the notes API: latency percentiles and throughput per endpoint.
+
+`run` seeds a dataset (N notes with M versions of C characters each) into a
+throwaway SQLite file, or into the scratch database of --database-url (e.g.
+a local PostgreSQL, whose tables are created then dropped). Then it drives
+every endpoint of the notes router, --requests times each at --concurrency
+requests in flight, through an in-process ASGI client or, with
+--server-workers, uvicorn workers serving the seeded database over HTTP.
+The change feed is left out: its stream never ends.
+
+`compare` checks a run against a baseline and fails when a percentile got
+slower than --threshold.
+
+Usage:
+    python -m benchmarks.bench_api run [--notes N] [--versions M] [--size C]
+        [--requests R] [--concurrency K] [--server-workers W]
+        [--database-url URL] [--scenarios NAME ...] [--output FILE]
+    python -m benchmarks.bench_api compare BASELINE CURRENT [--threshold 0.2]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+from app import crud, schemas
+from app.core.cache import NullCache, cache
+from app.db.base import Base
+from app.db.session import get_db
+from app.models import NoteVersion
+from main import app
+from sqlalchemy import create_engine, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+from .common import (
+    WORDS,
+    edit_text,
+    make_session,
+    random_text,
+    report,
+    temporary_engine,
+)
+
+# Notes imported per transaction while seeding
+SEED_BATCH_SIZE = 500
+PERCENTILES = ("p50", "p95", "p99")
+
+# A request of a scenario: method, URL and httpx keyword arguments
+Request = Tuple[str, str, Dict[str, Any]]
+
+
+class Dataset:
+    """IDs of the seeded notes and versions the scenarios pick from."""
+
+    def __init__(
+        self, versions: Dict[int, List[int]], disposable: List[int], size: int
+    ):
+        self.versions = versions
+        self.note_ids = list(versions)
+        self.versioned = [note_id for note_id, ids in versions.items() if ids]
+        # Notes consumed by the delete scenarios, one per request
+        self.disposable = disposable
+        self.size = size
+
+
+def seed(engine: Engine, rng: random.Random, args: argparse.Namespace) -> Dataset:
+    """Imports the notes and their histories, then a pool of disposable notes."""
+    db = make_session(engine)
+    versions: Dict[int, List[int]] = {}
+    for start in range(0, args.notes, SEED_BATCH_SIZE):
+        notes = []
+        for i in range(start, min(start + SEED_BATCH_SIZE, args.notes)):
+            contents = [random_text(rng, args.size)]
+            for _ in range(args.versions):
+                contents.append(edit_text(rng, contents[-1]))
+            notes.append(
+                schemas.NoteImport(
+                    title=f"Note {i}",
+                    content=contents[-1],
+                    versions=[
+                        schemas.NoteImportVersion(title=f"Note {i}", content=content)
+                        for content in contents[:-1]
+                    ],
+                )
+            )
+        note_ids, _ = crud.import_notes(db, notes, preserve_versions=True)
+        versions.update((note_id, []) for note_id in note_ids)
+
+    for note_id, version_id in db.execute(
+        select(NoteVersion.note_id, NoteVersion.id).order_by(NoteVersion.id)
+    ):
+        versions[note_id].append(version_id)
+    disposable, _ = crud.import_notes(
+        db,
+        [
+            schemas.NoteImport(title=f"Disposable {i}", content="")
+            for i in range(2 * args.requests)
+        ],
+    )
+    db.close()
+    return Dataset(versions, disposable, args.size)
+
+
+def _note(rng: random.Random, data: Dataset) -> int:
+    return rng.choice(data.note_ids)
+
+
+def _version(rng: random.Random, data: Dataset) -> Tuple[int, int]:
+    note_id = rng.choice(data.versioned)
+    return note_id, rng.choice(data.versions[note_id])
+
+
+def _body(rng: random.Random, data: Dataset) -> Dict[str, str]:
+    return {"title": "Benchmark", "content": random_text(rng, data.size)}
+
+
+def _restore(rng: random.Random, data: Dataset) -> Request:
+    note_id, version_id = _version(rng, data)
+    return "POST", f"/api/v1/notes/{note_id}/versions/{version_id}/restore/", {}
+
+
+def _diff(rng: random.Random, data: Dataset) -> Request:
+    note_id, version_id = _version(rng, data)
+    return "GET", f"/api/v1/notes/{note_id}/versions/{version_id}/diff", {}
+
+
+def _import(rng: random.Random, data: Dataset) -> Request:
+    lines = [json.dumps(_body(rng, data)) for _ in range(10)]
+    return "POST", "/api/v1/notes/import", {"content": "\n".join(lines).encode()}
+
+
+# Scenarios needing seeded versions
+VERSION_SCENARIOS = ("version", "diff", "restore")
+
+# Builders of the requests of each scenario, reads first, deletes last
+SCENARIOS: Dict[str, Callable[[random.Random, Dataset], Request]] = {
+    "list": lambda rng, data: ("GET", "/api/v1/notes/", {"params": {"limit": 20}}),
+    "list_summary": lambda rng, data: (
+        "GET",
+        "/api/v1/notes/",
+        {"params": {"limit": 20, "view": "summary"}},
+    ),
+    "read": lambda rng, data: ("GET", f"/api/v1/notes/{_note(rng, data)}", {}),
+    "search": lambda rng, data: (
+        "GET",
+        "/api/v1/notes/search",
+        {"params": {"q": rng.choice(WORDS)}},
+    ),
+    "sync": lambda rng, data: ("GET", "/api/v1/notes/sync", {"params": {"limit": 100}}),
+    "versions": lambda rng, data: (
+        "GET",
+        f"/api/v1/notes/{_note(rng, data)}/versions/",
+        {},
+    ),
+    "version": lambda rng, data: (
+        "GET",
+        "/api/v1/notes/{}/versions/{}".format(*_version(rng, data)),
+        {},
+    ),
+    "diff": _diff,
+    "export": lambda rng, data: ("GET", "/api/v1/notes/export", {}),
+    "create": lambda rng, data: ("POST", "/api/v1/notes/", {"json": _body(rng, data)}),
+    "update": lambda rng, data: (
+        "PUT",
+        f"/api/v1/notes/{_note(rng, data)}",
+        {"json": {"content": random_text(rng, data.size)}},
+    ),
+    "restore": _restore,
+    "bulk_create": lambda rng, data: (
+        "POST",
+        "/api/v1/notes/bulk",
+        {"json": [_body(rng, data) for _ in range(10)]},
+    ),
+    "bulk_update": lambda rng, data: (
+        "PUT",
+        "/api/v1/notes/bulk",
+        {"json": [{"id": _note(rng, data), "title": "Bulk"} for _ in range(10)]},
+    ),
+    "import": _import,
+    "delete": lambda rng, data: (
+        "DELETE",
+        f"/api/v1/notes/{data.disposable.pop()}",
+        {},
+    ),
+    "bulk_delete": lambda rng, data: (
+        "POST",
+        "/api/v1/notes/bulk/delete",
+        {"json": {"ids": [data.disposable.pop()]}},
+    ),
+}
+
+
+def summarize(latencies: List[float], errors: int, seconds: float) -> Dict[str, Any]:
+    """Computes the percentiles (ms) and throughput of a scenario."""
+    # 99 cut points: index 49 is the median
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+        "p50": round(cuts[49] * 1000, 2),
+        "p95": round(cuts[94] * 1000, 2),
+        "p99": round(cuts[98] * 1000, 2),
+        "requests_per_second": round(len(latencies) / seconds, 1),
+    }
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    build: Callable[[random.Random, Dataset], Request],
+    data: Dataset,
+    rng: random.Random,
+    requests: int,
+    concurrency: int,
+) -> Dict[str, Any]:
+    # Built up front, so that the picks do not depend on the interleaving
+    queue = [build(rng, data) for _ in range(requests)]
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        while queue:
+            method, url, kwargs = queue.pop()
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            errors += response.status_code >= 400
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def drive(
+    client: httpx.AsyncClient, data: Dataset, args: argparse.Namespace
+) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    results = {}
+    for name in args.scenarios:
+        if not data.versioned and name in VERSION_SCENARIOS:
+            continue
+        results[name] = await run_scenario(
+            client, SCENARIOS[name], data, rng, args.requests, args.concurrency
+        )
+    return results
+
+
+@contextmanager
+def database(args: argparse.Namespace) -> Iterator[Engine]:
+    """Yields a throwaway SQLite engine, or the scratch database of the URL."""
+    if args.database_url is None:
+        with temporary_engine(pool_size=args.concurrency, max_overflow=0) as engine:
+            yield engine
+        return
+    engine = create_engine(args.database_url, pool_size=args.concurrency)
+    Base.metadata.create_all(engine)
+    try:
+        yield engine
+    finally:
+        Base.metadata.drop_all(engine)
+        engine.dispose()
+
+
+@contextmanager
+def in_process_client(engine: Engine) -> Iterator[httpx.AsyncClient]:
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def bench_db():
+        with SessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = bench_db
+    try:
+        yield httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench"
+        )
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+
+@contextmanager
+def server_client(
+    engine: Engine, workers: int, port: int
+) -> Iterator[httpx.AsyncClient]:
+    env = {
+        **os.environ,
+        "DATABASE_URL": engine.url.render_as_string(hide_password=False),
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)]
+        + ["--workers", str(workers), "--log-level", "warning"],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                httpx.get(base_url + "/")
+                break
+            except httpx.TransportError:
+                if time.monotonic() > deadline or server.poll() is not None:
+                    raise RuntimeError("The uvicorn server did not start") from None
+                time.sleep(0.2)
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        yield httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    if args.no_cache:
+        cache.configure(NullCache())
+    with database(args) as engine:
+        started = time.perf_counter()
+        data = seed(engine, random.Random(args.seed), args)
+        seed_seconds = time.perf_counter() - started
+        if args.server_workers:
+            connect = server_client(engine, args.server_workers, args.port)
+        else:
+            connect = in_process_client(engine)
+        with connect as client:
+            results = asyncio.run(drive(client, data, args))
+    return {
+        "dataset": {"notes": args.notes, "versions": args.versions, "size": args.size},
+        "database": engine.dialect.name,
+        "transport": (
+            f"uvicorn x{args.server_workers}" if args.server_workers else "asgi"
+        ),
+        "concurrency": args.concurrency,
+        "seed_seconds": round(seed_seconds, 2),
+        "scenarios": results,
+    }
+
+
+def compare(
+    baseline: Dict[str, Any], current: Dict[str, Any], threshold: float
+) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Compares the percentiles of two runs, scenario by scenario.
+
+    Args:
+        baseline: The results of the reference run
+        current: The results of the run to check
+        threshold: Relative slowdown tolerated, e.g. 0.2 for 20%
+
+    Returns:
+        The ratio current / baseline of each percentile of the scenarios of
+        both runs, and the "scenario pXX" slower than the threshold.
+    """
+    ratios: Dict[str, Any] = {}
+    regressions = []
+    for name, before in baseline["scenarios"].items():
+        after = current["scenarios"].get(name)
+        if after is None:
+            continue
+        ratios[name] = {}
+        for percentile in PERCENTILES:
+            ratio = after[percentile] / before[percentile] if before[percentile] else 1
+            ratios[name][percentile] = round(ratio, 2)
+            if ratio > 1 + threshold:
+                regressions.append(f"{name} {percentile}")
+    return ratios, regressions
+
+
+def _load(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="seed a dataset and load the API")
+    run_parser.add_argument("--notes", type=int, default=1000)
+    run_parser.add_argument("--versions", type=int, default=10, help="per note")
+    run_parser.add_argument("--size", type=int, default=2000, help="characters")
+    run_parser.add_argument("--requests", type=int, default=200, help="per scenario")
+    run_parser.add_argument("--concurrency", type=int, default=8)
+    run_parser.add_argument(
+        "--server-workers",
+        type=int,
+        default=0,
+        help="serve through uvicorn with this many workers (default: in process)",
+    )
+    run_parser.add_argument("--port", type=int, default=8765)
+    run_parser.add_argument(
+        "--database-url",
+        default=None,
+        help="scratch database to seed, its tables are dropped afterwards "
+        "(default: a temporary SQLite file)",
+    )
+    run_parser.add_argument("--no-cache", action="store_true")
+    run_parser.add_argument(
+        "--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS)
+    )
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--output", help="also write the results to this file")
+
+    compare_parser = commands.add_parser("compare", help="check a run for regressions")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument(
+        "--threshold", type=float, default=0.2, help="relative slowdown tolerated"
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        ratios, regressions = compare(
+            _load(args.baseline), _load(args.current), args.threshold
+        )
+        report("api_compare", {"ratios": ratios, "regressions": regressions})
+        sys.exit(1 if regressions else 0)
+
+    if args.requests < 2:
+        parser.error("--requests must be at least 2 to compute percentiles")
+    results = run(args)
+    report("api", results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({"benchmark": "api", **results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Compares the bulk create/update path with one crud call per note.
+
+Usage: python -m benchmarks.bench_bulk [--notes N] [--size CHARS]
+"""
+
+import argparse
+import random
+import time
+
+from app import crud, schemas
+from app.models import Note
+
+from .common import make_session, random_text, report, temporary_engine
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run(args: argparse.Namespace, bulk: bool) -> dict:
+    rng = random.Random(args.seed)
+    creates = [
+        schemas.NoteCreate(title=f"Note {i}", content=random_text(rng, args.size))
+        for i in range(args.notes)
+    ]
+    with temporary_engine() as engine:
+        db = make_session(engine)
+        if bulk:
+            create_seconds = timed(lambda: crud.bulk_create_notes(db, creates))
+        else:
+            create_seconds = timed(lambda: [crud.create_note(db, n) for n in creates])
+
+        note_ids = [note_id for (note_id,) in db.query(Note.id)]
+        updates = [
+            schemas.NoteBulkUpdate(id=note_id, content=random_text(rng, args.size))
+            for note_id in note_ids
+        ]
+        if bulk:
+            update_seconds = timed(lambda: crud.bulk_update_notes(db, updates))
+        else:
+            update_seconds = timed(
+                lambda: [
+                    crud.update_note(
+                        db,
+                        u.id,
+                        schemas.NoteUpdate(
+                            **u.model_dump(exclude={"id"}, exclude_unset=True)
+                        ),
+                    )
+                    for u in updates
+                ]
+            )
+        db.close()
+
+    return {
+        "create_seconds": round(create_seconds, 4),
+        "creates_per_second": round(args.notes / create_seconds, 1),
+        "update_seconds": round(update_seconds, 4),
+        "updates_per_second": round(args.notes / update_seconds, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=1000)
+    parser.add_argument("--size", type=int, default=1000, help="characters")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    single = run(args, bulk=False)
+    bulk = run(args, bulk=True)
+    report(
+        "bulk",
+        {
+            "notes": args.notes,
+            "single": single,
+            "bulk": bulk,
+            "create_speedup": round(
+                single["create_seconds"] / bulk["create_seconds"], 1
+            ),
+            "update_speedup": round(
+                single["update_seconds"] / bulk["update_seconds"], 1
+            ),
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Measures response compression: bytes on the wire and CPU time per request.
+
+Notes of --size characters are seeded with a history, then each scenario
+is requested --repeat times through the in-process ASGI app, once per
+content coding this worker supports and once without compression. The
+median wire size and CPU time (process time, serving and compressing) are
+reported per request. The immutable version and diff are also measured
+with the cache disabled, to show what caching their compressed bodies
+saves.
+
+Usage: python -m benchmarks.bench_compression [--notes N] [--size CHARS]
+    [--repeat R]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Dict, List
+
+import httpx
+from app import crud, schemas
+from app.core.cache import MemoryCache, NullCache, cache
+from app.core.compression import available_codings
+from app.db.session import get_db
+from main import app
+from sqlalchemy.orm import sessionmaker
+
+from .common import edit_text, make_session, random_text, report, temporary_engine
+
+
+def seed(engine, rng: random.Random, notes: int, size: int) -> Dict[str, str]:
+    """Imports the notes, and returns the URL of each scenario."""
+    db = make_session(engine)
+    imported = []
+    for i in range(notes):
+        contents = [random_text(rng, size)]
+        for _ in range(3):
+            contents.append(edit_text(rng, contents[-1]))
+        imported.append(
+            schemas.NoteImport(
+                title=f"Note {i}",
+                content=contents[-1],
+                versions=[
+                    schemas.NoteImportVersion(title=f"Note {i}", content=content)
+                    for content in contents[:-1]
+                ],
+            )
+        )
+    note_ids, _ = crud.import_notes(db, imported, preserve_versions=True)
+    note_id = note_ids[0]
+    # Newest first
+    newer, older = [version.id for version in crud.get_note_versions(db, note_id)][:2]
+    db.close()
+    return {
+        "notes_page": f"/api/v1/notes/?limit={notes}",
+        "summaries_page": f"/api/v1/notes/?limit={notes}&view=summary",
+        "note": f"/api/v1/notes/{note_id}",
+        "version": f"/api/v1/notes/{note_id}/versions/{older}",
+        "diff": f"/api/v1/notes/{note_id}/versions/{older}/diff/{newer}",
+    }
+
+
+async def measure(client: httpx.AsyncClient, url: str, coding: str, repeat: int):
+    wire, cpu = [], []
+    for _ in range(repeat):
+        started = time.process_time()
+        response = await client.get(url, headers={"Accept-Encoding": coding})
+        cpu.append(time.process_time() - started)
+        response.raise_for_status()
+        wire.append(response.num_bytes_downloaded)
+    return {
+        "bytes": int(statistics.median(wire)),
+        "cpu_ms": round(statistics.median(cpu) * 1000, 3),
+    }
+
+
+async def run(urls: Dict[str, str], repeat: int) -> Dict[str, dict]:
+    codings: List[str] = ["identity", *available_codings()]
+    results: Dict[str, dict] = {}
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://bench"
+    ) as client:
+        for name, url in urls.items():
+            results[name] = {
+                coding: await measure(client, url, coding, repeat) for coding in codings
+            }
+        # Compressed again on every request
+        cache.configure(NullCache())
+        for name in ("version", "diff"):
+            results[f"{name}_uncached"] = {
+                coding: await measure(client, urls[name], coding, repeat)
+                for coding in codings[1:]
+            }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=100)
+    parser.add_argument("--size", type=int, default=10000, help="characters")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with temporary_engine() as engine:
+        urls = seed(engine, rng, args.notes, args.size)
+        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        def bench_db():
+            with SessionLocal() as db:
+                yield db
+
+        app.dependency_overrides[get_db] = bench_db
+        cache.configure(MemoryCache(max_entries=10000, ttl=3600))
+        try:
+            results = asyncio.run(run(urls, args.repeat))
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+
+    report(
+        "compression",
+        {
+            "notes": args.notes,
+            "content_chars": args.size,
+            "codings": list(available_codings()),
+            **results,
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
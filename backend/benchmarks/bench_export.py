@@ -0,0 +1,87 @@
+"""
+Measures the peak memory of the NDJSON export for growing numbers of notes.
+
+The streaming export (crud.export_notes) is compared with loading every note
+through crud.get_notes and serializing it with the Note schema, as the paged
+listing endpoint does. Peak memory is traced with tracemalloc while the
+output is consumed and discarded.
+
+Usage: python -m benchmarks.bench_export [--notes N [N ...]] [--size CHARS]
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from app import crud, schemas
+from app.core import delta
+from app.crud import version_store
+from app.models import Note, NoteVersion
+from sqlalchemy import insert
+
+from .common import make_session, random_text, report, temporary_engine
+
+
+def seed(db, rng: random.Random, notes: int, size: int) -> None:
+    rows = [
+        {"title": f"Note {i}", "content": random_text(rng, size)} for i in range(notes)
+    ]
+    db.execute(insert(Note), rows)
+    db.execute(
+        insert(NoteVersion),
+        [
+            {
+                "note_id": i + 1,
+                "title": row["title"],
+                "content_data": delta.compress_text(row["content"]),
+                **version_store.content_metadata(row["content"]),
+            }
+            for i, row in enumerate(rows)
+        ],
+    )
+    db.commit()
+
+
+def measure(fn, *args) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(*args)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": round(seconds, 3), "peak_mib": round(peak / 2**20, 2)}
+
+
+def export_streaming(db) -> None:
+    for _ in crud.export_notes(db, include_versions=True):
+        pass
+
+
+def export_listing(db, count: int) -> None:
+    notes = crud.get_notes(db, skip=0, limit=count)
+    [schemas.Note.model_validate(note).model_dump_json() for note in notes]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, nargs="+", default=[2000, 10000])
+    parser.add_argument("--size", type=int, default=2000, help="characters")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    results = {}
+    for notes in args.notes:
+        with temporary_engine() as engine:
+            db = make_session(engine)
+            seed(db, random.Random(args.seed), notes, args.size)
+            results[notes] = {
+                "streaming_export": measure(export_streaming, db),
+                "full_listing": measure(export_listing, db, notes),
+            }
+            db.close()
+    report("export", results)
+
+
+if __name__ == "__main__":
+    main()
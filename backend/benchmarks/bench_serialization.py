@@ -0,0 +1,88 @@
+"""
+Compares the Pydantic and the orjson (FAST_JSON) serialization of listings.
+
+Each path builds the same page of notes (and of versions) with
+crud.listing, database read included, and the median time per page is
+reported.
+
+Usage: python -m benchmarks.bench_serialization [--limit N] [--size CHARS]
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from app import crud, schemas
+from app.core.config import settings
+
+from .common import edit_text, make_session, random_text, report, temporary_engine
+
+
+def measure(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def compare(fn, repeat: int) -> dict:
+    results = {}
+    for fast_json in (False, True):
+        settings.FAST_JSON = fast_json
+        results["orjson" if fast_json else "pydantic"] = measure(fn, repeat)
+    settings.FAST_JSON = False
+    return {
+        "pydantic_ms": round(results["pydantic"], 2),
+        "orjson_ms": round(results["orjson"], 2),
+        "speedup": round(results["pydantic"] / results["orjson"], 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--size", type=int, default=10000, help="characters")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with temporary_engine() as engine:
+        db = make_session(engine)
+        crud.bulk_create_notes(
+            db,
+            [
+                schemas.NoteCreate(
+                    title=f"Note {i}", content=random_text(rng, args.size)
+                )
+                for i in range(args.limit)
+            ],
+        )
+        note = crud.get_notes(db, limit=1)[0]
+        content = note.content
+        for _ in range(args.limit):
+            content = edit_text(rng, content)
+            crud.update_note(db, note.id, schemas.NoteUpdate(content=content))
+
+        results = {
+            "notes_page": compare(
+                lambda: crud.listing.notes_page(db, limit=args.limit), args.repeat
+            ),
+            "versions_page": compare(
+                lambda: crud.listing.note_versions_page(db, note.id, limit=args.limit),
+                args.repeat,
+            ),
+        }
+        db.close()
+
+    report(
+        "serialization",
+        {"limit": args.limit, "content_chars": args.size, **results},
+    )
+
+
+if __name__ == "__main__":
+    main()
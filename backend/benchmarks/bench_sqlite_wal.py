@@ -0,0 +1,122 @@
+"""
+Compares concurrent read and write throughput with WAL on and off.
+
+Writer threads update random notes through crud.update_note (a version
+insert plus a note update per call) while reader threads list and fetch
+notes, each thread using its own pooled connection.
+
+"off" is SQLite's default rollback journal (journal_mode=DELETE,
+synchronous=FULL), "on" is the app default (journal_mode=WAL,
+synchronous=NORMAL).
+
+Usage: python -m benchmarks.bench_sqlite_wal [--writers W] [--readers R]
+"""
+
+import argparse
+import random
+import threading
+import time
+
+from app import crud, schemas
+from app.db.session import sqlite_pragmas
+from sqlalchemy.exc import OperationalError
+
+from .common import make_session, random_text, report, temporary_engine
+
+MODES = {
+    "wal_off": {"journal_mode": "DELETE", "synchronous": "FULL"},
+    "wal_on": {"journal_mode": "WAL", "synchronous": "NORMAL"},
+}
+
+
+def run_mode(pragmas: dict, args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    threads = args.writers + args.readers
+    with temporary_engine(
+        pragmas=sqlite_pragmas(**pragmas), pool_size=threads, max_overflow=0
+    ) as engine:
+        seed_db = make_session(engine)
+        note_ids = [
+            crud.create_note(
+                seed_db,
+                schemas.NoteCreate(
+                    title=f"Note {i}", content=random_text(rng, args.size)
+                ),
+            ).id
+            for i in range(args.notes)
+        ]
+        seed_db.close()
+
+        counts = {"writes": 0, "reads": 0, "errors": 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + args.duration
+
+        def writer(seed: int) -> None:
+            thread_rng = random.Random(seed)
+            db = make_session(engine)
+            while time.perf_counter() < deadline:
+                note_id = thread_rng.choice(note_ids)
+                update = schemas.NoteUpdate(content=random_text(thread_rng, args.size))
+                try:
+                    crud.update_note(db, note_id, update)
+                    key = "writes"
+                except OperationalError:  # database is locked
+                    db.rollback()
+                    key = "errors"
+                with lock:
+                    counts[key] += 1
+            db.close()
+
+        def reader(seed: int) -> None:
+            thread_rng = random.Random(seed)
+            db = make_session(engine)
+            while time.perf_counter() < deadline:
+                try:
+                    crud.get_notes(db, limit=20)
+                    crud.get_note(db, thread_rng.choice(note_ids))
+                    db.rollback()  # ends the read transaction
+                    key = "reads"
+                except OperationalError:
+                    db.rollback()
+                    key = "errors"
+                with lock:
+                    counts[key] += 1
+            db.close()
+
+        workers = [
+            threading.Thread(target=writer, args=(i,)) for i in range(args.writers)
+        ] + [
+            threading.Thread(target=reader, args=(1000 + i,))
+            for i in range(args.readers)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    return {
+        **counts,
+        "writes_per_second": round(counts["writes"] / args.duration, 1),
+        "reads_per_second": round(counts["reads"] / args.duration, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds")
+    parser.add_argument("--notes", type=int, default=200)
+    parser.add_argument("--size", type=int, default=2000, help="characters")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    results = {name: run_mode(pragmas, args) for name, pragmas in MODES.items()}
+    report(
+        "sqlite_wal",
+        {"writers": args.writers, "readers": args.readers, **results},
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Counts the SQL statements and the latency of each kind of request.
+
+Requests go through the API (without the read cache) on a throwaway
+database; statements are counted with a before_cursor_execute hook.
+
+Usage: python -m benchmarks.bench_statements [--requests N] [--size CHARS]
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from app import crud, schemas
+from app.core.cache import NullCache, cache
+from app.core.config import settings
+from app.db.session import get_db
+from fastapi.testclient import TestClient
+from main import app
+from sqlalchemy import event
+
+from .common import edit_text, make_session, random_text, report, temporary_engine
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--size", type=int, default=2000, help="characters")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cache.configure(NullCache())
+    with temporary_engine() as engine:
+        db = make_session(engine)
+        note = crud.create_note(
+            db, schemas.NoteCreate(title="Note", content=random_text(rng, args.size))
+        )
+        note_id, content = note.id, note.content
+
+        statements = []
+        event.listen(
+            engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+        )
+
+        def override_get_db():
+            yield db
+
+        app.dependency_overrides[get_db] = override_get_db
+        # The startup would resume the jobs of the configured database
+        settings.JOBS_RESUME_ON_STARTUP = False
+        results = {}
+        with TestClient(app) as client:
+
+            def run(name, request) -> None:
+                counts, timings = [], []
+                for _ in range(args.requests):
+                    statements.clear()
+                    start = time.perf_counter()
+                    response = request()
+                    timings.append(time.perf_counter() - start)
+                    assert response.status_code < 400, response.text
+                    counts.append(len(statements))
+                results[name] = {
+                    "statements_per_request": round(statistics.mean(counts), 2),
+                    "median_ms": round(statistics.median(timings) * 1000, 2),
+                }
+
+            def update():
+                nonlocal content
+                content = edit_text(rng, content)
+                return client.put(f"/api/v1/notes/{note_id}", json={"content": content})
+
+            run("update", update)
+            version_ids = [
+                version.id for version in crud.get_note_versions(db, note_id, limit=50)
+            ]
+            run(
+                "restore",
+                lambda: client.post(
+                    f"/api/v1/notes/{note_id}/versions/"
+                    f"{rng.choice(version_ids)}/restore/"
+                ),
+            )
+            run("read", lambda: client.get(f"/api/v1/notes/{note_id}"))
+        app.dependency_overrides.clear()
+        db.close()
+
+    report("statements", {"requests": args.requests, **results})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Compares the full notes listing with the summary view for large notes.
+
+Both listings are requested through the API (without the read cache) on
+the same notes; the payload size and the median latency per page are
+reported.
+
+Usage: python -m benchmarks.bench_summary [--notes N] [--size CHARS]
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from app.core.cache import NullCache, cache
+from app.core.config import settings
+from app.db.session import get_db
+from app.models import Note
+from fastapi.testclient import TestClient
+from main import app
+from sqlalchemy import insert
+
+from .common import make_session, random_text, report, temporary_engine
+
+
+def measure(client: TestClient, url: str, repeat: int) -> dict:
+    timings, size = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url)
+        timings.append(time.perf_counter() - start)
+        size = len(response.content)
+    return {
+        "payload_bytes": size,
+        "median_ms": round(statistics.median(timings) * 1000, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=1000)
+    parser.add_argument("--size", type=int, default=20000, help="characters")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cache.configure(NullCache())
+    with temporary_engine() as engine:
+        db = make_session(engine)
+        db.execute(
+            insert(Note),
+            [
+                {"title": f"Note {i}", "content": random_text(rng, args.size)}
+                for i in range(args.notes)
+            ],
+        )
+        db.commit()
+
+        def override_get_db():
+            yield db
+
+        app.dependency_overrides[get_db] = override_get_db
+        # The startup would resume the jobs of the configured database
+        settings.JOBS_RESUME_ON_STARTUP = False
+        with TestClient(app) as client:
+            url = f"/api/v1/notes/?limit={args.limit}"
+            full = measure(client, url, args.repeat)
+            summary = measure(client, url + "&view=summary", args.repeat)
+        app.dependency_overrides.clear()
+        db.close()
+
+    report(
+        "summary",
+        {
+            "notes": args.notes,
+            "content_chars": args.size,
+            "limit": args.limit,
+            "full": full,
+            "summary": summary,
+            "payload_reduction": round(
+                1 - summary["payload_bytes"] / full["payload_bytes"], 4
+            ),
+            "latency_speedup": round(full["median_ms"] / summary["median_ms"], 1),
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
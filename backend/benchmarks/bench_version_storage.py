@@ -0,0 +1,108 @@
+"""
+Measures the bytes on disk saved by the snapshot + delta version storage.
+
+The same edit history is written once through the app (compressed storage)
+and once into a table laid out like the former note_versions (full title
+and content on every row).
+
+Usage: python -m benchmarks.bench_version_storage [--notes N] [--edits M]
+"""
+
+import argparse
+import random
+
+from app import crud, schemas
+from app.models import NoteVersion
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    Table,
+    Text,
+    func,
+    insert,
+)
+
+from .common import (
+    edit_text,
+    file_size,
+    make_session,
+    random_text,
+    report,
+    temporary_engine,
+)
+
+legacy_metadata = MetaData()
+legacy_note_versions = Table(
+    "note_versions",
+    legacy_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("note_id", Integer, nullable=False, index=True),
+    Column("title", Text, nullable=False),
+    Column("content", Text, nullable=False),
+    Column("version_timestamp", DateTime, server_default=func.now()),
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=20)
+    parser.add_argument("--edits", type=int, default=50)
+    parser.add_argument("--size", type=int, default=8000, help="characters")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with temporary_engine() as engine:
+        db = make_session(engine)
+        for i in range(args.notes):
+            content = random_text(rng, args.size)
+            note = crud.create_note(
+                db, schemas.NoteCreate(title=f"Note {i}", content=content)
+            )
+            for _ in range(args.edits):
+                content = edit_text(rng, content)
+                crud.update_note(db, note.id, schemas.NoteUpdate(content=content))
+
+        versions = db.query(NoteVersion).order_by(NoteVersion.id).all()
+        logical_bytes = sum(len(v.content.encode()) for v in versions)
+        stored_bytes = sum(len(v.content_data) for v in versions)
+        snapshots = sum(1 for v in versions if v.is_snapshot)
+
+        with temporary_engine(legacy_metadata) as legacy_engine:
+            with legacy_engine.begin() as connection:
+                connection.execute(
+                    insert(legacy_note_versions),
+                    [
+                        {"note_id": v.note_id, "title": v.title, "content": v.content}
+                        for v in versions
+                    ],
+                )
+            legacy_file = file_size(legacy_engine)
+        db.close()
+
+        # Only the versions table differs, drop the rest for a fair comparison
+        with engine.begin() as connection:
+            connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+            connection.exec_driver_sql("DROP TABLE notes")
+        delta_file = file_size(engine)
+
+    report(
+        "version_storage",
+        {
+            "notes": args.notes,
+            "edits_per_note": args.edits,
+            "versions": len(versions),
+            "snapshots": snapshots,
+            "content_bytes_full_text": logical_bytes,
+            "content_bytes_stored": stored_bytes,
+            "file_bytes_full_text": legacy_file,
+            "file_bytes_delta": delta_file,
+            "reduction": round(1 - delta_file / legacy_file, 3),
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
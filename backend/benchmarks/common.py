@@ -0,0 +1,101 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks are run from the backend directory, e.g.
+`python -m benchmarks.bench_version_storage`. They work on throwaway SQLite
+databases and never touch the one configured in DATABASE_URL.
+"""
+
+import json
+import os
+import random
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from app.db.base import Base
+from app.db.session import apply_sqlite_pragmas, sqlite_pragmas
+from sqlalchemy import MetaData, create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+WORDS = [
+    "note", "version", "history", "draft", "idea", "meeting", "project",
+    "review", "summary", "task", "client", "design", "backend", "frontend",
+    "release", "sprint", "feedback", "roadmap", "budget",
+]  # fmt: skip
+
+
+@contextmanager
+def temporary_engine(
+    metadata: Optional[MetaData] = None,
+    pragmas: Optional[Dict[str, Any]] = None,
+    **engine_kwargs,
+) -> Iterator[Engine]:
+    """
+    Yields an engine on a fresh SQLite file.
+
+    `pragmas` are applied to every connection (by default the app's
+    configured ones), then the tables of `metadata` are created (by default
+    the app tables).
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(
+            f"sqlite:///{os.path.join(directory, 'bench.db')}", **engine_kwargs
+        )
+        connection_pragmas = pragmas if pragmas is not None else sqlite_pragmas()
+        event.listen(
+            engine,
+            "connect",
+            lambda dbapi_connection, _: apply_sqlite_pragmas(
+                dbapi_connection, connection_pragmas
+            ),
+        )
+        (metadata if metadata is not None else Base.metadata).create_all(engine)
+        try:
+            yield engine
+        finally:
+            engine.dispose()
+
+
+def make_session(engine: Engine) -> Session:
+    return sessionmaker(bind=engine)()
+
+
+def random_text(rng: random.Random, size: int) -> str:
+    """Builds roughly `size` characters of lines of random words."""
+    lines, length = [], 0
+    while length < size:
+        line = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14)))
+        lines.append(line + "\n")
+        length += len(line) + 1
+    return "".join(lines)
+
+
+def edit_text(rng: random.Random, text: str) -> str:
+    """Simulates a small edit: rewrites, inserts or removes one line."""
+    lines = text.splitlines(keepends=True)
+    position = rng.randrange(len(lines))
+    new_line = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14))) + "\n"
+    action = rng.random()
+    if action < 0.6:
+        lines[position] = new_line
+    elif action < 0.9 or len(lines) < 2:
+        lines.insert(position, new_line)
+    else:
+        del lines[position]
+    return "".join(lines)
+
+
+def file_size(engine: Engine) -> int:
+    """Returns the size on disk of a SQLite database after a VACUUM."""
+    with engine.connect() as connection:
+        connection.exec_driver_sql("VACUUM")
+        # In WAL mode the pages only reach the main file on checkpoint
+        connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(engine.url.database)
+
+
+def report(name: str, results: dict) -> None:
+    """Prints benchmark results as a JSON document."""
+    print(json.dumps({"benchmark": name, **results}, indent=2))
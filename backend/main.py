@@ -1,9 +1,48 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 # Import routers
-from app.routers import notes_router
+from app.core.compression import CompressionMiddleware
+from app.core.config import settings
+from app.core.instrumentation import MetricsMiddleware, install_sql_hooks
+from app.routers import (
+    cache_router,
+    compaction_router,
+    jobs_router,
+    metrics_router,
+    notes_router,
+)
+from app.tasks.compaction import start_background_compaction
+from app.tasks.jobs import job_runner, resume_jobs
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Versions retention, when COMPACTION_INTERVAL_SECONDS is set
+    compaction = start_background_compaction()
+    # Background jobs left behind by the previous run
+    if settings.JOBS_RESUME_ON_STARTUP:
+        await run_in_threadpool(resume_jobs)
+    yield
+    if compaction is not None:
+        compaction.cancel()
+        with suppress(asyncio.CancelledError):
+            await compaction
+    # Running jobs go back to the queue
+    await run_in_threadpool(job_runner.shutdown)
+
+
+app = FastAPI(title="AlloNotes API", lifespan=lifespan)
+
+# Compresses the responses, inside the metrics which measure the bytes sent
+app.add_middleware(CompressionMiddleware)
 
-app = FastAPI(title="AlloNotes API")
+# Times each request and counts its SQL statements, see /metrics
+install_sql_hooks()
+app.add_middleware(MetricsMiddleware)
 
 # Add CORS middleware
 app.add_middleware(
@@ -12,6 +51,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets browsers read the keyset pagination cursor, the validators of
+    # conditional requests and the versioning outcome of updates
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified", "X-Version-Created"],
 )
 
 
@@ -28,3 +70,7 @@ async def read_root():
 # All the defined routes will be accessible
 # via /api/v1/notes as defined in notes_router.py
 app.include_router(notes_router.router)
+app.include_router(cache_router.router)
+app.include_router(compaction_router.router)
+app.include_router(jobs_router.router)
+app.include_router(metrics_router.router)
@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+import pytest
+from app.core import compression
+from app.core.cache import cache
+from app.core.compression import negotiate
+from fastapi.testclient import TestClient
+
+GZIP = {"Accept-Encoding": "gzip"}
+# Compressible: a few words repeated
+LARGE_CONTENT = "draft of the release notes\n" * 200
+
+
+def _create(client: TestClient, content: str = LARGE_CONTENT) -> int:
+    response = client.post("/api/v1/notes/", json={"title": "T", "content": content})
+    return response.json()["id"]
+
+
+@pytest.mark.parametrize(
+    "header,codings,expected",
+    [
+        ("gzip, deflate, br, zstd", ("zstd", "br", "gzip"), "zstd"),
+        ("gzip, deflate, br, zstd", ("gzip",), "gzip"),
+        ("br;q=0.5, gzip", ("zstd", "br", "gzip"), "gzip"),
+        ("*", ("br", "gzip"), "br"),
+        ("*;q=0, identity", ("gzip",), None),
+        ("gzip;q=0", ("gzip",), None),
+        ("gzip;q=0.5, identity", ("gzip",), None),
+        ("", ("gzip",), None),
+    ],
+)
+def test_negotiation(header: str, codings: tuple, expected):
+    """Test that the coding weighed highest by the client is picked."""
+    assert negotiate(header, codings) == expected
+
+
+def test_large_responses_are_compressed(client: TestClient):
+    """Test that large bodies are compressed, with the coding in their ETag."""
+    note_id = _create(client)
+    plain = client.get(f"/api/v1/notes/{note_id}", headers={"Accept-Encoding": ""})
+    assert "Content-Encoding" not in plain.headers
+    assert plain.headers["Vary"] == "Accept-Encoding"
+
+    response = client.get(f"/api/v1/notes/{note_id}", headers=GZIP)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.num_bytes_downloaded < len(plain.content) / 10
+    assert response.content == plain.content
+    etag = response.headers["ETag"]
+    assert etag == plain.headers["ETag"][:-1] + '-gzip"'
+
+    # Either tag validates the cached copy and guards writes
+    response = client.get(
+        f"/api/v1/notes/{note_id}", headers={**GZIP, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    response = client.put(
+        f"/api/v1/notes/{note_id}", json={"title": "U"}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 200
+
+
+def test_small_responses_are_sent_as_is(client: TestClient):
+    """Test that bodies under COMPRESSION_MIN_SIZE are not compressed."""
+    note_id = _create(client, content="short")
+    response = client.get(f"/api/v1/notes/{note_id}", headers=GZIP)
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["Vary"] == "Accept-Encoding"
+
+
+def test_streamed_export_is_compressed(client: TestClient):
+    """Test that a streamed body is compressed chunk by chunk."""
+    for _ in range(3):
+        _create(client)
+    response = client.get("/api/v1/notes/export", headers=GZIP)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in response.headers
+    lines = response.text.splitlines()
+    assert [json.loads(line)["content"] for line in lines] == [LARGE_CONTENT] * 3
+
+
+def test_immutable_bodies_are_compressed_once(client: TestClient, monkeypatch):
+    """Test that versions and diffs are not compressed again once cached."""
+    note_id = _create(client)
+    client.put(f"/api/v1/notes/{note_id}", json={"content": LARGE_CONTENT.upper()})
+    client.put(f"/api/v1/notes/{note_id}", json={"content": "short"})
+    versions = client.get(f"/api/v1/notes/{note_id}/versions/").json()
+    newer, older = (version["id"] for version in versions)
+
+    compressed = []
+    compress = compression.compress
+    monkeypatch.setattr(
+        compression,
+        "compress",
+        lambda coding, body: compressed.append(body) or compress(coding, body),
+    )
+    urls = [
+        f"/api/v1/notes/{note_id}/versions/{older}",
+        f"/api/v1/notes/{note_id}/versions/{older}/diff/{newer}?format=structured",
+    ]
+    for url in urls * 2:
+        response = client.get(url, headers=GZIP)
+        assert response.headers["Content-Encoding"] == "gzip"
+    assert len(compressed) == 2
+    assert cache.hits["compressed"] == 2
+
+    # The current note changes: compressed on each request
+    for _ in range(2):
+        client.get(f"/api/v1/notes/{note_id}/versions/{older}/diff", headers=GZIP)
+    assert len(compressed) == 4
+    assert cache.hits["compressed"] == 2
+
+
+def test_event_streams_start_at_once():
+    """Test that an event stream is sent as is, without waiting for a chunk."""
+    sent = []
+
+    async def app(scope, receive, send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/event-stream")],
+            }
+        )
+        # Headers on the way before the first event
+        assert [message["type"] for message in sent] == ["http.response.start"]
+        await send({"type": "http.response.body", "body": b"x" * 2048})
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(compression.CompressionMiddleware(app)(scope, None, send))
+    assert sent[1]["body"] == b"x" * 2048
+    assert all(name != b"content-encoding" for name, _ in sent[0]["headers"])
@@ -0,0 +1,286 @@
+import json
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from app import crud, models
+from app.core.config import settings
+from app.crud import retention
+from app.tasks import jobs
+from app.tasks.jobs import job_runner, resume_jobs
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import Session, sessionmaker
+
+ACME = {"X-Tenant-ID": "acme"}
+GLOBEX = {"X-Tenant-ID": "globex"}
+
+
+@pytest.fixture(autouse=True)
+def runner(tmp_path, monkeypatch):
+    """Writes the results to a temporary directory, stops the threads after."""
+    monkeypatch.setattr(settings, "JOBS_RESULTS_DIR", str(tmp_path))
+    yield job_runner
+    job_runner.shutdown()
+
+
+@pytest.fixture
+def blocking_compaction(monkeypatch):
+    """Makes the compaction jobs wait for `release`, then report progress."""
+    started, release = threading.Event(), threading.Event()
+
+    def compaction(context):
+        context.report(0, 1)
+        started.set()
+        release.wait(5)
+        context.report(1, 1)
+
+    monkeypatch.setitem(jobs.JOB_HANDLERS, "compaction", compaction)
+    return started, release
+
+
+def _enqueue(client: TestClient, kind: str, headers=None, **params) -> dict:
+    response = client.post(
+        "/api/v1/jobs/", json={"kind": kind, "params": params}, headers=headers
+    )
+    assert response.status_code == 202
+    job = response.json()
+    assert response.headers["Location"] == f"/api/v1/jobs/{job['id']}"
+    return job
+
+
+def _finished(client: TestClient, job_id: int, headers=None) -> dict:
+    job_runner.join(timeout=5)
+    return client.get(f"/api/v1/jobs/{job_id}", headers=headers).json()
+
+
+def test_export_job(client: TestClient):
+    """Test that an export job writes the notes of its tenant to a file."""
+    for title in ("A", "B"):
+        note = client.post(
+            "/api/v1/notes/", json={"title": title, "content": title}, headers=ACME
+        ).json()
+    client.put(f"/api/v1/notes/{note['id']}", json={"content": "b2"}, headers=ACME)
+    client.post("/api/v1/notes/", json={"title": "G", "content": "g"}, headers=GLOBEX)
+
+    job = _enqueue(client, "export", ACME, include_versions=True)
+    assert job["status"] in ("queued", "running")
+    job = _finished(client, job["id"], ACME)
+    assert job["status"] == "succeeded"
+    assert (job["progress"], job["total"]) == (2, 2)
+    assert job["result"]["notes"] == 2
+    assert job["started_at"] is not None and job["finished_at"] is not None
+
+    response = client.get(f"/api/v1/jobs/{job['id']}/result", headers=ACME)
+    assert response.headers["Content-Type"] == "application/x-ndjson"
+    notes = [json.loads(line) for line in response.text.splitlines()]
+    assert [note["title"] for note in notes] == ["A", "B"]
+    assert [version["content"] for version in notes[1]["versions"]] == ["B"]
+    assert int(response.headers["Content-Length"]) == job["result"]["bytes"]
+
+    # Jobs belong to their tenant
+    for url in (f"/api/v1/jobs/{job['id']}", f"/api/v1/jobs/{job['id']}/result"):
+        assert client.get(url, headers=GLOBEX).status_code == 404
+
+
+def test_cancellation(client: TestClient, blocking_compaction, monkeypatch):
+    """Test that queued jobs cancel at once, running ones at their next report."""
+    started, release = blocking_compaction
+    monkeypatch.setattr(settings, "JOBS_MAX_WORKERS", 1)
+    monkeypatch.setattr(settings, "JOBS_MAX_QUEUED", 1)
+    running = _enqueue(client, "compaction")
+    assert started.wait(5)
+    queued = _enqueue(client, "export")
+    # Bounded: one job runs, one waits
+    response = client.post("/api/v1/jobs/", json={"kind": "export"})
+    assert response.status_code == 429
+
+    response = client.post(f"/api/v1/jobs/{queued['id']}/cancel")
+    assert response.json()["status"] == "cancelled"
+    response = client.post(f"/api/v1/jobs/{running['id']}/cancel")
+    assert response.json()["status"] == "running"
+    assert response.json()["cancel_requested"]
+
+    release.set()
+    job = _finished(client, running["id"])
+    assert job["status"] == "cancelled"
+    assert job["finished_at"] is not None
+    assert _finished(client, queued["id"])["started_at"] is None
+    response = client.post(f"/api/v1/jobs/{running['id']}/cancel")
+    assert response.status_code == 409
+    response = client.get(f"/api/v1/jobs/{queued['id']}/result")
+    assert response.status_code == 409
+
+
+def test_failed_job(client: TestClient, monkeypatch):
+    """Test that the error of a failed job is recorded."""
+
+    def compaction(context):
+        raise RuntimeError("Index corrupted")
+
+    monkeypatch.setitem(jobs.JOB_HANDLERS, "compaction", compaction)
+    job = _finished(client, _enqueue(client, "compaction")["id"])
+    assert job["status"] == "failed"
+    assert job["error"] == "Index corrupted"
+    assert job["result"] is None
+
+
+def test_reindex_job_is_for_admins(client: TestClient, monkeypatch):
+    """Test that only admin tenants rebuild the index of the whole database."""
+    client.post("/api/v1/notes/", json={"title": "Plan", "content": "plan"})
+    response = client.post("/api/v1/jobs/", json={"kind": "reindex"})
+    assert response.status_code == 403
+
+    monkeypatch.setattr(settings, "JOBS_ADMIN_TENANTS", ["default"])
+    job = _finished(client, _enqueue(client, "reindex")["id"])
+    assert job["status"] == "succeeded"
+    hits = client.get("/api/v1/notes/search", params={"q": "plan"}).json()
+    assert [hit["title"] for hit in hits] == ["Plan"]
+    response = client.post("/api/v1/jobs/", json={"kind": "vacuum"})
+    assert response.status_code == 422
+
+
+def test_compaction_job_is_scoped(client: TestClient, db_session: Session, monkeypatch):
+    """Test that a compaction job only thins the versions of its tenant."""
+    for headers in (ACME, GLOBEX):
+        note = client.post(
+            "/api/v1/notes/", json={"title": "T", "content": "0"}, headers=headers
+        ).json()
+        for content in ("1", "2", "3"):
+            client.put(
+                f"/api/v1/notes/{note['id']}",
+                json={"content": content},
+                headers=headers,
+            )
+    monkeypatch.setattr(settings, "VERSION_KEEP_LAST", 1)
+
+    job = _finished(client, _enqueue(client, "compaction", ACME)["id"], ACME)
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"notes": 1, "deleted": 2, "rebased": 0}
+    # Notes examined
+    assert (job["progress"], job["total"]) == (1, None)
+    versions = db_session.query(models.NoteVersion.tenant_id).all()
+    assert sorted(tenant for tenant, in versions) == ["acme"] + ["globex"] * 3
+
+
+def test_compaction_job_is_cancelled_between_notes(
+    client: TestClient, db_session: Session, monkeypatch
+):
+    """Test that a running compaction stops at the next note once cancelled."""
+    for title in ("A", "B"):
+        note = client.post("/api/v1/notes/", json={"title": title, "content": "0"})
+        for content in ("1", "2"):
+            client.put(f"/api/v1/notes/{note.json()['id']}", json={"content": content})
+    monkeypatch.setattr(settings, "VERSION_KEEP_LAST", 1)
+    compact_note = retention.compact_note
+    factory = sessionmaker(bind=db_session.get_bind())
+
+    def cancelled_after(db, *args, **kwargs):
+        result = compact_note(db, *args, **kwargs)
+        with factory() as other:
+            crud.cancel_job(other, job["id"])
+        return result
+
+    monkeypatch.setattr(retention, "compact_note", cancelled_after)
+    job = _enqueue(client, "compaction")
+    job = _finished(client, job["id"])
+    assert job["status"] == "cancelled"
+    assert job["progress"] == 1
+    versions = db_session.query(models.NoteVersion.note_id).all()
+    assert len(versions) == 3
+
+
+def test_stale_claim_is_taken_over(db_session: Session):
+    """Test that a job requeued as stale is only reported and finished by its
+    new claim."""
+    db_session.add(models.Job(kind="export", params={}, tenant_id="default"))
+    db_session.commit()
+    job_id = crud.claim_job(db_session, 1).id
+    # Its worker went silent an hour ago
+    stale = datetime.utcnow() - timedelta(hours=1)
+    db_session.execute(update(models.Job).values(started_at=stale, updated_at=stale))
+    db_session.commit()
+
+    assert crud.resumable_jobs(db_session, datetime.utcnow()) == [(job_id, "default")]
+    claimed_at = crud.claim_job(db_session, job_id).started_at
+    assert claimed_at != stale
+    # The previous claim stops, without overwriting the new one
+    assert crud.update_job_progress(db_session, job_id, stale, 5)
+    assert not crud.finish_job(db_session, job_id, stale, "failed", error="Lost")
+    crud.requeue_job(db_session, job_id, stale)
+    job = crud.get_job(db_session, job_id)
+    assert (job.status, job.progress) == ("running", 0)
+
+    assert not crud.update_job_progress(db_session, job_id, claimed_at, 1, 1)
+    assert crud.finish_job(db_session, job_id, claimed_at, "succeeded")
+    db_session.refresh(job)
+    assert (job.status, job.progress) == ("succeeded", 1)
+
+
+def test_finished_jobs_are_deleted(client: TestClient, db_session: Session):
+    """Test that deleting a job, or pruning old ones, removes their files."""
+    client.post("/api/v1/notes/", json={"title": "A", "content": "a"})
+    first, second = (_enqueue(client, "export") for _ in range(2))
+    _finished(client, second["id"])
+    paths = [jobs.export_path("default", job["id"]) for job in (first, second)]
+    assert all(path.exists() for path in paths)
+
+    response = client.delete(f"/api/v1/jobs/{first['id']}")
+    assert response.status_code == 204
+    assert client.get(f"/api/v1/jobs/{first['id']}").status_code == 404
+    assert not paths[0].exists()
+
+    assert jobs.prune_jobs(db_session, datetime.utcnow() - timedelta(days=1)) == 0
+    assert jobs.prune_jobs(db_session, datetime.utcnow() + timedelta(days=1)) == 1
+    assert client.get(f"/api/v1/jobs/{second['id']}").status_code == 404
+    assert not paths[1].exists()
+
+
+def test_unfinished_jobs_are_kept(client: TestClient, blocking_compaction):
+    """Test that a queued or running job cannot be deleted."""
+    started, release = blocking_compaction
+    job = _enqueue(client, "compaction")
+    assert started.wait(5)
+    response = client.delete(f"/api/v1/jobs/{job['id']}")
+    assert response.status_code == 409
+    release.set()
+    assert _finished(client, job["id"])["status"] == "succeeded"
+
+
+def test_shutdown_and_resume(
+    client: TestClient, db_session: Session, blocking_compaction, monkeypatch
+):
+    """Test that interrupted and abandoned jobs run again on the next start."""
+    started, release = blocking_compaction
+    interrupted = _enqueue(client, "compaction", ACME)
+    assert started.wait(5)
+    stopping = threading.Thread(target=job_runner.shutdown)
+    stopping.start()
+    release.set()
+    stopping.join(5)
+    job = client.get(f"/api/v1/jobs/{interrupted['id']}", headers=ACME).json()
+    assert job["status"] == "queued"
+
+    # Left running by a worker that died
+    db_session.add(
+        models.Job(
+            kind="reindex",
+            params={},
+            status="running",
+            tenant_id="globex",
+            updated_at=datetime.utcnow() - timedelta(hours=1),
+        )
+    )
+    db_session.commit()
+    factory = sessionmaker(bind=db_session.get_bind())
+    monkeypatch.setattr(jobs, "all_sessionmakers", lambda: {None: factory})
+    assert resume_jobs() == 2
+    assert _finished(client, interrupted["id"], ACME)["status"] == "succeeded"
+    assert _finished(client, interrupted["id"] + 1, GLOBEX)["status"] == "succeeded"
+
+
+def test_resume_skips_databases_without_jobs(monkeypatch):
+    """Test that a database not migrated yet does not fail the startup."""
+    unmigrated = sessionmaker(bind=create_engine("sqlite://"))
+    monkeypatch.setattr(jobs, "all_sessionmakers", lambda: {None: unmigrated})
+    assert resume_jobs() == 0
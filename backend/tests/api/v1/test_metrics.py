@@ -0,0 +1,72 @@
+import re
+
+import pytest
+from app.core.instrumentation import db_statements, request_duration
+from app.core.metrics import Histogram, registry
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    registry.clear()
+    yield
+
+
+def test_server_timing_reports_database_work(client: TestClient):
+    """Test that responses tell the statements they ran and their time."""
+    note_id = client.post("/api/v1/notes/", json={"title": "T", "content": "C"}).json()[
+        "id"
+    ]
+
+    response = client.get(f"/api/v1/notes/{note_id}")
+    timing = response.headers["Server-Timing"]
+    assert re.fullmatch(
+        r'db;desc="1 statements";dur=\d+\.\d, total;dur=\d+\.\d', timing
+    )
+    # Served from the cache
+    response = client.get(f"/api/v1/notes/{note_id}")
+    assert response.headers["Server-Timing"].startswith('db;desc="0 statements"')
+
+
+def test_requests_are_recorded_by_route(client: TestClient):
+    """Test that the histograms are labelled by route template, not path."""
+    ids = [
+        client.post("/api/v1/notes/", json={"title": "T", "content": "C"}).json()["id"]
+        for _ in range(2)
+    ]
+    for note_id in ids:
+        client.put(f"/api/v1/notes/{note_id}", json={"title": "U"})
+    client.get("/api/v1/unknown/path")
+
+    route = "/api/v1/notes/{note_id}"
+    assert request_duration.count(method="PUT", route=route, status="200") == 2
+    assert db_statements.count(method="PUT", route=route) == 2
+    assert request_duration.count(method="GET", route="unmatched", status="404") == 1
+
+    body = client.get("/metrics").text
+    # Four statements per update: the select, the version, the update and the
+    # change log entry
+    assert f'db_statements_per_request_sum{{method="PUT",route="{route}"}} 8' in body
+    assert (
+        f'db_statements_per_request_bucket{{method="PUT",route="{route}",le="3"}} 0'
+        in body
+    )
+    assert "# TYPE http_response_size_bytes histogram" in body
+
+
+def test_histogram_rendering():
+    """Test the text exposition format of a histogram."""
+    histogram = Histogram("latency", 'Some "quoted" help', ("path",), buckets=(1, 2.5))
+    histogram.observe(0.5, path="/a")
+    histogram.observe(2, path="/a")
+    histogram.observe(7, path="/a")
+
+    assert histogram.render() == (
+        '# HELP latency Some "quoted" help\n'
+        "# TYPE latency histogram\n"
+        'latency_bucket{path="/a",le="1"} 1\n'
+        'latency_bucket{path="/a",le="2.5"} 2\n'
+        'latency_bucket{path="/a",le="+Inf"} 3\n'
+        'latency_sum{path="/a"} 9.5\n'
+        'latency_count{path="/a"} 3\n'
+    )
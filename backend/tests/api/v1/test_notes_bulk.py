@@ -0,0 +1,127 @@
+from app.models import NoteVersion
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+
+def test_bulk_create_reports_each_item(client: TestClient):
+    """Test that valid items are created and invalid ones reported."""
+    items = [
+        {"title": "First", "content": "One"},
+        {"title": "Missing content"},
+        {"title": "Third", "content": "Three"},
+    ]
+    response = client.post("/api/v1/notes/bulk", json=items)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["succeeded"] == 2
+    assert data["failed"] == 1
+
+    first, invalid, third = data["results"]
+    assert first["ok"] and first["note"]["title"] == "First"
+    assert first["note"]["created_at"] is not None
+    assert not invalid["ok"] and invalid["index"] == 1
+    assert "content" in invalid["error"]
+    assert third["ok"] and third["id"] > first["id"]
+
+    titles = sorted(note["title"] for note in client.get("/api/v1/notes/").json())
+    assert titles == ["First", "Third"]
+
+
+def test_bulk_create_uses_one_insert(client: TestClient, capture_statements):
+    """Test that a bulk create does not cost one statement per note."""
+    items = [{"title": f"Note {i}", "content": "Body"} for i in range(50)]
+    with capture_statements() as statements:
+        response = client.post("/api/v1/notes/bulk", json=items)
+
+    assert response.json()["succeeded"] == 50
+    inserts = [s for s in statements if s.lstrip().upper().startswith("INSERT")]
+    # One for the notes, one for their change log entries
+    assert [s.split()[2] for s in inserts] == ["notes", "note_changes"]
+
+
+def test_bulk_update_creates_versions(db_session: Session, client: TestClient):
+    """Test that a bulk update versions every note and reports missing ones."""
+    created = client.post(
+        "/api/v1/notes/bulk",
+        json=[{"title": f"Note {i}", "content": f"Old {i}"} for i in range(3)],
+    ).json()["results"]
+    ids = [result["id"] for result in created]
+
+    updates = [
+        {"id": ids[0], "content": "New 0"},
+        {"id": ids[1], "title": "Renamed"},
+        {"id": 99999, "content": "Nothing here"},
+        {"id": ids[0], "content": "Twice"},
+    ]
+    response = client.put("/api/v1/notes/bulk", json=updates)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["succeeded"] == 2
+    results = data["results"]
+    assert results[0]["note"]["content"] == "New 0"
+    assert results[1]["note"]["title"] == "Renamed"
+    assert results[1]["note"]["content"] == "Old 1"
+    assert results[2] == {
+        "index": 2,
+        "ok": False,
+        "id": 99999,
+        "note": None,
+        "error": "Note not found",
+    }
+    assert results[3]["error"] == "Duplicate note id"
+
+    versions = client.get(f"/api/v1/notes/{ids[0]}/versions/?view=full").json()
+    assert [v["content"] for v in versions] == ["Old 0"]
+    versions = client.get(f"/api/v1/notes/{ids[1]}/versions/?view=full").json()
+    assert [v["title"] for v in versions] == ["Note 1"]
+    assert db_session.query(NoteVersion).filter_by(note_id=ids[2]).count() == 0
+
+
+def test_bulk_items_rejected_alone(client: TestClient):
+    """Test that null fields and non-object items fail on their own."""
+    created = client.post("/api/v1/notes/", json={"title": "A", "content": "a"})
+    note_id = created.json()["id"]
+    response = client.put(
+        "/api/v1/notes/bulk",
+        json=[{"id": note_id, "title": "Renamed"}, {"id": note_id, "title": None}, 5],
+    )
+    assert response.status_code == 200
+    ok, null, number = response.json()["results"]
+    assert ok["note"]["title"] == "Renamed"
+    assert null["error"] == "title: Value error, must not be null"
+    assert number["error"].startswith("item: Input should be a valid dictionary")
+
+    response = client.post(
+        "/api/v1/notes/bulk", json=[{"title": "B", "content": "b"}, "note"]
+    )
+    assert [result["ok"] for result in response.json()["results"]] == [True, False]
+    assert response.json()["failed"] == 1
+
+
+def test_bulk_delete(client: TestClient):
+    """Test deleting several notes at once."""
+    created = client.post(
+        "/api/v1/notes/bulk",
+        json=[{"title": f"Note {i}", "content": "Body"} for i in range(3)],
+    ).json()["results"]
+    ids = [result["id"] for result in created]
+    client.put(f"/api/v1/notes/{ids[0]}", json={"content": "Versioned"})
+
+    response = client.post(
+        "/api/v1/notes/bulk/delete", json={"ids": [ids[0], ids[1], 99999]}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [r["ok"] for r in data["results"]] == [True, True, False]
+    assert [note["id"] for note in client.get("/api/v1/notes/").json()] == [ids[2]]
+    assert client.get(f"/api/v1/notes/{ids[0]}/versions/").json() == []
+
+
+def test_bulk_size_limit(client: TestClient, monkeypatch):
+    """Test that oversized bulk requests are rejected."""
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "BULK_MAX_ITEMS", 2)
+    items = [{"title": "Note", "content": "Body"}] * 3
+    response = client.post("/api/v1/notes/bulk", json=items)
+    assert response.status_code == 413
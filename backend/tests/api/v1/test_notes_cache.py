@@ -0,0 +1,109 @@
+import asyncio
+
+import fakeredis
+import pytest
+from app.core.cache import Cache, MemoryCache, RedisCache, cache
+from fastapi.testclient import TestClient
+
+
+def stats(client: TestClient) -> dict:
+    return client.get("/api/v1/cache/stats").json()
+
+
+def test_note_reads_are_cached(client: TestClient):
+    """Test that a note is read from the cache until it is updated."""
+    note_id = client.post(
+        "/api/v1/notes/", json={"title": "Cached", "content": "v1"}
+    ).json()["id"]
+
+    first = client.get(f"/api/v1/notes/{note_id}").json()
+    second = client.get(f"/api/v1/notes/{note_id}").json()
+    assert first == second
+    assert stats(client)["hits"] == {"note": 1}
+    assert stats(client)["misses"] == {"note": 1}
+
+    client.put(f"/api/v1/notes/{note_id}", json={"content": "v2"})
+    assert client.get(f"/api/v1/notes/{note_id}").json()["content"] == "v2"
+    assert stats(client)["misses"] == {"note": 2}
+
+    versions = client.get(f"/api/v1/notes/{note_id}/versions/").json()
+    client.post(f"/api/v1/notes/{note_id}/versions/{versions[0]['id']}/restore/")
+    assert client.get(f"/api/v1/notes/{note_id}").json()["content"] == "v1"
+
+    client.delete(f"/api/v1/notes/{note_id}")
+    assert client.get(f"/api/v1/notes/{note_id}").status_code == 404
+
+
+def test_listings_are_invalidated_by_writes(client: TestClient):
+    """Test that any write makes the cached listings stale."""
+    client.post("/api/v1/notes/", json={"title": "A", "content": "a"})
+    assert len(client.get("/api/v1/notes/").json()) == 1
+    assert len(client.get("/api/v1/notes/").json()) == 1
+    assert stats(client)["hits"] == {"notes": 1}
+
+    note_id = client.post("/api/v1/notes/", json={"title": "B", "content": "b"}).json()[
+        "id"
+    ]
+    assert [note["title"] for note in client.get("/api/v1/notes/").json()] == [
+        "B",
+        "A",
+    ]
+    client.put("/api/v1/notes/bulk", json=[{"id": note_id, "title": "B2"}])
+    assert client.get("/api/v1/notes/").json()[0]["title"] == "B2"
+    client.post("/api/v1/notes/bulk/delete", json={"ids": [note_id]})
+    assert [note["title"] for note in client.get("/api/v1/notes/").json()] == ["A"]
+    assert stats(client)["misses"] == {"notes": 4}
+
+
+def test_redis_backend(client: TestClient):
+    """Test the cached reads and invalidations through Redis."""
+    cache.configure(RedisCache(fakeredis.FakeAsyncRedis(), ttl=60))
+    note_id = client.post(
+        "/api/v1/notes/", json={"title": "Redis", "content": "v1"}
+    ).json()["id"]
+
+    client.get(f"/api/v1/notes/{note_id}")
+    assert client.get(f"/api/v1/notes/{note_id}").json()["content"] == "v1"
+    client.put(f"/api/v1/notes/{note_id}", json={"content": "v2"})
+    assert client.get(f"/api/v1/notes/{note_id}").json()["content"] == "v2"
+
+    result = stats(client)
+    assert result["backend"] == "redis"
+    assert result["hits"] == {"note": 1}
+    assert result["misses"] == {"note": 2}
+
+
+def test_memory_cache_eviction_and_ttl(monkeypatch):
+    """Test that the memory cache evicts the least recently used entries."""
+    now = [1000.0]
+    monkeypatch.setattr("app.core.cache.time.monotonic", lambda: now[0])
+    backend = MemoryCache(max_entries=2, ttl=10)
+
+    async def scenario():
+        await backend.set("a", b"1")
+        await backend.set("b", b"2")
+        assert await backend.get("a") == b"1"  # "b" is now the oldest
+        await backend.set("c", b"3")
+        assert await backend.get("b") is None
+        assert await backend.get("a") == b"1"
+
+        now[0] += 10
+        assert await backend.get("a") is None
+        assert len(backend) == 1
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("write_during_load", [False, True])
+def test_fill_drops_values_loaded_during_a_write(write_during_load):
+    """Test that a value read before a write is not cached after it."""
+    test_cache = Cache(MemoryCache(max_entries=10, ttl=60))
+
+    async def scenario():
+        generation = await test_cache.generation()
+        if write_during_load:
+            await test_cache.invalidate("note:1")
+        await test_cache.fill("note:1", b"old", generation)
+        return await test_cache.lookup("note", "note:1")
+
+    assert asyncio.run(scenario()) == (None if write_during_load else b"old")
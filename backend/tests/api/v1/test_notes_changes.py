@@ -0,0 +1,167 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from app import crud, schemas
+from app.core.config import settings
+from app.core.notify import change_notifier
+from app.routers.notes_router import note_changes_endpoint
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+
+class StubRequest:
+    """Stands for a client connected for `polls` reads of the change log."""
+
+    def __init__(self, polls: int = 1):
+        self.polls = polls
+
+    async def is_disconnected(self) -> bool:
+        self.polls -= 1
+        return self.polls < 0
+
+
+def _events(body: str) -> list:
+    """Parses a Server-Sent Events body into (event, id, data) tuples."""
+    events = []
+    for block in body.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        if "data" in fields:
+            events.append(
+                (fields["event"], int(fields["id"]), json.loads(fields["data"]))
+            )
+    return events
+
+
+async def _read(db: Session, request: StubRequest, **params) -> list:
+    response = await note_changes_endpoint(
+        request=request, db=db, **{"since": None, "last_event_id": None, **params}
+    )
+    assert response.media_type == "text/event-stream"
+    return _events("".join([chunk async for chunk in response.body_iterator]))
+
+
+@pytest.fixture
+def idle_polls(monkeypatch):
+    monkeypatch.setattr(settings, "CHANGE_FEED_POLL_SECONDS", 0.01)
+
+
+def test_writes_are_logged(client: TestClient, db_session: Session):
+    """Test that every kind of write is logged with the written notes."""
+    note_id = client.post("/api/v1/notes/", json={"title": "A", "content": "a"}).json()[
+        "id"
+    ]
+    client.put(f"/api/v1/notes/{note_id}", json={"content": "b"})
+    version_id = client.get(f"/api/v1/notes/{note_id}/versions/").json()[0]["id"]
+    client.post(f"/api/v1/notes/{note_id}/versions/{version_id}/restore/")
+    created = client.post(
+        "/api/v1/notes/bulk", json=[{"title": "B", "content": "b"}] * 2
+    ).json()
+    other_ids = [result["id"] for result in created["results"]]
+    client.put("/api/v1/notes/bulk", json=[{"id": other_ids[0], "title": "C"}])
+    client.post("/api/v1/notes/bulk/delete", json={"ids": other_ids})
+    client.delete(f"/api/v1/notes/{note_id}")
+
+    changes = crud.get_changes(db_session, after=0)
+    assert [(change.kind, change.note_id) for change in changes] == [
+        ("create", note_id),
+        ("update", note_id),
+        ("restore", note_id),
+        ("create", other_ids[0]),
+        ("create", other_ids[1]),
+        ("update", other_ids[0]),
+        ("delete", other_ids[0]),
+        ("delete", other_ids[1]),
+        ("delete", note_id),
+    ]
+    assert [change.seq for change in changes] == list(range(1, 10))
+    assert crud.get_change_bounds(db_session) == (1, 9)
+
+
+def test_feed_resumes_after_sequence_number(
+    client: TestClient, db_session: Session, idle_polls
+):
+    """Test that the feed sends the changes after since or Last-Event-ID."""
+    note_id = client.post("/api/v1/notes/", json={"title": "A", "content": "a"}).json()[
+        "id"
+    ]
+    client.put(f"/api/v1/notes/{note_id}", json={"content": "b"})
+    client.delete(f"/api/v1/notes/{note_id}")
+
+    events = asyncio.run(_read(db_session, StubRequest(), since=1))
+    assert [(event, seq) for event, seq, _ in events] == [("update", 2), ("delete", 3)]
+    assert events[0][2]["note_id"] == note_id
+    events = asyncio.run(_read(db_session, StubRequest(), last_event_id="2"))
+    assert [(event, seq) for event, seq, _ in events] == [("delete", 3)]
+    # Without a sequence number, only new changes are sent
+    assert asyncio.run(_read(db_session, StubRequest(polls=2))) == []
+
+
+def test_feed_resets_after_pruned_changes(
+    client: TestClient, db_session: Session, idle_polls
+):
+    """Test that resuming from a pruned change sends a reset event."""
+    for title in ("A", "B", "C"):
+        client.post("/api/v1/notes/", json={"title": title, "content": ""})
+    pruned = crud.prune_changes(db_session, datetime.now(timezone.utc) + timedelta(1))
+    # The latest change is kept, so that the sequence goes on from it
+    assert pruned == 2
+    assert crud.get_change_bounds(db_session) == (3, 3)
+
+    for since in (0, 7):
+        events = asyncio.run(_read(db_session, StubRequest(), since=since))
+        assert events == [("reset", 3, {"seq": 3})]
+    # Resuming right before the oldest change misses nothing
+    events = asyncio.run(_read(db_session, StubRequest(), since=2))
+    assert [(event, seq) for event, seq, _ in events] == [("create", 3)]
+    response = client.get(
+        "/api/v1/notes/changes", headers={"Last-Event-ID": "not-a-number"}
+    )
+    assert response.status_code == 400
+
+
+def test_feed_is_woken_by_writes(db_session: Session, monkeypatch):
+    """Test that a write of this worker is pushed without waiting for a poll."""
+    monkeypatch.setattr(settings, "CHANGE_FEED_POLL_SECONDS", 60)
+
+    async def follow_and_write():
+        changes = crud.aio.stream_changes(
+            db_session, 0, StubRequest(polls=2).is_disconnected
+        )
+        reading = asyncio.ensure_future(changes.__anext__())
+        while not change_notifier.listeners:
+            await asyncio.sleep(0.01)
+        # Lets the first read of the log end
+        await asyncio.sleep(0.1)
+        await crud.aio.create_note(
+            db_session, schemas.NoteCreate(title="A", content="")
+        )
+        pushed = await asyncio.wait_for(reading, timeout=5)
+        await changes.aclose()
+        return pushed
+
+    pushed = asyncio.run(follow_and_write())
+    assert [(change.seq, change.kind) for change in pushed] == [(1, "create")]
+    assert change_notifier.listeners == 0
+
+
+def test_postgres_log_writers_take_turns():
+    """Test that PostgreSQL writers lock the log before drawing sequence numbers."""
+
+    class PostgresSession:
+        def __init__(self):
+            self.info, self.statements = {}, []
+
+        def get_bind(self):
+            return SimpleNamespace(dialect=SimpleNamespace(name="postgresql"))
+
+        def execute(self, statement, parameters=None):
+            self.statements.append(str(statement))
+
+    db = PostgresSession()
+    crud.record_changes(db, "update", [1])
+    lock, log = db.statements
+    assert lock == "SELECT pg_advisory_xact_lock(:key)"
+    assert log.startswith("INSERT INTO note_changes")
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from app.core.config import settings
+from app.models import NoteVersion
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+
+@pytest.fixture
+def coalescing(monkeypatch):
+    monkeypatch.setattr(settings, "VERSION_COALESCE_SECONDS", 60)
+
+
+def _create(client: TestClient) -> int:
+    response = client.post("/api/v1/notes/", json={"title": "Draft", "content": "a"})
+    return response.json()["id"]
+
+
+def _autosave(client: TestClient, note_id: int, content: str, session: str = "tab-1"):
+    return client.put(
+        f"/api/v1/notes/{note_id}",
+        json={"content": content},
+        headers={"X-Edit-Session": session},
+    )
+
+
+def _versions(client: TestClient, note_id: int) -> list:
+    versions = client.get(f"/api/v1/notes/{note_id}/versions/?view=full").json()
+    return [version["content"] for version in versions]
+
+
+def test_updates_are_versioned_without_window(client: TestClient):
+    """Test that the edit session is ignored when coalescing is disabled."""
+    note_id = _create(client)
+    for content in ("ab", "abc"):
+        response = _autosave(client, note_id, content)
+        assert response.headers["X-Version-Created"] == "true"
+    assert _versions(client, note_id) == ["ab", "a"]
+
+
+def test_autosaves_of_a_session_are_coalesced(client: TestClient, coalescing):
+    """Test that a burst of updates keeps one version, the state before it."""
+    note_id = _create(client)
+    assert _autosave(client, note_id, "ab").headers["X-Version-Created"] == "true"
+    for content in ("abc", "abcd"):
+        response = _autosave(client, note_id, content)
+        assert response.status_code == 200
+        assert response.headers["X-Version-Created"] == "false"
+        assert response.json()["content"] == content
+
+    assert _versions(client, note_id) == ["a"]
+    assert client.get(f"/api/v1/notes/{note_id}").json()["content"] == "abcd"
+
+
+def test_other_writers_are_not_coalesced(client: TestClient, coalescing):
+    """Test that another session or a plain update creates a version."""
+    note_id = _create(client)
+    _autosave(client, note_id, "ab")
+    response = _autosave(client, note_id, "abc", session="tab-2")
+    assert response.headers["X-Version-Created"] == "true"
+    response = client.put(f"/api/v1/notes/{note_id}", json={"content": "abcd"})
+    assert response.headers["X-Version-Created"] == "true"
+    # The session of the latest version no longer matches
+    response = _autosave(client, note_id, "abcde", session="tab-2")
+    assert response.headers["X-Version-Created"] == "true"
+
+    assert _versions(client, note_id) == ["abcd", "abc", "ab", "a"]
+
+
+def test_coalescing_window_expires(db_session: Session, client: TestClient, coalescing):
+    """Test that an update after the window creates a new version."""
+    note_id = _create(client)
+    _autosave(client, note_id, "ab")
+    db_session.execute(
+        update(NoteVersion).values(
+            version_timestamp=datetime.now(timezone.utc) - timedelta(minutes=2)
+        )
+    )
+    db_session.commit()
+
+    assert _autosave(client, note_id, "abc").headers["X-Version-Created"] == "true"
+    assert _versions(client, note_id) == ["ab", "a"]
+    assert db_session.query(NoteVersion.edit_session).distinct().all() == [("tab-1",)]
+
+
+def test_edit_session_length_is_limited(client: TestClient):
+    """Test that an oversized X-Edit-Session header is rejected."""
+    note_id = _create(client)
+    response = _autosave(client, note_id, "ab", session="x" * 65)
+    assert response.status_code == 422
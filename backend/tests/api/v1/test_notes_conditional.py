@@ -0,0 +1,147 @@
+import threading
+
+from app import crud, schemas
+from app.core.http_cache import PreconditionFailedError, make_etag
+from app.crud import note as note_crud
+from app.db.base import Base
+from app.db.tenant import DEFAULT_TENANT, TENANT_INFO_KEY
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+
+def create_note(client: TestClient, content: str = "Body") -> dict:
+    return client.post(
+        "/api/v1/notes/", json={"title": "Conditional", "content": content}
+    ).json()
+
+
+def test_note_etag_and_not_modified(client: TestClient):
+    """Test that an unchanged note is answered with 304 Not Modified."""
+    note_id = create_note(client)["id"]
+
+    response = client.get(f"/api/v1/notes/{note_id}")
+    etag = response.headers["etag"]
+    assert etag.startswith('"') and not etag.startswith("W/")
+    assert response.headers["last-modified"].endswith("GMT")
+
+    response = client.get(f"/api/v1/notes/{note_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    response = client.get(
+        f"/api/v1/notes/{note_id}",
+        headers={"If-Modified-Since": response.headers["last-modified"]},
+    )
+    assert response.status_code == 304
+
+    # Even within the same second, the new content changes the ETag
+    client.put(f"/api/v1/notes/{note_id}", json={"content": "Changed"})
+    response = client.get(f"/api/v1/notes/{note_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["content"] == "Changed"
+    assert response.headers["etag"] != etag
+
+
+def test_listings_etag(client: TestClient):
+    """Test conditional GETs on the notes and versions listings."""
+    note_id = create_note(client)["id"]
+    client.put(f"/api/v1/notes/{note_id}", json={"content": "v2"})
+
+    for url in ("/api/v1/notes/", f"/api/v1/notes/{note_id}/versions/"):
+        etag = client.get(url).headers["etag"]
+        response = client.get(url, headers={"If-None-Match": f'"other", {etag}'})
+        assert response.status_code == 304
+
+    etag = client.get("/api/v1/notes/").headers["etag"]
+    create_note(client, "Another")
+    response = client.get("/api/v1/notes/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+
+def test_update_if_match(client: TestClient):
+    """Test the optimistic concurrency of PUT with If-Match."""
+    note_id = create_note(client)["id"]
+    etag = client.get(f"/api/v1/notes/{note_id}").headers["etag"]
+
+    response = client.put(
+        f"/api/v1/notes/{note_id}",
+        json={"content": "First writer"},
+        headers={"If-Match": etag},
+    )
+    assert response.status_code == 200
+    new_etag = response.headers["etag"]
+    assert client.get(f"/api/v1/notes/{note_id}").headers["etag"] == new_etag
+
+    # A second writer still holding the old ETag is rejected
+    response = client.put(
+        f"/api/v1/notes/{note_id}",
+        json={"content": "Second writer"},
+        headers={"If-Match": etag},
+    )
+    assert response.status_code == 412
+    note = client.get(f"/api/v1/notes/{note_id}").json()
+    assert note["content"] == "First writer"
+    versions = client.get(f"/api/v1/notes/{note_id}/versions/").json()
+    assert len(versions) == 1
+
+    response = client.put(
+        f"/api/v1/notes/{note_id}", json={"content": "Any"}, headers={"If-Match": "*"}
+    )
+    assert response.status_code == 200
+
+
+def test_interleaved_if_match_updates(tmp_path, monkeypatch):
+    """Test that of two writers holding the same ETag, one is rejected even
+    when both pass their check before either writes."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'notes.db'}",
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, info={TENANT_INFO_KEY: DEFAULT_TENANT})
+    with factory() as db:
+        db_note = crud.create_note(db, schemas.NoteCreate(title="T", content="v0"))
+    etag = make_etag(note_crud.serialize_note(db_note))
+
+    read = note_crud.get_note_for_write
+    both_read = threading.Barrier(2, timeout=5)
+
+    def interleaved_read(db, *args, **kwargs):
+        found = read(db, *args, **kwargs)
+        if not kwargs["for_update"]:
+            both_read.wait()
+        return found
+
+    monkeypatch.setattr(note_crud, "get_note_for_write", interleaved_read)
+    outcomes = {}
+
+    def write(content: str):
+        with factory() as db:
+            try:
+                crud.update_note(
+                    db, db_note.id, schemas.NoteUpdate(content=content), if_match=etag
+                )
+                outcomes[content] = "written"
+            except PreconditionFailedError:
+                outcomes[content] = "rejected"
+
+    writers = [threading.Thread(target=write, args=(c,)) for c in ("v1", "v2")]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+    engine.dispose()
+
+    assert sorted(outcomes.values()) == ["rejected", "written"]
+    (written,) = (
+        content for content, outcome in outcomes.items() if outcome == "written"
+    )
+    with factory() as db:
+        assert crud.get_note(db, db_note.id).content == written
+        versions = crud.get_note_versions(db, db_note.id)
+        assert [schemas.NoteVersion.model_validate(v).content for v in versions] == [
+            "v0"
+        ]
@@ -0,0 +1,97 @@
+from fastapi.testclient import TestClient
+
+
+def _note_with_versions(client: TestClient) -> tuple:
+    """Creates a note edited twice, returns its ID and its two version IDs."""
+    note_id = client.post(
+        "/api/v1/notes/", json={"title": "Plan", "content": "one\ntwo\nthree\n"}
+    ).json()["id"]
+    client.put(f"/api/v1/notes/{note_id}", json={"content": "one\n2\nthree\n"})
+    client.put(
+        f"/api/v1/notes/{note_id}",
+        json={"title": "Final plan", "content": "one\n2\nthree\nfour\n"},
+    )
+    versions = client.get(f"/api/v1/notes/{note_id}/versions/").json()
+    # Oldest first
+    return note_id, versions[1]["id"], versions[0]["id"]
+
+
+def test_unified_diff_between_versions(client: TestClient):
+    """Test that a unified diff of two versions is returned."""
+    note_id, first, second = _note_with_versions(client)
+
+    response = client.get(f"/api/v1/notes/{note_id}/versions/{first}/diff/{second}")
+
+    assert response.status_code == 200
+    assert "ETag" in response.headers
+    data = response.json()
+    assert data["from_version_id"] == first
+    assert data["to_version_id"] == second
+    assert data["format"] == "unified"
+    assert data["ops"] is None
+    assert data["unified"] == (
+        f"--- version {first}\n"
+        f"+++ version {second}\n"
+        "@@ -1,3 +1,3 @@\n"
+        " one\n"
+        "-two\n"
+        "+2\n"
+        " three\n"
+    )
+
+
+def test_structured_diff_against_current(client: TestClient):
+    """Test the structured operations between a version and the note."""
+    note_id, first, _ = _note_with_versions(client)
+
+    response = client.get(
+        f"/api/v1/notes/{note_id}/versions/{first}/diff",
+        params={"format": "structured"},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["to_version_id"] is None
+    assert (data["from_title"], data["to_title"]) == ("Plan", "Final plan")
+    assert [(op["op"], op["removed"], op["added"]) for op in data["ops"]] == [
+        ("equal", [], []),
+        ("replace", ["two\n"], ["2\n"]),
+        ("equal", [], []),
+        ("insert", [], ["four\n"]),
+    ]
+    assert data["ops"][3]["to_start"] == 3
+
+
+def test_diff_of_missing_versions(client: TestClient):
+    """Test that versions of another note or unknown ones are not found."""
+    note_id, first, second = _note_with_versions(client)
+    other_id, other_first, _ = _note_with_versions(client)
+
+    urls = [
+        f"/api/v1/notes/{note_id}/versions/{first}/diff/999",
+        f"/api/v1/notes/{note_id}/versions/{first}/diff/{other_first}",
+        f"/api/v1/notes/{other_id}/versions/{first}/diff",
+    ]
+    for url in urls:
+        assert client.get(url).status_code == 404
+    response = client.get(
+        f"/api/v1/notes/{note_id}/versions/{first}/diff/{second}",
+        params={"format": "html"},
+    )
+    assert response.status_code == 422
+
+
+def test_version_diffs_are_memoized(client: TestClient):
+    """Test that a diff of two versions is computed once, until deleted."""
+    note_id, first, second = _note_with_versions(client)
+    url = f"/api/v1/notes/{note_id}/versions/{first}/diff/{second}"
+
+    first_body = client.get(url).content
+    # Writes do not make a diff of versions stale
+    client.put(f"/api/v1/notes/{note_id}", json={"content": "rewritten"})
+    assert client.get(url).content == first_body
+    stats = client.get("/api/v1/cache/stats").json()
+    assert (stats["hits"]["diff"], stats["misses"]["diff"]) == (1, 1)
+
+    client.delete(f"/api/v1/notes/{note_id}")
+    assert client.get(url).status_code == 404
@@ -0,0 +1,58 @@
+import json
+
+from app.core.config import settings
+from fastapi.testclient import TestClient
+
+
+def read_ndjson(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_export_streams_all_notes(client: TestClient, monkeypatch):
+    """Test that the export returns every note, one JSON object per line."""
+    # Several batches, the last one partial
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 2)
+    ids = [
+        client.post(
+            "/api/v1/notes/", json={"title": f"Note {i}", "content": f"Content {i}"}
+        ).json()["id"]
+        for i in range(5)
+    ]
+
+    response = client.get("/api/v1/notes/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    records = read_ndjson(response)
+    assert [record["id"] for record in records] == ids
+    assert records[3]["title"] == "Note 3"
+    assert records[3]["content"] == "Content 3"
+    assert records[3]["created_at"]
+    assert "versions" not in records[3]
+
+
+def test_export_embeds_versions(client: TestClient, monkeypatch):
+    """Test that the versions of each note are rebuilt and embedded."""
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 1)
+    first = client.post("/api/v1/notes/", json={"title": "A", "content": "A0"}).json()
+    second = client.post("/api/v1/notes/", json={"title": "B", "content": "B0"}).json()
+    # Enough edits to store both snapshots and deltas
+    for i in range(1, 13):
+        client.put(f"/api/v1/notes/{first['id']}", json={"content": f"A0\nA{i}"})
+
+    records = read_ndjson(client.get("/api/v1/notes/export?include_versions=true"))
+    assert [record["id"] for record in records] == [first["id"], second["id"]]
+
+    versions = records[0]["versions"]
+    assert [v["content"] for v in versions] == ["A0"] + [
+        f"A0\nA{i}" for i in range(1, 12)
+    ]
+    assert records[0]["content"] == "A0\nA12"
+    assert records[1]["versions"] == []
+
+
+def test_export_empty(client: TestClient):
+    """Test that exporting no notes returns an empty body."""
+    response = client.get("/api/v1/notes/export")
+    assert response.status_code == 200
+    assert response.text == ""
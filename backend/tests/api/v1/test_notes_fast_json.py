@@ -0,0 +1,44 @@
+import pytest
+from app.core.cache import NullCache, cache
+from app.core.config import settings
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def seeded_client(client: TestClient) -> TestClient:
+    note_id = client.post(
+        "/api/v1/notes/", json={"title": "Café ☕", "content": 'Line "1"\n'}
+    ).json()["id"]
+    for i in range(12):
+        client.put(f"/api/v1/notes/{note_id}", json={"content": f"Line 1\nEdit {i}"})
+    client.post("/api/v1/notes/", json={"title": "Other", "content": "été"})
+    return client
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/api/v1/notes/",
+        "/api/v1/notes/?limit=1",
+        "/api/v1/notes/?view=summary",
+        "/api/v1/notes/?fields=preview",
+        "/api/v1/notes/1/versions/?limit=5",
+        "/api/v1/notes/1/versions/?limit=5&view=full",
+    ],
+)
+def test_fast_json_sends_the_same_bytes(
+    seeded_client: TestClient, monkeypatch, url: str
+):
+    """Test that the orjson path serializes listings exactly like Pydantic."""
+    cache.configure(NullCache())
+    responses = {}
+    for fast_json in (False, True):
+        monkeypatch.setattr(settings, "FAST_JSON", fast_json)
+        responses[fast_json] = seeded_client.get(url)
+
+    assert responses[True].status_code == 200
+    assert responses[True].content == responses[False].content
+    assert responses[True].headers["etag"] == responses[False].headers["etag"]
+    assert responses[True].headers.get("x-next-cursor") == responses[False].headers.get(
+        "x-next-cursor"
+    )
@@ -0,0 +1,109 @@
+import json
+
+from app.core.config import settings
+from app.models import NoteVersion
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+
+def ndjson(*records) -> str:
+    return "".join(json.dumps(record) + "\n" for record in records)
+
+
+def test_import_notes(client: TestClient):
+    """Test that valid lines are imported in batches and invalid ones reported."""
+    body = ndjson(
+        {"title": "One", "content": "First"},
+        {"title": "Two", "content": "Second", "created_at": "2024-01-02T10:00:00Z"},
+        {"title": "Missing content"},
+    )
+    body += "not json\n\n" + ndjson({"title": "Three", "content": "Third"})
+
+    response = client.post(
+        "/api/v1/notes/import?batch_size=2",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert result["lines"] == 6
+    assert result["imported"] == 3
+    assert result["failed"] == 2
+    assert [error["line"] for error in result["errors"]] == [3, 4]
+    assert "content" in result["errors"][0]["error"]
+
+    notes = {note["title"]: note for note in client.get("/api/v1/notes/").json()}
+    assert set(notes) == {"One", "Two", "Three"}
+    assert notes["Two"]["created_at"] == "2024-01-02T10:00:00"
+    assert notes["Two"]["updated_at"] == "2024-01-02T10:00:00"
+
+
+def test_import_streamed_body(client: TestClient):
+    """Test that lines split across body chunks are put back together."""
+    body = ndjson(*({"title": f"N{i}", "content": "x" * 50} for i in range(20)))
+    chunks = [body[i : i + 7].encode() for i in range(0, len(body), 7)]
+
+    response = client.post("/api/v1/notes/import", content=iter(chunks))
+    assert response.json()["imported"] == 20
+    assert len(client.get("/api/v1/notes/").json()) == 20
+
+
+def test_import_rejects_long_lines(client: TestClient, monkeypatch):
+    """Test that a line above IMPORT_MAX_LINE_BYTES is skipped."""
+    monkeypatch.setattr(settings, "IMPORT_MAX_LINE_BYTES", 100)
+    body = ndjson(
+        {"title": "Long", "content": "x" * 200}, {"title": "A", "content": "B"}
+    )
+
+    result = client.post("/api/v1/notes/import", content=body).json()
+    assert result["imported"] == 1
+    assert result["errors"] == [{"line": 1, "error": "Line too long"}]
+
+
+def test_export_import_round_trip(client: TestClient, db_session):
+    """Test that an export imported back preserves notes and version history."""
+    base = "".join(f"Line {i}\n" for i in range(50))
+    note = client.post("/api/v1/notes/", json={"title": "T", "content": base}).json()
+    # Enough edits to store several snapshots and deltas
+    for i in range(1, 25):
+        client.put(f"/api/v1/notes/{note['id']}", json={"content": f"{base}v{i}"})
+    client.post("/api/v1/notes/", json={"title": "Plain", "content": "No history"})
+    archive = client.get("/api/v1/notes/export?include_versions=true").text
+    exported = [json.loads(line) for line in archive.splitlines()]
+
+    result = client.post(
+        "/api/v1/notes/import?preserve_versions=true&batch_size=1", content=archive
+    ).json()
+    assert result["imported"] == 2
+    assert result["versions"] == 24
+
+    imported = [
+        json.loads(line)
+        for line in client.get(
+            "/api/v1/notes/export?include_versions=true"
+        ).text.splitlines()
+    ][2:]
+    for before, after in zip(exported, imported):
+        assert after["id"] != before["id"]
+        for field in ("title", "content", "created_at", "updated_at"):
+            assert after[field] == before[field]
+        assert [(v["content"], v["version_timestamp"]) for v in after["versions"]] == [
+            (v["content"], v["version_timestamp"]) for v in before["versions"]
+        ]
+
+    # The imported history is listed and restorable like any other
+    new_id = imported[0]["id"]
+    versions = client.get(f"/api/v1/notes/{new_id}/versions/?view=full").json()
+    assert versions[0]["content"] == f"{base}v23"
+    assert versions[-1]["content"] == base
+    # Stored as compactly as the original: a snapshot every 10 versions
+    snapshots = db_session.scalar(
+        select(func.count(NoteVersion.id)).where(
+            NoteVersion.note_id == new_id, NoteVersion.base_version_id.is_(None)
+        )
+    )
+    assert snapshots == 3
+    restored = client.post(
+        f"/api/v1/notes/{new_id}/versions/{versions[-1]['id']}/restore/"
+    ).json()
+    assert restored["content"] == base
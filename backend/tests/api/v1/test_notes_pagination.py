@@ -0,0 +1,84 @@
+from fastapi.testclient import TestClient
+
+
+def _create_notes(client: TestClient, count: int) -> list:
+    """Creates `count` notes and returns their ids."""
+    ids = []
+    for i in range(count):
+        response = client.post(
+            "/api/v1/notes/", json={"title": f"Note {i}", "content": f"Content {i}"}
+        )
+        assert response.status_code == 201
+        ids.append(response.json()["id"])
+    return ids
+
+
+def test_notes_cursor_pagination_walks_all_notes(client: TestClient):
+    """Test that following X-Next-Cursor returns every note exactly once."""
+    ids = _create_notes(client, 5)
+
+    # First page through the classic skip/limit API
+    response = client.get("/api/v1/notes/", params={"limit": 2})
+    assert response.status_code == 200
+    seen = [note["id"] for note in response.json()]
+    cursor = response.headers.get("X-Next-Cursor")
+
+    while cursor:
+        response = client.get("/api/v1/notes/", params={"limit": 2, "cursor": cursor})
+        assert response.status_code == 200
+        seen.extend(note["id"] for note in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+
+    # Notes created in the same second are ordered by id, newest first
+    assert seen == sorted(ids, reverse=True)
+
+
+def test_notes_cursor_matches_offset_pages(client: TestClient):
+    """Test that keyset and offset pagination return the same pages."""
+    _create_notes(client, 4)
+
+    first = client.get("/api/v1/notes/", params={"limit": 2})
+    by_offset = client.get("/api/v1/notes/", params={"limit": 2, "skip": 2})
+    by_cursor = client.get(
+        "/api/v1/notes/",
+        params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]},
+    )
+    assert by_cursor.json() == by_offset.json()
+
+
+def test_notes_invalid_cursor(client: TestClient):
+    """Test that a malformed cursor is rejected with 400."""
+    response = client.get("/api/v1/notes/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_note_versions_cursor_pagination(client: TestClient):
+    """Test keyset pagination on the versions listing."""
+    (note_id,) = _create_notes(client, 1)
+    for i in range(3):
+        client.put(f"/api/v1/notes/{note_id}", json={"content": f"Edit {i}"})
+
+    response = client.get(
+        f"/api/v1/notes/{note_id}/versions/", params={"limit": 2, "view": "full"}
+    )
+    assert response.status_code == 200
+    first_page = response.json()
+    assert len(first_page) == 2
+
+    response = client.get(
+        f"/api/v1/notes/{note_id}/versions/",
+        params={
+            "limit": 2,
+            "view": "full",
+            "cursor": response.headers["X-Next-Cursor"],
+        },
+    )
+    assert response.status_code == 200
+    second_page = response.json()
+    assert len(second_page) == 1
+    # The last page is not full, so there is no next cursor
+    assert "X-Next-Cursor" not in response.headers
+
+    ids = [v["id"] for v in first_page + second_page]
+    assert ids == sorted(ids, reverse=True)
+    assert second_page[0]["content"] == "Content 0"
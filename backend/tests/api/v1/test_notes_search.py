@@ -0,0 +1,65 @@
+from fastapi.testclient import TestClient
+
+
+def _create(client: TestClient, title: str, content: str) -> int:
+    response = client.post("/api/v1/notes/", json={"title": title, "content": content})
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def test_search_ranks_title_matches_first(client: TestClient):
+    """Test that notes matching in the title rank above content matches."""
+    content_match = _create(client, "Weekly sync", "We discussed the budget.")
+    title_match = _create(client, "Budget 2025", "Numbers for next year.")
+    _create(client, "Groceries", "Milk and bread.")
+
+    response = client.get("/api/v1/notes/search", params={"q": "budget"})
+    assert response.status_code == 200
+    results = response.json()
+    assert [r["id"] for r in results] == [title_match, content_match]
+    assert results[0]["score"] >= results[1]["score"]
+    assert results[0]["title"] == "Budget 2025"
+
+
+def test_search_prefix_accents_and_operators(client: TestClient):
+    """Test prefix matching, accent folding and that FTS syntax is inert."""
+    note_id = _create(client, "Réunion d'équipe", "Préparer la démo.")
+
+    for q in ["reunion", "équi", "demo", 'reunion "demo', "demo:"]:
+        response = client.get("/api/v1/notes/search", params={"q": q})
+        assert response.status_code == 200
+        assert [r["id"] for r in response.json()] == [note_id], q
+
+    response = client.get("/api/v1/notes/search", params={"q": "*()"})
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+def test_search_index_follows_updates_and_deletes(client: TestClient):
+    """Test that the triggers keep the index in sync with the notes."""
+    note_id = _create(client, "Draft", "Quarterly roadmap")
+
+    client.put(f"/api/v1/notes/{note_id}", json={"content": "Release checklist"})
+    assert client.get("/api/v1/notes/search", params={"q": "roadmap"}).json() == []
+    results = client.get("/api/v1/notes/search", params={"q": "checklist"}).json()
+    assert [r["id"] for r in results] == [note_id]
+
+    client.delete(f"/api/v1/notes/{note_id}")
+    assert client.get("/api/v1/notes/search", params={"q": "checklist"}).json() == []
+
+
+def test_search_pagination(client: TestClient):
+    """Test skip and limit on search results."""
+    ids = [_create(client, f"Meeting {i}", "agenda") for i in range(3)]
+
+    first = client.get("/api/v1/notes/search", params={"q": "agenda", "limit": 2})
+    second = client.get(
+        "/api/v1/notes/search", params={"q": "agenda", "limit": 2, "skip": 2}
+    )
+    found = [r["id"] for r in first.json() + second.json()]
+    assert sorted(found) == sorted(ids)
+
+
+def test_search_requires_query(client: TestClient):
+    """Test that an empty query is rejected."""
+    assert client.get("/api/v1/notes/search", params={"q": ""}).status_code == 422
@@ -0,0 +1,155 @@
+import json
+from datetime import datetime
+from itertools import product
+
+import pytest
+from app import crud
+from app.core.pagination import encode_cursor
+from app.db.tenant import DEFAULT_TENANT, TENANT_INFO_KEY
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+# Title, created_at, updated_at
+NOTES = [
+    ("Banana", "2024-01-01T10:00:00", "2024-03-01T10:00:00"),
+    ("apple", "2024-01-02T10:00:00", "2024-02-01T10:00:00"),
+    ("Apricot", "2024-01-03T10:00:00", "2024-01-04T10:00:00"),
+    ("Avocado", "2024-01-04T10:00:00", "2024-05-01T10:00:00"),
+]
+
+
+@pytest.fixture
+def notes(client: TestClient):
+    body = "".join(
+        json.dumps({"title": t, "content": t, "created_at": c, "updated_at": u}) + "\n"
+        for t, c, u in NOTES
+    )
+    response = client.post(
+        "/api/v1/notes/import",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.json()["imported"] == len(NOTES)
+
+
+def _titles(client: TestClient, **params) -> list:
+    response = client.get("/api/v1/notes/", params=params)
+    assert response.status_code == 200
+    return [note["title"] for note in response.json()]
+
+
+def test_sorted_listing(client: TestClient, notes):
+    """Test each sort column in both orders, ties broken by id."""
+    assert _titles(client) == ["Avocado", "Banana", "apple", "Apricot"]
+    assert _titles(client, sort="created_at", order="asc") == [
+        "Banana",
+        "apple",
+        "Apricot",
+        "Avocado",
+    ]
+    # Binary order: capitals first
+    assert _titles(client, sort="title", order="asc") == [
+        "Apricot",
+        "Avocado",
+        "Banana",
+        "apple",
+    ]
+    assert _titles(client, sort="title") == ["apple", "Banana", "Avocado", "Apricot"]
+    response = client.get("/api/v1/notes/", params={"sort": "content"})
+    assert response.status_code == 422
+
+
+def test_filtered_listing(client: TestClient, notes):
+    """Test the date ranges, half-open, and the case-sensitive title prefix."""
+    titles = _titles(
+        client,
+        sort="created_at",
+        order="asc",
+        created_after="2024-01-02T10:00:00",
+        created_before="2024-01-04T10:00:00",
+    )
+    assert titles == ["apple", "Apricot"]
+    # 2024-01-31T23:00:00 UTC
+    titles = _titles(client, updated_after="2024-02-01T01:00:00+02:00")
+    assert titles == ["Avocado", "Banana", "apple"]
+    assert _titles(client, title_prefix="A", sort="title", order="asc") == [
+        "Apricot",
+        "Avocado",
+    ]
+    assert _titles(client, title_prefix="Av", updated_before="2024-01-01") == []
+
+
+@pytest.mark.parametrize("view", ["full", "summary"])
+def test_cursor_follows_the_sort(client: TestClient, notes, view: str):
+    """Test that keyset pages follow the sort, without leaking its column."""
+    params = {"sort": "title", "order": "asc", "limit": 1, "view": view}
+    if view == "summary":
+        params["fields"] = "preview"
+    pages = []
+    response = client.get("/api/v1/notes/", params=params)
+    while True:
+        pages.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        response = client.get("/api/v1/notes/", params={**params, "cursor": cursor})
+
+    assert [note["preview" if view == "summary" else "title"] for note in pages] == [
+        "Apricot",
+        "Avocado",
+        "Banana",
+        "apple",
+    ]
+    if view == "summary":
+        assert all("title" not in note for note in pages)
+
+
+LISTINGS = [
+    {},
+    {"created_after": datetime(2024, 1, 2), "created_before": datetime(2024, 2, 1)},
+    {"updated_after": datetime(2024, 1, 2), "updated_before": datetime(2024, 2, 1)},
+    {"title_prefix": "Ap"},
+]
+
+
+@pytest.mark.parametrize(
+    "sort,order,filters", product(crud.SORT_FIELDS, ("asc", "desc"), LISTINGS)
+)
+def test_listing_query_plans(
+    client: TestClient,
+    notes,
+    db_session: Session,
+    capture_statements,
+    sort,
+    order,
+    filters,
+):
+    """Test that every order and filter is served by an index of the tenant."""
+    listing = crud.NoteListing(sort=sort, order=order, **filters)
+    cursor_value = "M" if sort == "title" else "2024-01-03T00:00:00"
+    db_session.info[TENANT_INFO_KEY] = DEFAULT_TENANT
+    try:
+        with capture_statements(parameters=True) as statements:
+            for cursor in (None, encode_cursor(cursor_value, 2)):
+                crud.get_notes(db_session, limit=2, cursor=cursor, listing=listing)
+                crud.get_note_summaries(
+                    db_session, ("preview",), limit=2, cursor=cursor, listing=listing
+                )
+    finally:
+        db_session.info.pop(TENANT_INFO_KEY)
+
+    for statement, parameters in statements:
+        plan = db_session.connection().exec_driver_sql(
+            "EXPLAIN QUERY PLAN " + statement, parameters
+        )
+        details = [row[-1] for row in plan]
+        assert any(
+            detail.startswith("SEARCH notes USING")
+            and "INDEX ix_notes_tenant_id_" in detail
+            for detail in details
+        ), details
+        assert not any(detail.startswith("SCAN notes") for detail in details)
+        # The index of the sort column also sorts
+        filtered = {key.split("_")[0] for key in filters}
+        if filtered <= {sort.split("_")[0]}:
+            assert "USE TEMP B-TREE FOR ORDER BY" not in details, details
@@ -0,0 +1,43 @@
+from fastapi.testclient import TestClient
+
+
+def test_update_and_restore_statements(client: TestClient, capture_statements):
+    """Test that an update and a restore cost four statements each."""
+    note_id = client.post(
+        "/api/v1/notes/", json={"title": "T", "content": "First"}
+    ).json()["id"]
+    client.put(f"/api/v1/notes/{note_id}", json={"content": "Second"})
+
+    with capture_statements() as statements:
+        response = client.put(f"/api/v1/notes/{note_id}", json={"title": "T2"})
+    assert response.status_code == 200
+    assert response.json()["title"] == "T2"
+    assert response.json()["content"] == "Second"
+    assert [s.split()[0] for s in statements] == [
+        "SELECT",
+        "UPDATE",
+        "INSERT",
+        "INSERT",
+    ]
+
+    version_id = client.get(f"/api/v1/notes/{note_id}/versions/").json()[-1]["id"]
+    with capture_statements() as statements:
+        response = client.post(
+            f"/api/v1/notes/{note_id}/versions/{version_id}/restore/"
+        )
+    assert response.status_code == 200
+    assert response.json()["content"] == "First"
+    assert response.json()["title"] == "T"
+    assert [s.split()[0] for s in statements] == [
+        "SELECT",
+        "UPDATE",
+        "INSERT",
+        "INSERT",
+    ]
+
+    versions = client.get(f"/api/v1/notes/{note_id}/versions/?view=full").json()
+    assert [(v["title"], v["content"]) for v in versions] == [
+        ("T2", "Second"),
+        ("T", "Second"),
+        ("T", "First"),
+    ]
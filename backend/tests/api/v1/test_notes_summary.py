@@ -0,0 +1,55 @@
+from app import crud
+from app.core.config import settings
+from fastapi.testclient import TestClient
+
+
+def test_summary_view(client: TestClient, capture_statements, monkeypatch):
+    """Test that summaries carry a preview and never select the content."""
+    monkeypatch.setattr(settings, "NOTE_PREVIEW_CHARS", 20)
+    client.post("/api/v1/notes/", json={"title": "Short", "content": "Tiny\nnote"})
+    client.post(
+        "/api/v1/notes/",
+        json={"title": "Long", "content": "A long   note\nthat goes on " * 100},
+    )
+
+    with capture_statements() as statements:
+        response = client.get("/api/v1/notes/?view=summary")
+
+    assert response.status_code == 200
+    summaries = response.json()
+    assert [s["title"] for s in summaries] == ["Long", "Short"]
+    assert set(summaries[0]) == {"id", "title", "created_at", "updated_at", "preview"}
+    assert summaries[0]["preview"] == "A long note that…"
+    assert summaries[1]["preview"] == "Tiny note"
+    # Only a prefix of the content is read
+    assert len(statements) == 1
+    columns = statements[0].split(" FROM ")[0]
+    assert "substr(notes.content" in columns
+    assert "notes.content" not in columns.replace("substr(notes.content", "")
+
+
+def test_summary_fields(client: TestClient):
+    """Test that fields= limits the summaries to the requested fields."""
+    for i in range(3):
+        client.post("/api/v1/notes/", json={"title": f"N{i}", "content": "x"})
+
+    response = client.get("/api/v1/notes/?fields=title&limit=2")
+    assert [set(s) for s in response.json()] == [{"id", "updated_at", "title"}] * 2
+
+    # The cursor pages through summaries like through full notes
+    cursor = response.headers["x-next-cursor"]
+    response = client.get(f"/api/v1/notes/?fields=title&limit=2&cursor={cursor}")
+    assert [s["title"] for s in response.json()] == ["N0"]
+
+    response = client.get("/api/v1/notes/?fields=title,content")
+    assert response.status_code == 400
+    assert "content" in response.json()["detail"]
+
+
+def test_make_preview():
+    """Test that previews are cut on a word boundary."""
+    assert crud.make_preview("one two three", 20) == "one two three"
+    assert crud.make_preview("one two three", 10) == "one two…"
+    assert crud.make_preview("one two three", 8) == "one two…"
+    assert crud.make_preview("onetwothree", 5) == "onet…"
+    assert crud.make_preview("one two", 20, more=True) == "one…"
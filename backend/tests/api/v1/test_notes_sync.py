@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta, timezone
+
+from app import crud
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+
+def _create(client: TestClient, title: str) -> int:
+    response = client.post("/api/v1/notes/", json={"title": title, "content": title})
+    return response.json()["id"]
+
+
+def _sync(client: TestClient, **params) -> dict:
+    response = client.get("/api/v1/notes/sync", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_initial_sync_is_paginated(client: TestClient):
+    """Test that a sync without token sends every note, page by page."""
+    ids = [_create(client, title) for title in ("A", "B", "C")]
+
+    first = _sync(client, limit=2)
+    assert [note["id"] for note in first["notes"]] == ids[:2]
+    assert first["has_more"] and first["deleted"] == []
+    second = _sync(client, since=first["token"], limit=2)
+    assert [note["id"] for note in second["notes"]] == ids[2:]
+    assert not second["has_more"]
+
+    # Nothing was written since
+    third = _sync(client, since=second["token"])
+    assert (third["notes"], third["deleted"]) == ([], [])
+    assert third["token"] == second["token"]
+
+
+def test_incremental_sync_sends_writes_and_tombstones(client: TestClient):
+    """Test that only notes written since the token and deleted IDs are sent."""
+    # The deleted note is not the last one, whose ID SQLite would reuse
+    deleted, edited, kept = (_create(client, title) for title in ("A", "B", "C"))
+    token = _sync(client)["token"]
+
+    client.put(f"/api/v1/notes/{edited}", json={"title": "B2"})
+    client.put(f"/api/v1/notes/{edited}", json={"title": "B3"})
+    client.delete(f"/api/v1/notes/{deleted}")
+    created = _create(client, "D")
+
+    data = _sync(client, since=token)
+    assert [(note["id"], note["title"]) for note in data["notes"]] == [
+        (edited, "B3"),
+        (created, "D"),
+    ]
+    assert data["deleted"] == [deleted]
+    assert not data["has_more"]
+    assert kept not in [note["id"] for note in data["notes"]]
+
+
+def test_writes_during_initial_sync_are_not_missed(client: TestClient):
+    """Test that a note written between two pages is sent by the next sync."""
+    first_id = _create(client, "A")
+    _create(client, "B")
+    first = _sync(client, limit=1)
+    client.put(f"/api/v1/notes/{first_id}", json={"title": "A2"})
+
+    page = _sync(client, since=first["token"], limit=1)
+    while page["has_more"]:
+        page = _sync(client, since=page["token"], limit=1)
+    notes = _sync(client, since=page["token"])["notes"]
+    assert [note["title"] for note in notes] == ["A2"]
+
+
+def test_invalid_and_expired_tokens(client: TestClient, db_session: Session):
+    """Test that a malformed token is rejected and a pruned one expired."""
+    note_id = _create(client, "A")
+    token = _sync(client)["token"]
+    client.put(f"/api/v1/notes/{note_id}", json={"title": "A2"})
+    client.put(f"/api/v1/notes/{note_id}", json={"title": "A3"})
+    crud.prune_changes(db_session, datetime.now(timezone.utc) + timedelta(1))
+
+    response = client.get("/api/v1/notes/sync", params={"since": token})
+    assert response.status_code == 410
+    response = client.get("/api/v1/notes/sync", params={"since": "not-a-token"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid sync token"
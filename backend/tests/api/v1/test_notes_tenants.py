@@ -0,0 +1,115 @@
+from app.core.config import settings
+from app.db import session as db_session_module
+from app.db.tenant import DEFAULT_TENANT
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+ACME = {"X-Tenant-ID": "acme"}
+GLOBEX = {"X-Tenant-ID": "globex"}
+
+
+def _create(client: TestClient, headers: dict, title: str) -> int:
+    response = client.post(
+        "/api/v1/notes/", json={"title": title, "content": title}, headers=headers
+    )
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def test_tenants_only_see_their_notes(client: TestClient):
+    """Test that reads and writes never cross the tenant of the request."""
+    acme_id = _create(client, ACME, "Acme plan")
+    globex_id = _create(client, GLOBEX, "Globex plan")
+    client.put(f"/api/v1/notes/{acme_id}", json={"title": "Acme plan 2"}, headers=ACME)
+
+    listing = client.get("/api/v1/notes/", headers=ACME).json()
+    assert [note["id"] for note in listing] == [acme_id]
+    assert client.get(f"/api/v1/notes/{acme_id}", headers=ACME).status_code == 200
+    for method in ("get", "delete"):
+        response = getattr(client, method)(f"/api/v1/notes/{acme_id}", headers=GLOBEX)
+        assert response.status_code == 404
+    response = client.put(
+        f"/api/v1/notes/{acme_id}", json={"title": "Stolen"}, headers=GLOBEX
+    )
+    assert response.status_code == 404
+    response = client.get(f"/api/v1/notes/{acme_id}/versions/", headers=GLOBEX)
+    assert response.json() == []
+
+    hits = client.get("/api/v1/notes/search", params={"q": "plan"}, headers=GLOBEX)
+    assert [hit["id"] for hit in hits.json()] == [globex_id]
+    synced = client.get("/api/v1/notes/sync", headers=GLOBEX).json()
+    assert [note["id"] for note in synced["notes"]] == [globex_id]
+    # Requests without header belong to the default tenant
+    assert client.get("/api/v1/notes/").json() == []
+
+
+def test_bulk_writes_are_scoped(client: TestClient, db_session: Session):
+    """Test that bulk writes create rows of the tenant and skip the others'."""
+    created = client.post(
+        "/api/v1/notes/bulk", json=[{"title": "A", "content": "a"}] * 2, headers=ACME
+    ).json()
+    acme_ids = [result["id"] for result in created["results"]]
+    response = client.post(
+        "/api/v1/notes/bulk/delete", json={"ids": acme_ids}, headers=GLOBEX
+    )
+    assert [result["error"] for result in response.json()["results"]] == [
+        "Note not found"
+    ] * 2
+    client.put(
+        "/api/v1/notes/bulk", json=[{"id": acme_ids[0], "title": "B"}], headers=ACME
+    )
+
+    rows = db_session.execute(
+        text(
+            "SELECT 'notes', tenant_id FROM notes UNION ALL "
+            "SELECT 'note_versions', tenant_id FROM note_versions UNION ALL "
+            "SELECT 'note_changes', tenant_id FROM note_changes"
+        )
+    ).all()
+    assert sorted(set(rows)) == [
+        ("note_changes", "acme"),
+        ("note_versions", "acme"),
+        ("notes", "acme"),
+    ]
+
+
+def test_tenant_header_validation(client: TestClient, monkeypatch):
+    """Test that malformed headers are rejected, and missing ones if required."""
+    response = client.get("/api/v1/notes/", headers={"X-Tenant-ID": "a/b"})
+    assert response.status_code == 422
+
+    monkeypatch.setattr(settings, "TENANT_REQUIRED", True)
+    response = client.get("/api/v1/notes/")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "The X-Tenant-ID header is required"
+    assert client.get("/api/v1/notes/", headers=ACME).status_code == 200
+
+
+def test_tenant_databases_routing(tmp_path, monkeypatch):
+    """Test that tenants of TENANT_DATABASES get sessions on their database."""
+    url = f"sqlite:///{tmp_path / 'acme.db'}"
+    monkeypatch.setattr(settings, "TENANT_DATABASES", {"acme": url})
+    monkeypatch.setattr(db_session_module, "_tenant_factories", {})
+
+    sync_factory, _ = db_session_module.tenant_sessionmakers("acme")
+    assert str(sync_factory.kw["bind"].url) == url
+    assert db_session_module.tenant_sessionmakers("acme")[0] is sync_factory
+    shared, _ = db_session_module.tenant_sessionmakers(DEFAULT_TENANT)
+    assert shared is db_session_module.SessionLocal
+    assert list(db_session_module.all_sessionmakers()) == [None, "acme"]
+    sync_factory.kw["bind"].dispose()
+
+
+def test_listing_uses_the_tenant_index(client: TestClient, db_session: Session):
+    """Test that the notes listing of a tenant is served by its index."""
+    _create(client, ACME, "A")
+    plan = db_session.execute(
+        text(
+            "EXPLAIN QUERY PLAN SELECT id FROM notes WHERE tenant_id = 'acme' "
+            "ORDER BY updated_at DESC, id DESC LIMIT 10"
+        )
+    ).all()
+    details = " ".join(row[-1] for row in plan)
+    assert "ix_notes_tenant_id_updated_at_id" in details
+    assert "TEMP B-TREE" not in details
@@ -0,0 +1,64 @@
+import hashlib
+
+from fastapi.testclient import TestClient
+from tests.helpers import edited_note
+
+CONTENTS = ("First é", "Second", "Third")
+
+
+def _edited_note(client: TestClient) -> int:
+    return edited_note(client, 2, CONTENTS.__getitem__)
+
+
+def test_versions_listing_sends_metadata(client: TestClient, capture_statements):
+    """Test that the listing describes versions without loading content."""
+    note_id = _edited_note(client)
+
+    with capture_statements() as statements:
+        response = client.get(f"/api/v1/notes/{note_id}/versions/")
+
+    assert response.status_code == 200
+    versions = response.json()
+    assert [set(version) for version in versions] == [
+        {
+            "id",
+            "note_id",
+            "title",
+            "version_timestamp",
+            "content_length",
+            "content_hash",
+        }
+    ] * 2
+    assert [v["content_length"] for v in versions] == [6, 7]
+    assert versions[1]["content_hash"] == (
+        hashlib.sha256("First é".encode("utf-8")).hexdigest()
+    )
+    assert statements and not any("content_data" in s for s in statements)
+
+
+def test_read_single_version(client: TestClient):
+    """Test that one version is fetched with its content."""
+    note_id = _edited_note(client)
+    versions = client.get(f"/api/v1/notes/{note_id}/versions/").json()
+
+    response = client.get(f"/api/v1/notes/{note_id}/versions/{versions[1]['id']}")
+
+    assert response.status_code == 200
+    assert response.json()["content"] == "First é"
+    assert response.json()["id"] == versions[1]["id"]
+    response = client.get(
+        f"/api/v1/notes/{note_id}/versions/{versions[1]['id']}",
+        headers={"If-None-Match": response.headers["ETag"]},
+    )
+    assert response.status_code == 304
+
+
+def test_read_single_version_of_another_note(client: TestClient):
+    """Test that a version is only found under its own note."""
+    note_id = _edited_note(client)
+    other_id = _edited_note(client)
+    version_id = client.get(f"/api/v1/notes/{note_id}/versions/").json()[0]["id"]
+
+    response = client.get(f"/api/v1/notes/{other_id}/versions/{version_id}")
+    assert response.status_code == 404
+    assert client.get(f"/api/v1/notes/{note_id}/versions/9999").status_code == 404
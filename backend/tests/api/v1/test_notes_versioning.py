@@ -22,7 +22,7 @@ def test_update_note_creates_version(client: TestClient):
     assert response_update.status_code == 200
 
     # 3. Get versions for the note
-    response_versions = client.get(f"/api/v1/notes/{note_id}/versions/")
+    response_versions = client.get(f"/api/v1/notes/{note_id}/versions/?view=full")
     assert response_versions.status_code == 200
     versions = response_versions.json()
 
@@ -59,7 +59,7 @@ def test_get_note_versions(client: TestClient):
     assert response_update_2.status_code == 200
 
     # 4. Get versions for the note via API (Correct Endpoint)
-    response_versions = client.get(f"/api/v1/notes/{note_id}/versions/")
+    response_versions = client.get(f"/api/v1/notes/{note_id}/versions/?view=full")
     assert response_versions.status_code == 200
     versions = response_versions.json()
 
@@ -102,7 +102,9 @@ def test_restore_note_version(client: TestClient):
     assert response_update_2.status_code == 200
 
     # 4. Get versions and find the ID of version A (which has state A content)
-    response_get_versions_before = client.get(f"/api/v1/notes/{note_id}/versions/")
+    response_get_versions_before = client.get(
+        f"/api/v1/notes/{note_id}/versions/?view=full"
+    )
     assert response_get_versions_before.status_code == 200
     versions_before = response_get_versions_before.json()
     assert len(versions_before) == 2
@@ -131,7 +133,9 @@ def test_restore_note_version(client: TestClient):
     assert note_after_data["content"] == state_a_data["content"]
 
     # 8. Get versions - Assert there are 3 versions
-    response_get_versions_after = client.get(f"/api/v1/notes/{note_id}/versions/")
+    response_get_versions_after = client.get(
+        f"/api/v1/notes/{note_id}/versions/?view=full"
+    )
     assert response_get_versions_after.status_code == 200
     versions_after = response_get_versions_after.json()
     assert len(versions_after) == 3
@@ -194,3 +198,63 @@ def test_delete_note_cascades_to_versions(db_session: Session, client: TestClien
         db_session.query(NoteVersion).filter(NoteVersion.id == version_id).first()
     )
     assert db_version is None
+
+
+def test_restore_version_of_another_note(client: TestClient, db_session: Session):
+    """Test that a version is only restored under its own note."""
+    from app import crud
+
+    note_a = client.post("/api/v1/notes/", json={"title": "A", "content": "a0"})
+    note_b = client.post("/api/v1/notes/", json={"title": "B", "content": "b0"})
+    note_b_id = note_b.json()["id"]
+    client.put(f"/api/v1/notes/{note_b_id}", json={"content": "b1"})
+    version_id = client.get(f"/api/v1/notes/{note_b_id}/versions/").json()[0]["id"]
+    changes = len(crud.get_changes(db_session, after=0))
+
+    response = client.post(
+        f"/api/v1/notes/{note_a.json()['id']}/versions/{version_id}/restore/"
+    )
+    assert response.status_code == 404
+
+    # Nothing was written, to either note
+    assert client.get(f"/api/v1/notes/{note_b_id}").json()["content"] == "b1"
+    assert len(crud.get_changes(db_session, after=0)) == changes
+    assert len(client.get(f"/api/v1/notes/{note_b_id}/versions/").json()) == 1
+
+
+def test_update_overtaken_by_another_write(
+    client: TestClient, db_session: Session, monkeypatch
+):
+    """Test that a write landing between the read and the write of an update
+    is kept in the history, not overwritten."""
+    from app import crud, schemas
+    from app.crud import note as note_crud
+    from app.db.tenant import DEFAULT_TENANT, TENANT_INFO_KEY
+    from sqlalchemy.orm import sessionmaker
+
+    note_id = client.post("/api/v1/notes/", json={"title": "T", "content": "v0"})
+    note_id = note_id.json()["id"]
+    other = sessionmaker(
+        bind=db_session.get_bind(), info={TENANT_INFO_KEY: DEFAULT_TENANT}
+    )()
+    read = note_crud.get_note_for_write
+    reads = []
+
+    def overtaken_read(db, *args, **kwargs):
+        found = read(db, *args, **kwargs)
+        if db is not other:
+            reads.append(kwargs["for_update"])
+            if len(reads) == 1:
+                crud.update_note(other, note_id, schemas.NoteUpdate(content="v1"))
+        return found
+
+    monkeypatch.setattr(note_crud, "get_note_for_write", overtaken_read)
+    response = client.put(f"/api/v1/notes/{note_id}", json={"content": "v2"})
+    other.close()
+
+    assert response.status_code == 200
+    assert response.json()["content"] == "v2"
+    # Read again, locked, after the first write did not apply
+    assert reads == [False, True]
+    versions = client.get(f"/api/v1/notes/{note_id}/versions/?view=full").json()
+    assert [version["content"] for version in versions] == ["v1", "v0"]
@@ -0,0 +1,167 @@
+from datetime import datetime, timedelta, timezone
+
+from app import crud, schemas
+from app.core.config import settings
+from app.crud.retention import RetentionPolicy, compact_versions, expired_versions
+from app.db.base import Base
+from app.db.tenant import DEFAULT_TENANT, TENANT_INFO_KEY
+from app.models import NoteVersion
+from app.tasks import compaction
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import Session, sessionmaker
+from tests.helpers import edited_note, paragraphs
+
+NOW = datetime(2025, 6, 1, 12, tzinfo=timezone.utc)
+
+
+def _age_versions(db_session: Session, ages: dict):
+    """Sets the timestamp of versions, given as {version id: age}."""
+    for version_id, age in ages.items():
+        db_session.execute(
+            update(NoteVersion)
+            .where(NoteVersion.id == version_id)
+            .values(version_timestamp=NOW - age)
+        )
+    db_session.commit()
+
+
+def _contents(client: TestClient, note_id: int) -> list:
+    versions = client.get(f"/api/v1/notes/{note_id}/versions/?view=full").json()
+    return [version["content"] for version in versions]
+
+
+def test_expired_versions_policy():
+    """Test the keep last, thinning and maximum age rules."""
+    versions = [
+        (6, NOW - timedelta(hours=1)),
+        (5, NOW - timedelta(days=3, hours=1)),
+        (4, NOW - timedelta(days=3, hours=2)),
+        (3, NOW - timedelta(days=4)),
+        (2, NOW - timedelta(days=40)),
+        (1, NOW - timedelta(days=41)),
+    ]
+    assert expired_versions(versions, RetentionPolicy(), NOW) == set()
+    assert expired_versions(versions, RetentionPolicy(keep_last=2), NOW) == {
+        1,
+        2,
+        3,
+        4,
+    }
+    thinning = RetentionPolicy(thin_after=timedelta(days=2))
+    # 5 and 4 were written the same day, 2 and 1 on different days
+    assert expired_versions(versions, thinning, NOW) == {4}
+    assert (
+        expired_versions(versions, thinning._replace(thin_bucket="hour"), NOW) == set()
+    )
+    assert expired_versions(
+        versions, thinning._replace(max_age=timedelta(days=30)), NOW
+    ) == {1, 2, 4}
+    # The kept versions are never deleted, even when too old
+    assert expired_versions(
+        versions, RetentionPolicy(keep_last=5, max_age=timedelta(days=30)), NOW
+    ) == {1}
+
+
+def test_keep_last_caps_the_history(db_session: Session, client: TestClient):
+    """Test that only the last versions are kept, with their contents."""
+    note_id = edited_note(client, 25)
+    other_id = edited_note(client, 3)
+    expected = _contents(client, note_id)
+
+    result = compact_versions(
+        db_session, RetentionPolicy(keep_last=5), now=NOW, batch_size=4
+    )
+
+    assert (result.notes, result.deleted, result.rebased) == (1, 20, 0)
+    assert _contents(client, note_id) == expected[:5]
+    assert len(_contents(client, other_id)) == 3
+
+
+def test_thinning_rebases_deltas_of_deleted_snapshots(
+    db_session: Session, client: TestClient
+):
+    """Test that kept deltas stay readable when their snapshot is deleted."""
+    note_id = edited_note(client, 12)
+    ids = [
+        row.id
+        for row in db_session.query(NoteVersion.id).order_by(NoteVersion.id).all()
+    ]
+    expected = _contents(client, note_id)
+    # Versions 1-10 were written two per day, 10 days ago and before
+    _age_versions(
+        db_session,
+        {ids[i]: timedelta(days=10 + (9 - i) // 2, hours=i % 2) for i in range(10)},
+    )
+
+    result = compact_versions(
+        db_session, RetentionPolicy(thin_after=timedelta(days=7)), now=NOW
+    )
+
+    # One version per day is kept; the snapshot of the first day is not,
+    # the kept versions of its deltas are rewritten
+    assert (result.deleted, result.rebased) == (5, 5)
+    assert _contents(client, note_id) == [
+        content for i, content in enumerate(expected) if i < 2 or i % 2 == 0
+    ]
+    rows = db_session.query(NoteVersion).order_by(NoteVersion.id).all()
+    assert rows[0].base_version_id is None
+    assert all(row.base_version_id == rows[0].id for row in rows[1:5])
+
+    # New versions are still written against the latest snapshot
+    client.put(f"/api/v1/notes/{note_id}", json={"content": paragraphs(13)})
+    assert _contents(client, note_id)[0] == paragraphs(12)
+
+
+def test_max_age_keeps_the_latest_snapshot(db_session: Session, client: TestClient):
+    """Test that old versions are deleted, except the base of new writes."""
+    note_id = edited_note(client, 12)
+    ids = [row.id for row in db_session.query(NoteVersion.id).all()]
+    _age_versions(db_session, {version_id: timedelta(days=100) for version_id in ids})
+
+    dry_run = compact_versions(
+        db_session, RetentionPolicy(max_age=timedelta(days=90)), now=NOW, dry_run=True
+    )
+    assert dry_run.deleted == 11
+    assert len(_contents(client, note_id)) == 12
+
+    compact_versions(db_session, RetentionPolicy(max_age=timedelta(days=90)), now=NOW)
+    # The 11th version is the latest snapshot
+    assert _contents(client, note_id) == [paragraphs(10)]
+    client.put(f"/api/v1/notes/{note_id}", json={"content": paragraphs(13)})
+    assert _contents(client, note_id) == [paragraphs(12), paragraphs(10)]
+
+
+def test_compaction_stats(db_session: Session, client: TestClient):
+    """Test that the runs and the reclaimed versions are counted."""
+    before = client.get("/api/v1/compaction/stats").json()
+    edited_note(client, 8)
+
+    compact_versions(db_session, RetentionPolicy(keep_last=3), now=NOW)
+
+    # The first version is the latest snapshot, the base of the kept ones
+    stats = client.get("/api/v1/compaction/stats").json()
+    assert stats["runs"] == before["runs"] + 1
+    assert stats["versions_deleted"] == before["versions_deleted"] + 4
+    assert stats["last_run_at"] is not None
+
+
+def test_compaction_skips_locked_databases(tmp_path, monkeypatch):
+    """Test that a database is compacted by one worker at a time."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'notes.db'}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, info={TENANT_INFO_KEY: DEFAULT_TENANT})
+    with factory() as db:
+        note_id = crud.create_note(db, schemas.NoteCreate(title="T", content="0")).id
+        for content in ("1", "2", "3"):
+            crud.update_note(db, note_id, schemas.NoteUpdate(content=content))
+    monkeypatch.setattr(settings, "VERSION_KEEP_LAST", 1)
+    monkeypatch.setattr(compaction, "all_sessionmakers", lambda: {None: factory})
+
+    # Held by another worker
+    with compaction.compaction_lock(engine) as locked:
+        assert locked
+        assert compaction.run_compaction(dry_run=True).deleted == 2
+        assert compaction.run_compaction().deleted == 0
+    assert compaction.run_compaction().deleted == 2
+    engine.dispose()
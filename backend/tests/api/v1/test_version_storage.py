@@ -0,0 +1,47 @@
+from app.models import NoteVersion
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from tests.helpers import edited_note, paragraphs
+
+
+def test_versions_are_stored_as_snapshots_and_deltas(
+    db_session: Session, client: TestClient
+):
+    """Test that only every Nth version is a full snapshot."""
+    response = client.post(
+        "/api/v1/notes/", json={"title": "Long note", "content": paragraphs(0)}
+    )
+    note_id = response.json()["id"]
+    for edit in range(1, 13):
+        response = client.put(
+            f"/api/v1/notes/{note_id}", json={"content": paragraphs(edit)}
+        )
+        assert response.status_code == 200
+
+    rows = db_session.query(NoteVersion).order_by(NoteVersion.id).all()
+    assert len(rows) == 12
+    snapshots = [row for row in rows if row.base_version_id is None]
+    # Default interval is 10: versions 1 and 11 are snapshots
+    assert [row.id for row in snapshots] == [rows[0].id, rows[10].id]
+    for row in rows[1:10]:
+        assert row.base_version_id == rows[0].id
+        # A delta is much smaller than the compressed full text
+        assert len(row.content_data) < len(rows[0].content_data) / 4
+
+
+def test_versions_listing_rebuilds_full_content(client: TestClient):
+    """Test that delta storage is invisible to the versions API."""
+    note_id = edited_note(client, 12)
+
+    versions = client.get(f"/api/v1/notes/{note_id}/versions/?view=full").json()
+    # Newest first: the newest version holds the state before the last edit
+    assert [v["content"] for v in versions] == [
+        paragraphs(edit) for edit in range(11, -1, -1)
+    ]
+
+    # Restoring a delta encoded version brings its full content back
+    response = client.post(
+        f"/api/v1/notes/{note_id}/versions/{versions[5]['id']}/restore/"
+    )
+    assert response.status_code == 200
+    assert response.json()["content"] == paragraphs(6)
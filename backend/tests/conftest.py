@@ -1,6 +1,12 @@
+from contextlib import contextmanager
+
 import pytest
+from app.core.cache import MemoryCache, cache
+from app.core.config import settings
 from app.db.base import Base
 from app.db.session import get_db
+from app.db.tenant import TENANT_INFO_KEY, get_tenant
+from fastapi import Depends
 from fastapi.testclient import TestClient
 from main import app
 from sqlalchemy import create_engine, event
@@ -16,6 +22,28 @@ def set_sqlite_pragma(dbapi_connection, connection_record):
     cursor.close()
 
 
+# --- Cache ---
+@pytest.fixture(autouse=True)
+def reset_cache():
+    """
+    Gives each test an empty in-process cache.
+    The database is recreated for each test and reuses the same note IDs,
+    entries left by a previous test would be served as hits.
+    """
+    cache.configure(MemoryCache(max_entries=1000, ttl=60))
+    yield
+
+
+# --- Background Jobs ---
+@pytest.fixture(autouse=True)
+def no_jobs_resume(monkeypatch):
+    """
+    Keeps the startup of the app off the configured database.
+    The tests run on an in-memory one, jobs left on the other are not theirs.
+    """
+    monkeypatch.setattr(settings, "JOBS_RESUME_ON_STARTUP", False)
+
+
 # --- SQLite In-Memory Engine ---
 @pytest.fixture(scope="session")
 def engine():
@@ -51,6 +79,33 @@ def db_session(engine):
     session.close()
 
 
+# --- Statement Capture ---
+@pytest.fixture(scope="function")
+def capture_statements(db_session):
+    """
+    Captures the SQL sent to the test database, within a with block.
+    Yields a context manager, which yields the list of the statements, or of
+    (statement, parameters) pairs when called with parameters=True.
+    Depends on db_session fixture.
+    """
+
+    @contextmanager
+    def capture(parameters: bool = False):
+        statements = []
+
+        def listener(conn, cursor, statement, params, context, executemany):
+            statements.append((statement, params) if parameters else statement)
+
+        bind = db_session.get_bind()
+        event.listen(bind, "before_cursor_execute", listener)
+        try:
+            yield statements
+        finally:
+            event.remove(bind, "before_cursor_execute", listener)
+
+    yield capture
+
+
 @pytest.fixture(scope="function")
 def client(db_session):
     """
@@ -60,11 +115,13 @@ def client(db_session):
     Depends on db_session fixture.
     """
 
-    def override_get_db():
+    def override_get_db(tenant: str = Depends(get_tenant)):
+        # Scoped to the tenant of the request, like the sessions of get_db
+        db_session.info[TENANT_INFO_KEY] = tenant
         try:
             yield db_session
         finally:
-            pass
+            db_session.info.pop(TENANT_INFO_KEY, None)
 
     app.dependency_overrides[get_db] = override_get_db
 
@@ -0,0 +1,38 @@
+"""Helpers shared by the tests of the note versions."""
+
+from typing import Callable
+
+from fastapi.testclient import TestClient
+
+
+def paragraphs(edit: int) -> str:
+    """Builds a long, non repetitive note body with one edited line."""
+    lines = [
+        f"Paragraph {i}: notes about topic {i * 7 % 13} and {i * 3}.\n"
+        for i in range(200)
+    ]
+    lines[edit % 200] = f"Edited paragraph, revision {edit}.\n"
+    return "".join(lines)
+
+
+def edited_note(
+    client: TestClient, edits: int, content: Callable[[int], str] = paragraphs
+) -> int:
+    """
+    Creates a note and edits it, leaving `edits` versions.
+
+    Args:
+        client: The test client
+        edits: The number of updates
+        content: The content of the note after each edit, 0 when created
+
+    Returns:
+        The ID of the note.
+    """
+    response = client.post(
+        "/api/v1/notes/", json={"title": "Long note", "content": content(0)}
+    )
+    note_id = response.json()["id"]
+    for edit in range(1, edits + 1):
+        client.put(f"/api/v1/notes/{note_id}", json={"content": content(edit)})
+    return note_id
@@ -181,7 +181,10 @@ export const getNoteVersions = async (
   noteId: number
 ): Promise<NoteVersion[]> => {
   try {
-    const response = await apiClient.get(`/api/v1/notes/${noteId}/versions/`);
+    // The preview and diff dialogs read the content of the listed versions
+    const response = await apiClient.get(`/api/v1/notes/${noteId}/versions/`, {
+      params: { view: 'full' },
+    });
     // Add basic validation if needed, e.g., check if response.data is an array
     if (!Array.isArray(response.data)) {
       throw new Error('Invalid data structure for versions received from API');